@@ -15,6 +15,18 @@ import json
 import re
 import time
 from supabase import create_client, Client
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from tts_cache import TTSCache
+from audio_format import (
+    AudioFormatError, VoiceActivityDetector, normalize_audio, select_model, split_at_silence, stitch_transcripts
+)
+from response_parser import SentenceSplitter, TutorResponseParser, parse_tutor_response
+from context_window import ContextWindow, fold_history
+from tutor_prompt import build_system_prompt
+from resilience import CircuitOpen, RetryPolicy, call, get_breaker
+from llm_deadline import (
+    LLM_RESPONSE_DEADLINE_SECONDS, TURN_DEADLINE_SECONDS, Deadline, DeadlineExceeded, LatencyTracker, canned_reply
+)
 
 # Suppress Google Cloud gRPC warnings
 os.environ['GRPC_VERBOSITY'] = 'ERROR'
@@ -226,12 +238,34 @@ if hasattr(st, "secrets") and not OPENAI_API_KEY:
 
 # --- 4. APP LOGIC ---
 
+# Prompt history is bounded by tokens; older turns are folded into a rolling summary
+CONTEXT_WINDOW = ContextWindow(budget_tokens=int(os.getenv("CONTEXT_BUDGET_TOKENS", "1000")))
+
+# Turn latency budget (PRD NFR-1.2 / NFR-1.4); the fallback model is tried when the primary misses it
+LLM_MODEL = "gpt-4o-mini"
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+
+# Provider circuit breakers live in the resilience module, so they outlive script reruns
+OPENAI_BREAKER = get_breaker("openai")
+STT_BREAKER = get_breaker("google_stt")
+TTS_BREAKER = get_breaker("google_tts")
+RETRY_POLICY = RetryPolicy.from_env()
+
+# Silence is trimmed before STT and all-silent recordings never reach Google
+VAD = VoiceActivityDetector(silence_db=float(os.getenv("VAD_SILENCE_DB", "-45")))
+# Short-form STT model for short clips (typical turns), long-form for the rest
+STT_SHORT_MAX_SECONDS = float(os.getenv("STT_SHORT_MAX_SECONDS", "8"))
+
 if 'conversation_history' not in st.session_state: st.session_state.conversation_history = []
 if 'messages' not in st.session_state: st.session_state.messages = []
 if 'last_user_message' not in st.session_state: st.session_state.last_user_message = None
 if 'last_audio_bytes' not in st.session_state: st.session_state.last_audio_bytes = None
 if 'audio_to_play' not in st.session_state: st.session_state.audio_to_play = None
 if 'play_correction_audio' not in st.session_state: st.session_state.play_correction_audio = None
+if 'history_summary' not in st.session_state: st.session_state.history_summary = None
+if 'summarized_count' not in st.session_state: st.session_state.summarized_count = 0
+if 'summary_future' not in st.session_state: st.session_state.summary_future = None
 
 @st.cache_resource
 def init_speech_client(): return speech.SpeechClient()
@@ -239,116 +273,237 @@ def init_speech_client(): return speech.SpeechClient()
 @st.cache_resource
 def init_tts_client(): return texttospeech.TextToSpeechClient()
 
+@st.cache_resource
+def init_tts_cache(): return TTSCache.from_env()
+
+@st.cache_resource
+def init_worker_pool(): return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource
+def init_llm_pool(): return ThreadPoolExecutor(max_workers=8)
+
+@st.cache_resource
+def init_llm_latency(): return LatencyTracker()
+
+@st.cache_resource
+def init_stt_pool(): return ThreadPoolExecutor(max_workers=4)
+
 def transcribe_audio(audio_content, language_code="en-US"):
     try:
         client = init_speech_client()
-        audio = speech.RecognitionAudio(content=audio_content)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=48000,
-            language_code=language_code,
-            enable_automatic_punctuation=True,
-            model="default"
-        )
-        
-        response = client.recognize(config=config, audio=audio)
-        
-        if not response.results:
+        # WAV from the recorder goes out as 16 kHz mono, trimmed to the speech; other formats with their own encoding
+        normalized = normalize_audio(audio_content, vad=VAD)
+        if normalized.trimmed_seconds >= 0.5:
+            st.caption(f"✂️ Trimmed {normalized.trimmed_seconds:.1f}s of silence before transcription")
+        if normalized.silent:
+            # Nothing but silence: no need to ask Google
             return None
-            
-        transcript = " ".join([result.alternatives[0].transcript for result in response.results]).strip()
-        return transcript
+        options = normalized.config_kwargs()
+        options["encoding"] = speech.RecognitionConfig.AudioEncoding[options["encoding"]]
+        def recognize(content, duration):
+            config = speech.RecognitionConfig(
+                **options,
+                language_code=language_code,
+                enable_automatic_punctuation=True,
+                model=select_model(duration, STT_SHORT_MAX_SECONDS)
+            )
+            audio = speech.RecognitionAudio(content=content)
+            response = call(STT_BREAKER, lambda: client.recognize(config=config, audio=audio), RETRY_POLICY)
+            return " ".join([result.alternatives[0].transcript for result in response.results if result.alternatives]).strip()
+        
+        spans = split_at_silence(normalized.samples, normalized.sample_rate_hertz) if normalized.samples is not None else [None]
+        if len(spans) == 1:
+            transcript = recognize(normalized.content, normalized.duration_seconds)
+        else:
+            # Long answers: chunks cut at pauses are recognized in parallel, then stitched in order (LINEAR16 = 2 bytes/sample)
+            chunks = [normalized.content[start * 2:end * 2] for start, end in spans]
+            durations = [(end - start) / normalized.sample_rate_hertz for start, end in spans]
+            transcript = stitch_transcripts(list(init_stt_pool().map(recognize, chunks, durations)))
+        return transcript or None
+    except CircuitOpen:
+        st.warning("⚠️ Speech recognition is temporarily unavailable. Please type your message instead.")
+        return None
+    except AudioFormatError as e:
+        st.warning(f"⚠️ Could not read the recording ({e}). Please try again.")
+        return None
     except Exception as e:
         st.error(f"Transcription Error: {e}")
         import traceback
         st.error(f"Traceback: {traceback.format_exc()}")
         return None
 
-def get_ai_response(user_input, history, persona, topic, level, language="English"):
-    if not OPENAI_API_KEY: return {"conversation": "Error: No API Key.", "correction": None}
-    client = OpenAI(api_key=str(OPENAI_API_KEY).strip())
-    language_name = "French" if language == "French" else "English"
+def build_tutor_messages(user_input, history, persona, topic, level, language="English", summary=None):
+    # Static instructions first so the provider can cache the shared prompt prefix
+    sys_prompt = build_system_prompt(language, persona, topic, level)
+    return [{"role": "system", "content": sys_prompt}] + CONTEXT_WINDOW.build(history, summary) + [{"role": "user", "content": user_input}]
+
+def hedged_completion(client, msgs, deadline):
+    """
+    Primary model within NFR-1.2, with a hedged duplicate once the observed p95 latency
+    has passed, then the fallback model within what is left of the turn.
+    Threads cannot be cancelled: each attempt carries the remaining budget as its
+    request timeout and the losing attempt's result is ignored.
+    """
+    pool, latency = init_llm_pool(), init_llm_latency()
     
-    sys_prompt = f"""You are an experienced {language_name} language tutor with a {persona.lower()} teaching style.
-
-Your role:
-- Help students practice {language_name} conversation on the topic of {topic}
-- Adapt your language to {level} proficiency
-- Keep responses natural and conversational (2-3 sentences)
-- Provide grammar corrections when needed WITHOUT interrupting the conversation flow
-
-CRITICAL: You MUST use this exact format for EVERY response:
-
-<conversation>
-[Your natural, conversational response here - NO corrections, NO grammar mentions, ONLY conversation]
-</conversation>
-
-<correction>
-[ONLY if there was a grammar/vocabulary/spelling error, write it here. Otherwise leave empty]
-[Format: "You said: '[incorrect phrase]' → Better: '[corrected phrase]' - [brief explanation]"]
-</correction>
-
-IMPORTANT RULES:
-1. The <conversation> section should NEVER mention errors or corrections
-2. The <conversation> section should flow naturally as if nothing was wrong
-3. Keep the conversation going - ask follow-up questions, show interest
-4. The <correction> section is COMPLETELY SEPARATE - only grammar fixes go there
-5. If there are no errors, leave <correction> empty 
-6. Do NOT mix conversation and correction - they are separate sections
-
-Example 1 (with error):
-User: "I goed to store yesterday"
-<conversation>
-Oh nice! What did you buy at the store? I love shopping too.
-</conversation>
-<correction>
-You said: 'I goed to store' → Better: 'I went to the store' - "Go" is irregular (went, not goed), and we need "the" before "store".
-</correction>
-
-Example 2 (no error):
-User: "I went to the store yesterday"
-<conversation>
-Oh nice! What did you buy at the store? I love shopping too.
-</conversation>
-
-Topic: {topic}
-Level: {level}
-Persona: {persona}
-"""
+    def attempt(model, timeout):
+        start = time.perf_counter()
+        response = call(OPENAI_BREAKER, lambda: client.chat.completions.create(
+            model=model, messages=msgs, timeout=timeout
+        ))
+        if model == LLM_MODEL:
+            latency.record(time.perf_counter() - start)
+        return response.choices[0].message.content
     
-    msgs = [{"role": "system", "content": sys_prompt}] + history[-6:] + [{"role": "user", "content": user_input}]
+    stages = [(LLM_MODEL, deadline.budget(LLM_RESPONSE_DEADLINE_SECONDS), True)]
+    if LLM_FALLBACK_MODEL:
+        stages.append((LLM_FALLBACK_MODEL, None, False))
+    for model, budget, hedge in stages:
+        budget = deadline.budget() if budget is None else budget
+        if budget <= 0:
+            break
+        stage_end = time.monotonic() + budget
+        futures = {pool.submit(attempt, model, budget)}
+        if hedge:
+            hedge_delay = latency.percentile(LLM_HEDGE_PERCENTILE, default=1.0)
+            wait(futures, timeout=min(hedge_delay, budget), return_when=FIRST_COMPLETED)
+            if not any(f.done() for f in futures) and time.monotonic() < stage_end:
+                futures.add(pool.submit(attempt, model, stage_end - time.monotonic()))
+        while futures:
+            done, futures = wait(futures, timeout=max(0.0, stage_end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+    raise DeadlineExceeded(f"no reply within {TURN_DEADLINE_SECONDS:.0f}s")
+
+def get_ai_response_with_audio(user_input, history, persona, topic, level, language, voice_name, on_conversation=None, summary=None):
+    """
+    Streams the reply and sends each finished sentence to TTS while the LLM is still generating.
+    Returns the parsed response and the sentence audio joined into one MP3.
+    on_conversation(text) is called with the conversation text received so far.
+    """
+    if not OPENAI_API_KEY: return {"conversation": "Error: No API Key.", "correction": None}, None
+    client = OpenAI(api_key=str(OPENAI_API_KEY).strip(), max_retries=0)
+    msgs = build_tutor_messages(user_input, history, persona, topic, level, language, summary)
+    language_code = "fr-FR" if language == "French" else "en-US"
+    
+    # Resolve cached resources here: worker threads have no Streamlit script context
+    tts_client, tts_cache, executor = init_tts_client(), init_tts_cache(), init_worker_pool()
+    parser = TutorResponseParser()
+    splitter = SentenceSplitter()
+    futures = []
+    
+    def submit(sentences):
+        # Text-only mode while the TTS circuit is open (PRD 5.3)
+        if TTS_BREAKER.is_open:
+            return
+        for sentence in sentences:
+            futures.append(executor.submit(_synthesize_audio, sentence, voice_name, language_code, tts_client, tts_cache))
+    
+    def handle(events):
+        for kind, text in events:
+            if kind == "conversation":
+                submit(splitter.feed(text))
+                if on_conversation:
+                    on_conversation(parser.conversation)
     
     try:
-        response = client.chat.completions.create(model="gpt-4o-mini", messages=msgs)
-        full_response = response.choices[0].message.content.strip()
-        
-        # Parse the response
-        conversation_match = re.search(r'<conversation>(.*?)</conversation>', full_response, re.DOTALL)
-        correction_match = re.search(r'<correction>(.*?)</correction>', full_response, re.DOTALL)
-        
-        conversation = conversation_match.group(1).strip() if conversation_match else full_response
-        correction = correction_match.group(1).strip() if correction_match else None
-        
-        # Clean up empty or placeholder corrections
-        if correction and (len(correction) < 3 or correction.strip() in ['-', 'none', 'n/a', 'None', 'N/A']):
-            correction = None
-        
-        return {
-            "conversation": conversation,
-            "correction": correction
-        }
+        # The request timeout bounds the wait for each chunk, so a stalled provider
+        # cannot hold the turn past the NFR-1.2 budget
+        deadline = Deadline(TURN_DEADLINE_SECONDS)
+        stream = call(OPENAI_BREAKER, lambda: client.chat.completions.create(
+            model=LLM_MODEL, messages=msgs, stream=True,
+            timeout=deadline.budget(LLM_RESPONSE_DEADLINE_SECONDS)
+        ))
+        for chunk in stream:
+            if chunk.choices:
+                handle(parser.feed(chunk.choices[0].delta.content or ""))
+        handle(parser.close())
+        submit(splitter.close())
     except Exception as e:
-        return {"conversation": "Sorry, I encountered an error.", "correction": None}
-
-def synthesize_speech(text, voice_name, language_code="en-US"):
-    try:
-        client = init_tts_client()
+        print(f"LLM stream error: {e}")
+        if parser.conversation:
+            # Keep the part of the reply that already arrived
+            handle(parser.close())
+            submit(splitter.close())
+        else:
+            for future in futures:
+                future.cancel()
+            futures.clear()
+            try:
+                reply = hedged_completion(client, msgs, deadline) if LLM_FALLBACK_MODEL else canned_reply(language)
+            except Exception as e:
+                print(f"LLM fallback error: {e}")
+                reply = canned_reply(language)
+            parser = TutorResponseParser()
+            handle(parser.feed(reply))
+            handle(parser.close())
+            submit(splitter.close())
+    
+    segments = []
+    for future in futures:
+        try:
+            segments.append(future.result())
+        except CircuitOpen:
+            # TTS tripped mid-reply: a reply with holes is worse than text only
+            segments = []
+            break
+        except Exception as e:
+            st.error(f"TTS Error: {e}")
+    # MP3 frames are self-contained, so sentence clips can be played back to back
+    return parser.result(), b"".join(segments) or None
+
+def apply_finished_summary():
+    """Picks up a rolling summary computed in the background during an earlier turn."""
+    future = st.session_state.summary_future
+    if future is not None and future.done():
+        try:
+            st.session_state.history_summary, st.session_state.summarized_count = future.result()
+        except Exception as e:
+            print(f"History summary error: {e}")
+        st.session_state.summary_future = None
+
+def schedule_summary_update():
+    """Folds turns that left the context window into the summary, off the critical path."""
+    if st.session_state.summary_future is not None or not OPENAI_API_KEY:
+        return
+    history = list(st.session_state.conversation_history)
+    if len(CONTEXT_WINDOW.overflow(history)) <= st.session_state.summarized_count:
+        return
+    client = OpenAI(api_key=str(OPENAI_API_KEY).strip(), max_retries=0)
+    def summarize(msgs):
+        response = call(OPENAI_BREAKER, lambda: client.chat.completions.create(
+            model="gpt-4o-mini", messages=msgs, max_tokens=200
+        ), RETRY_POLICY)
+        return response.choices[0].message.content or ""
+    st.session_state.summary_future = init_worker_pool().submit(
+        fold_history, CONTEXT_WINDOW, history,
+        st.session_state.history_summary, st.session_state.summarized_count, summarize
+    )
+
+def _synthesize_audio(text, voice_name, language_code, client, cache):
+    """Synthesizes speech through the TTS cache. Safe to call from worker threads."""
+    def synthesize():
         s_input = texttospeech.SynthesisInput(text=text)
         # Use the voice selected in sidebar
         voice = texttospeech.VoiceSelectionParams(language_code=language_code, name=voice_name)
         audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
-        response = client.synthesize_speech(input=s_input, voice=voice, audio_config=audio_config)
+        response = call(TTS_BREAKER, lambda: client.synthesize_speech(
+            input=s_input, voice=voice, audio_config=audio_config
+        ), RETRY_POLICY)
         return response.audio_content
+
+    # Repeated phrases (e.g. replayed corrections) are served from the cache
+    return cache.get_or_synthesize(text, voice_name, language_code, synthesize)
+
+def synthesize_speech(text, voice_name, language_code="en-US"):
+    try:
+        return _synthesize_audio(text, voice_name, language_code, init_tts_client(), init_tts_cache())
+    except CircuitOpen:
+        st.info("🔇 Voice is temporarily unavailable. Showing text only.")
+        return None
     except Exception as e:
         st.error(f"TTS Error: {e}")
         return None
@@ -408,6 +563,9 @@ def main():
             st.session_state.last_audio_bytes = None
             st.session_state.audio_to_play = None
             st.session_state.play_correction_audio = None
+            st.session_state.history_summary = None
+            st.session_state.summarized_count = 0
+            st.session_state.summary_future = None
             st.session_state.text_input_key = "reset_text_input"
             st.rerun()
         if st.button("Logout", type="primary"):
@@ -444,6 +602,8 @@ def main():
                 st.markdown(f"<div style='background:#f5f5f5;padding:10px;border-radius:10px;margin:5px 0; color: black'><b>Tutor:</b> {content}</div>", unsafe_allow_html=True)
 
     # --- Audio Playback Logic ---
+    if TTS_BREAKER.is_open:
+        st.caption("🔇 Voice is temporarily unavailable. Replies are shown as text only.")
     # 1. Play conversation audio if waiting
     if st.session_state.audio_to_play:
         autoplay_audio(st.session_state.audio_to_play)
@@ -493,9 +653,16 @@ def main():
         st.session_state.messages.append({"role": "user", "content": user_msg})
         st.session_state.conversation_history.append({"role": "user", "content": user_msg})
         
+        apply_finished_summary()
         with st.spinner("Thinking..."):
-            # Get AI response (now returns dict with conversation and correction)
-            response_data = get_ai_response(user_msg, st.session_state.conversation_history, persona, topic, level, language)
+            # Stream the reply; each sentence is synthesized as soon as it is complete
+            reply_placeholder = st.empty()
+            def show_partial_reply(partial):
+                reply_placeholder.markdown(f"<div style='background:#f5f5f5;padding:10px;border-radius:10px;margin:5px 0; color: black'><b>Tutor:</b> {partial}</div>", unsafe_allow_html=True)
+            response_data, audio_bytes = get_ai_response_with_audio(
+                user_msg, st.session_state.conversation_history, persona, topic, level, language, voice,
+                on_conversation=show_partial_reply, summary=st.session_state.history_summary
+            )
             
             # Add timestamp for unique keys
             response_data['timestamp'] = time.time()
@@ -508,14 +675,13 @@ def main():
             conversation_text = response_data.get('conversation', '')
             st.session_state.conversation_history.append({"role": "assistant", "content": conversation_text})
 
-            # Generate audio ONLY for the conversation part (not corrections)
-            language_code = "fr-FR" if language == "French" else "en-US"
-            audio_bytes = synthesize_speech(conversation_text, voice, language_code)
-            
+            # Audio covers ONLY the conversation part (not corrections)
             # SAVE AUDIO TO STATE TO PLAY ON NEXT RELOAD
             if audio_bytes:
                 st.session_state.audio_to_play = audio_bytes
 
+            schedule_summary_update()
+
         # Reset text input if needed
         if msg_source == 'text':
             current_key = st.session_state.text_input_key
@@ -0,0 +1,452 @@
+"""
+Audio normalization for speech recognition in the AI Language Tutor app.
+This module sniffs the container of an uploaded recording and prepares it for
+Google Speech-to-Text: WAV is decoded, downmixed and resampled to 16 kHz mono
+LINEAR16 with NumPy (a 48 kHz stereo recording shrinks 6x) and, with a voice
+activity detector, stripped of leading and trailing silence; all-silent clips are
+flagged so they never reach Google. Compressed formats Google decodes itself
+(FLAC, Ogg/WebM Opus, MP3) are passed through with the encoding and sample rate
+read from their headers. Long decoded recordings can be split at silence into
+overlapping chunks for parallel recognition, and the chunk transcripts stitched
+back together, and the recognition model is chosen by clip duration.
+It is shared by the Streamlit app and the FastAPI backend.
+"""
+
+import re
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+
+# Sample rates Google accepts for Opus; Opus itself always decodes at 48 kHz
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# MPEG audio sample rates by version bits, then rate index
+MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000)    # MPEG-2.5
+}
+
+# Layer III bitrates (kbit/s) by bitrate index: MPEG-1, then MPEG-2 / 2.5
+MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+}
+
+# Google recognition models for short utterances and for everything else
+SHORT_FORM_MODEL = "latest_short"
+LONG_FORM_MODEL = "latest_long"
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioFormatError(ValueError):
+    """The recording is malformed or in an encoding that cannot be decoded"""
+
+
+class NormalizedAudio:
+    """
+    Audio ready for a RecognitionConfig.
+    encoding is a Google AudioEncoding name; sample_rate_hertz is None when Google
+    reads it from the file header. samples holds the decoded mono signal (float32,
+    -1..1) when the audio was decoded here, otherwise header_seconds is the duration
+    read from the container header, if it has one. trimmed_seconds is the silence
+    removed; silent means no speech was found and there is nothing to send.
+    """
+
+    def __init__(self, content: bytes, encoding: str, sample_rate_hertz: Optional[int],
+                 source_format: str, source_bytes: int, samples: Optional[np.ndarray] = None,
+                 trimmed_seconds: float = 0.0, silent: bool = False, header_seconds: Optional[float] = None):
+        self.content = content
+        self.encoding = encoding
+        self.sample_rate_hertz = sample_rate_hertz
+        self.source_format = source_format
+        self.source_bytes = source_bytes
+        self.samples = samples
+        self.trimmed_seconds = trimmed_seconds
+        self.silent = silent
+        self.header_seconds = header_seconds
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        """Length of the audio to recognize (None when a pass-through header does not say)"""
+        if self.samples is None or not self.sample_rate_hertz:
+            return self.header_seconds
+        return len(self.samples) / self.sample_rate_hertz
+
+    def config_kwargs(self) -> dict:
+        """encoding / sample_rate_hertz / audio_channel_count arguments for RecognitionConfig"""
+        kwargs = {"encoding": self.encoding}
+        if self.sample_rate_hertz:
+            kwargs["sample_rate_hertz"] = self.sample_rate_hertz
+        if self.samples is not None:
+            kwargs["audio_channel_count"] = 1
+        return kwargs
+
+    def report(self) -> dict:
+        """Sizes and durations for logs and API responses"""
+        duration = self.duration_seconds
+        return {
+            "format": self.source_format,
+            "received_bytes": self.source_bytes,
+            "sent_bytes": len(self.content),
+            "speech_ms": int(duration * 1000) if duration is not None else None,
+            "trimmed_ms": int(self.trimmed_seconds * 1000),
+            "silent": self.silent
+        }
+
+
+def sniff_format(data: bytes) -> str:
+    """Container of a recording from its magic bytes: wav, flac, ogg, webm, mp3 or unknown"""
+    if data[:4] in (b"RIFF", b"RF64") and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == b"fLaC":
+        return "flac"
+    if data[:4] == b"OggS":
+        return "ogg"
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if data[:3] == b"ID3" or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return "unknown"
+
+
+# ==================== Decoding ====================
+
+def _wav_chunks(data: bytes) -> Tuple[memoryview, memoryview]:
+    """The fmt and data chunks of a WAV file, as views into data (no copies)"""
+    data = memoryview(data)
+    fmt = None
+    pcm = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        body_start = pos + 8
+        if chunk_id == b"data":
+            # Streamed recordings may leave the size at 0 or 0xFFFFFFFF: take the rest
+            end = body_start + size if 0 < size <= len(data) - body_start else len(data)
+            pcm = data[body_start:end]
+            break
+        if chunk_id == b"fmt ":
+            fmt = data[body_start:body_start + size]
+        pos = body_start + size + (size & 1)
+
+    if fmt is None or len(fmt) < 16 or pcm is None:
+        raise AudioFormatError("WAV file has no fmt or data chunk")
+    return fmt, pcm
+
+
+def decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode PCM or float WAV into float32 samples shaped (frames, channels) and the sample rate"""
+    fmt, pcm = _wav_chunks(data)
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    if not channels or not sample_rate or not block_align:
+        raise AudioFormatError("WAV header has no channels or sample rate")
+    if block_align != channels * bits // 8:
+        raise AudioFormatError(f"WAV block align {block_align} does not fit {channels} x {bits}-bit samples")
+    pcm = pcm[:len(pcm) - len(pcm) % block_align]
+
+    if format_tag == WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif format_tag == WAVE_FORMAT_PCM and bits == 16:
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768
+    elif format_tag == WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(pcm, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = (np.where(values & 0x800000, values - 0x1000000, values)).astype(np.float32) / 8388608
+    elif format_tag == WAVE_FORMAT_PCM and bits == 32:
+        samples = np.frombuffer(pcm, dtype="<i4").astype(np.float32) / 2147483648
+    elif format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(pcm, dtype="<f4" if bits == 32 else "<f8").astype(np.float32)
+    else:
+        raise AudioFormatError(f"unsupported WAV encoding (format {format_tag}, {bits} bits)")
+    return samples.reshape(-1, channels), sample_rate
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """Average (frames, channels) samples into one channel"""
+    return samples.mean(axis=1, dtype=np.float32) if samples.ndim == 2 else samples
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample a mono signal: low-pass below the target Nyquist frequency when
+    downsampling (windowed sinc), then linear interpolation onto the new grid
+    """
+    if source_rate == target_rate or not len(samples):
+        return samples.astype(np.float32, copy=False)
+    if source_rate > target_rate:
+        samples = _lowpass(samples, 0.45 * target_rate / source_rate)
+    count = int(round(len(samples) * target_rate / source_rate))
+    positions = np.arange(count) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _lowpass(samples: np.ndarray, cutoff: float, taps: int = 63) -> np.ndarray:
+    """FIR low-pass; cutoff in cycles per sample"""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    kernel /= kernel.sum()
+    return np.convolve(samples, kernel, mode="same")
+
+
+def to_linear16(samples: np.ndarray) -> bytes:
+    """Float samples (-1..1) as little-endian 16-bit PCM"""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+# ==================== Voice Activity ====================
+
+class VoiceActivityDetector:
+    """
+    Energy / zero-crossing voice activity detection on short frames.
+    A frame is speech when its energy clears an adaptive threshold (10 dB over the
+    clip's noise floor, at most 20 dB under its peak, never under silence_db), or
+    comes within 6 dB of it with the high zero-crossing rate of a fricative ("s",
+    "f"). Clips that stay under silence_db, or hold less than min_speech_seconds of
+    speech, are silent. Clips without any dynamics (steady noise, or speech with no
+    pauses) are left untouched rather than guessed at.
+    """
+
+    def __init__(self, silence_db: float = -45.0, padding_seconds: float = 0.2,
+                 min_speech_seconds: float = 0.15, frame_seconds: float = 0.03,
+                 fricative_zcr: float = 0.25):
+        self.silence_db = silence_db
+        self.padding_seconds = padding_seconds
+        self.min_speech_seconds = min_speech_seconds
+        self.frame_seconds = frame_seconds
+        self.fricative_zcr = fricative_zcr
+
+    def speech_span(self, samples: np.ndarray, sample_rate: int) -> Optional[Tuple[int, int]]:
+        """(start, end) sample indices of the speech, padded; None when the clip is silent"""
+        frame = max(1, int(sample_rate * self.frame_seconds))
+        count = len(samples) // frame
+        if count == 0:
+            peak = np.abs(samples).max() if len(samples) else 0.0
+            return (0, len(samples)) if 20 * np.log10(peak + 1e-10) >= self.silence_db else None
+
+        frames = samples[:count * frame].reshape(count, frame)
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+
+        peak_db = energy_db.max()
+        floor_db = np.percentile(energy_db, 10)
+        if peak_db < self.silence_db:
+            return None
+        if peak_db - floor_db < 6.0:
+            return 0, len(samples)
+
+        threshold = max(self.silence_db, min(floor_db + 10.0, peak_db - 20.0))
+        speech = (energy_db > threshold) | ((energy_db > threshold - 6.0) & (zcr > self.fricative_zcr))
+        voiced = np.flatnonzero(speech)
+        if len(voiced) * self.frame_seconds < self.min_speech_seconds:
+            return None
+
+        padding = int(self.padding_seconds * sample_rate)
+        start = max(0, voiced[0] * frame - padding)
+        end = min(len(samples), (voiced[-1] + 1) * frame + padding)
+        return start, end
+
+
+# ==================== Chunking ====================
+
+def split_at_silence(samples: np.ndarray, sample_rate: int, chunk_seconds: float = 15.0,
+                     overlap_seconds: float = 0.5, search_seconds: float = 3.0,
+                     frame_seconds: float = 0.03) -> List[Tuple[int, int]]:
+    """
+    (start, end) sample spans of at most about chunk_seconds each, cut at the
+    quietest frame in the last search_seconds before each boundary. Neighbouring
+    spans overlap by overlap_seconds on each side of a cut, so a word that straddles
+    it is heard whole by one of them (stitch_transcripts drops the repeat).
+    """
+    total = len(samples)
+    chunk = int(chunk_seconds * sample_rate)
+    if total <= chunk:
+        return [(0, total)]
+    frame = max(1, int(frame_seconds * sample_rate))
+    overlap = int(overlap_seconds * sample_rate)
+    count = total // frame
+    energy = np.mean(samples[:count * frame].reshape(count, frame) ** 2, axis=1)
+
+    spans = []
+    start = 0
+    while total - start > chunk:
+        low = max(start + chunk // 2, start + chunk - int(search_seconds * sample_rate)) // frame
+        high = min(start + chunk, count * frame) // frame
+        quietest = low + int(np.argmin(energy[low:high])) if high > low else (start + chunk) // frame
+        cut = quietest * frame + frame // 2
+        spans.append((max(0, start - overlap) if start else 0, min(total, cut + overlap)))
+        start = cut
+    spans.append((max(0, start - overlap), total))
+    return spans
+
+
+def _word_key(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_transcripts(parts: Sequence[str], max_overlap_words: int = 6) -> str:
+    """
+    Join chunk transcripts in order, dropping words repeated across a seam: the
+    longest run (up to max_overlap_words) ending one part and starting the next,
+    compared without case or punctuation
+    """
+    words: List[str] = []
+    for part in parts:
+        new = part.split()
+        repeated = 0
+        for size in range(min(max_overlap_words, len(words), len(new)), 0, -1):
+            if [_word_key(w) for w in words[-size:]] == [_word_key(w) for w in new[:size]]:
+                repeated = size
+                break
+        words.extend(new[repeated:])
+    return " ".join(words)
+
+
+# ==================== Header Probes ====================
+
+def _opus_sample_rate(data: bytes) -> int:
+    """Input sample rate from the OpusHead packet, snapped to a rate Google accepts"""
+    head = data.find(b"OpusHead", 0, 4096)
+    if head >= 0 and len(data) >= head + 16:
+        rate = struct.unpack("<I", data[head + 12:head + 16])[0]
+        if rate in OPUS_SAMPLE_RATES:
+            return rate
+    return 48000
+
+
+def _mp3_header(data: bytes) -> Optional[Tuple[int, int, int]]:
+    """(sample rate, bitrate in bit/s, offset) of the first MPEG frame (after any ID3v2 tag)"""
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        pos = 10 + ((data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | data[9] & 0x7F)
+    end = min(len(data) - 3, pos + 65536)
+    while pos < end:
+        if data[pos] == 0xFF and data[pos + 1] & 0xE0 == 0xE0:
+            version = (data[pos + 1] >> 3) & 3
+            rate_index = (data[pos + 2] >> 2) & 3
+            bitrate_index = data[pos + 2] >> 4
+            if version in MP3_SAMPLE_RATES and rate_index < 3 and 0 < bitrate_index < 15:
+                bitrate = MP3_BITRATES[3 if version == 3 else 2][bitrate_index] * 1000
+                return MP3_SAMPLE_RATES[version][rate_index], bitrate, pos
+        pos += 1
+    return None
+
+
+def _flac_seconds(data: bytes) -> Optional[float]:
+    """Total samples / sample rate from the STREAMINFO block"""
+    if len(data) < 26 or data[4] & 0x7F != 0:
+        return None
+    info = data[8:26]
+    rate = int.from_bytes(info[10:13], "big") >> 4
+    total = ((info[13] & 0x0F) << 32) | int.from_bytes(info[14:18], "big")
+    return total / rate if rate and total else None
+
+
+def _ogg_opus_seconds(data: bytes) -> Optional[float]:
+    """Granule position of the last page (48 kHz samples) minus the OpusHead pre-skip"""
+    last = data.rfind(b"OggS", max(0, len(data) - 65536))
+    head = data.find(b"OpusHead", 0, 4096)
+    if last < 0 or head < 0 or len(data) < last + 14 or len(data) < head + 12:
+        return None
+    granule = struct.unpack("<q", data[last + 6:last + 14])[0]
+    pre_skip = struct.unpack("<H", data[head + 10:head + 12])[0]
+    return max(0, granule - pre_skip) / 48000 if granule > 0 else None
+
+
+def _webm_seconds(data: bytes) -> Optional[float]:
+    """Segment Info Duration x TimecodeScale; browser recorders often leave it out"""
+    pos = data.find(b"\x44\x89", 0, 8192)
+    if pos < 0 or len(data) < pos + 3:
+        return None
+    size = {0x84: 4, 0x88: 8}.get(data[pos + 2])
+    if size is None or len(data) < pos + 3 + size:
+        return None
+    duration = struct.unpack(">f" if size == 4 else ">d", data[pos + 3:pos + 3 + size])[0]
+    scale = 1000000
+    scale_pos = data.find(b"\x2a\xd7\xb1", 0, 8192)
+    if scale_pos >= 0 and len(data) > scale_pos + 4 and data[scale_pos + 3] & 0x80:
+        length = data[scale_pos + 3] & 0x7F
+        scale = int.from_bytes(data[scale_pos + 4:scale_pos + 4 + length], "big") or scale
+    return duration * scale / 1e9 if duration > 0 else None
+
+
+def probe_duration(data: bytes) -> Optional[float]:
+    """
+    Duration in seconds from the container header alone, without decoding (None
+    when the header does not say). Raises AudioFormatError for a malformed WAV file.
+    """
+    source_format = sniff_format(data)
+    if source_format == "wav":
+        fmt, pcm = _wav_chunks(data)
+        _, _, sample_rate, _, block_align, _ = struct.unpack("<HHIIHH", fmt[:16])
+        return len(pcm) / (sample_rate * block_align) if sample_rate and block_align else None
+    return _header_seconds(data, source_format)
+
+
+def _header_seconds(data: bytes, source_format: str) -> Optional[float]:
+    if source_format == "flac":
+        return _flac_seconds(data)
+    if source_format == "ogg":
+        return _ogg_opus_seconds(data)
+    if source_format == "webm":
+        return _webm_seconds(data)
+    if source_format == "mp3":
+        header = _mp3_header(data)
+        # Constant-bitrate estimate; VBR files come out roughly right
+        return (len(data) - header[2]) * 8 / header[1] if header else None
+    return len(data) / 2 / 48000
+
+
+def select_model(duration_seconds: Optional[float], short_max_seconds: float = 8.0,
+                 short_model: str = SHORT_FORM_MODEL, long_model: str = LONG_FORM_MODEL) -> str:
+    """Short-form model for clips up to short_max_seconds; long-form otherwise or when unknown"""
+    if duration_seconds is not None and duration_seconds <= short_max_seconds:
+        return short_model
+    return long_model
+
+
+def normalize_audio(data: bytes, target_rate: int = TARGET_SAMPLE_RATE,
+                    vad: Optional[VoiceActivityDetector] = None) -> NormalizedAudio:
+    """
+    Prepare a recording for Speech-to-Text.
+    With a vad, decoded audio is trimmed to the speech (only decoded formats can be).
+    Raises AudioFormatError for a malformed or undecodable WAV file.
+    Unknown data is assumed to be raw 48 kHz LINEAR16, as the recorder used to send.
+    Accepts any bytes-like buffer (e.g. the bytearray an upload was read into).
+    A WAV is decoded through float32 working copies (several times its size at peak);
+    callers bound that by limiting the input size.
+    """
+    source_format = sniff_format(data)
+    if source_format == "wav":
+        samples, rate = decode_wav(data)
+        rate, mono = min(rate, target_rate), resample(downmix(samples), rate, min(rate, target_rate))
+        span = vad.speech_span(mono, rate) if vad else (0, len(mono))
+        if span is None:
+            return NormalizedAudio(b"", "LINEAR16", rate, source_format, len(data), mono[:0],
+                                   trimmed_seconds=len(mono) / rate, silent=True)
+        speech = mono[span[0]:span[1]]
+        return NormalizedAudio(to_linear16(speech), "LINEAR16", rate, source_format, len(data), speech,
+                               trimmed_seconds=(len(mono) - len(speech)) / rate)
+    # Passed through as is; the request protobuf needs bytes
+    content = data if isinstance(data, bytes) else bytes(data)
+    header_seconds = _header_seconds(data, source_format)
+    if source_format == "flac":
+        return NormalizedAudio(content, "FLAC", None, source_format, len(data), header_seconds=header_seconds)
+    if source_format in ("ogg", "webm"):
+        encoding = "OGG_OPUS" if source_format == "ogg" else "WEBM_OPUS"
+        return NormalizedAudio(content, encoding, _opus_sample_rate(data), source_format, len(data),
+                               header_seconds=header_seconds)
+    if source_format == "mp3":
+        header = _mp3_header(data)
+        return NormalizedAudio(content, "MP3", header[0] if header else None, source_format, len(data),
+                               header_seconds=header_seconds)
+    return NormalizedAudio(content, "LINEAR16", 48000, source_format, len(data), header_seconds=header_seconds)
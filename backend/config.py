@@ -20,10 +20,109 @@ class Settings(BaseSettings):
     
     # OpenAI
     openai_api_key: str
+    openai_model: str = "gpt-4o-mini"
+    openai_timeout_seconds: float = 30.0
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_max_concurrency: int = 64  # upper bound of the adaptive in-flight limit per worker
+    openai_initial_concurrency: int = 16
+    
+    # LLM latency budget (PRD NFR-1.2 / NFR-1.4)
+    llm_response_deadline_seconds: float = 2.0  # primary model first token, before the fallback is tried
+    llm_turn_deadline_seconds: float = 5.0  # whole turn, including fallback
+    llm_hedging_enabled: bool = True
+    llm_hedge_percentile: float = 95.0  # send a hedged request once this first-token percentile has passed
+    llm_hedge_delay_seconds: float = 1.0  # hedge delay until enough latencies are observed
+    llm_fallback_model: Optional[str] = None  # tried when the primary model misses its deadline
+    llm_canned_reply_enabled: bool = True  # answer with a canned reply when every model misses
+    
+    # Provider resilience (OpenAI, Google STT/TTS, Supabase)
+    breaker_failure_threshold: int = 5  # consecutive transient failures that open a circuit
+    breaker_recovery_seconds: float = 30.0  # how long an open circuit fails fast before a probe
+    retry_max_attempts: int = 3  # attempts per idempotent call, including the first
+    retry_base_delay_seconds: float = 0.2
+    retry_max_delay_seconds: float = 2.0
     
     # Google Cloud
     google_credentials_path: Optional[str] = None
     google_credentials_json: Optional[str] = None
+    google_max_concurrency: int = 64  # per service (STT, TTS), upper bound of the adaptive limit
+    google_initial_concurrency: int = 16
+    
+    # Adaptive concurrency (AIMD): +1 per window without overload, x ratio on 429/timeout/latency spike
+    limiter_min_concurrency: int = 2
+    limiter_backoff_ratio: float = 0.7
+    limiter_latency_tolerance: float = 2.0  # a call slower than this x the usual latency counts as overload
+    
+    # Priority scheduling: interactive turns > user replays > background jobs on the same provider limits
+    scheduler_background_share: float = 0.5  # at most this fraction of a provider's limit runs background work
+    scheduler_interactive_wait_ms: int = 200  # an interactive call queued longer than this defers background work
+    scheduler_turn_budget_seconds: float = 5.0  # a turn slower than this defers background work (PRD NFR-1.4)
+    scheduler_cooldown_seconds: float = 5.0  # how long background work stays deferred after a budget miss
+    
+    # TTS audio cache (shared on-disk tier with the Streamlit app by default)
+    tts_cache_memory_mb: int = 64
+    tts_cache_disk_enabled: bool = True
+    tts_cache_dir: Optional[str] = None
+    tts_cache_disk_mb: int = 1024
+    
+    # Batch synthesis (POST /api/audio/synthesize/batch)
+    tts_batch_max_items: int = 100
+    tts_batch_concurrency: int = 8  # syntheses in flight per batch request
+    
+    # Voice activity detection before STT: trim silence, skip all-silent clips
+    vad_enabled: bool = True
+    vad_silence_db: float = -45.0  # frames quieter than this (dBFS) are never speech
+    vad_padding_ms: int = 200  # silence kept around the speech
+    vad_min_speech_ms: int = 150  # clips with less speech than this count as silent
+    
+    # Upload limits for recordings, checked before any decoding or Google call
+    max_upload_mb: float = 10.0
+    max_audio_seconds: float = 120.0
+    
+    # STT model by clip duration (set both to "default" to turn selection off)
+    stt_short_model: str = "latest_short"
+    stt_long_model: str = "latest_long"
+    stt_short_max_seconds: float = 8.0  # clips up to this long use the short-form model
+    
+    # Long recordings are split at silence and the chunks recognized concurrently
+    stt_chunking_enabled: bool = True
+    stt_chunk_seconds: float = 15.0  # well under the ~1 minute limit of synchronous recognize
+    stt_chunk_overlap_seconds: float = 0.5
+    
+    # Prompt context window
+    context_budget_tokens: int = 1000  # history tokens sent with each turn
+    context_min_recent_messages: int = 2
+    context_summary_max_tokens: int = 200
+    
+    # Precomputed first-turn openers (see scripts/generate_openers.py)
+    openers_dir: str = "openers"
+    opener_variants: int = 3
+    
+    # Conversation sessions
+    session_max_messages: int = 40  # messages kept per session; older ones are folded into the summary
+    session_ttl_minutes: int = 60
+    session_max_sessions: int = 10000
+    session_persist: bool = False  # also store sessions in Supabase
+    
+    # Admission control (token buckets per user and globally, queue for expensive endpoints)
+    rate_limit_enabled: bool = True
+    rate_limit_user_per_minute: float = 60.0  # per JWT `sub` (client IP when anonymous)
+    rate_limit_user_burst: float = 20.0
+    rate_limit_global_per_second: float = 50.0  # per worker with the memory store
+    rate_limit_global_burst: float = 100.0
+    rate_limit_expensive_paths: str = "/api/conversation/send,/api/conversation/start,/api/audio/transcribe,/api/audio/synthesize,/api/turn"
+    rate_limit_expensive_cost: float = 3.0  # tokens taken by an expensive request
+    rate_limit_batch_item_cost: float = 1.0  # extra tokens per uncached item of a TTS batch
+    rate_limit_store: str = "memory"  # "memory" or "redis" (shared across workers)
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    admission_max_concurrent: int = 32  # expensive requests running per worker
+    admission_max_waiting: int = 64  # expensive requests queued per worker
+    admission_wait_timeout_seconds: float = 2.0
+    
+    # Idempotency-Key results (per worker, in memory)
+    idempotency_ttl_seconds: float = 600.0  # how long a completed result is replayed to retries
+    idempotency_max_entries: int = 1000
     
     # JWT
     jwt_secret_key: str = "your-secret-key-change-in-production"
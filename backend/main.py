@@ -7,7 +7,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from config import get_settings
-from routers import auth, conversation, audio
+from routers import auth, conversation, audio, turn
+from services.limiter import limiter_stats
+from services.llm import close_openai_client, llm_stats
+from services.providers import provider_stats
+from services.rate_limit import RateLimitMiddleware, rate_limit_stats
+from services.uploads import UploadLimitMiddleware
+from services.scheduler import scheduler_stats
+from services.singleflight import coalescing_stats
+from services.idempotency import idempotency_store
+from services import google_audio
 
 
 settings = get_settings()
@@ -18,8 +27,11 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     print(f"🚀 Starting {settings.app_name}")
+    await google_audio.start_clients()
     yield
     # Shutdown
+    await close_openai_client()
+    await google_audio.close_clients()
     print(f"👋 Shutting down {settings.app_name}")
 
 
@@ -30,6 +42,12 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Oversized uploads are refused before their body is parsed
+app.add_middleware(UploadLimitMiddleware)
+
+# Admission control; added before CORS so CORS wraps it and 429s carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +61,7 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(conversation.router, prefix="/api/conversation", tags=["Conversation"])
 app.include_router(audio.router, prefix="/api/audio", tags=["Audio"])
+app.include_router(turn.router, prefix="/api/turn", tags=["Turn"])
 
 
 @app.get("/")
@@ -58,13 +77,22 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
+    circuits = provider_stats()
     return {
-        "status": "healthy",
+        "status": "degraded" if any(c["state"] != "closed" for c in circuits.values()) else "healthy",
         "services": {
             "database": "connected",
             "openai": "configured",
             "google_cloud": "configured"
-        }
+        },
+        "circuits": circuits,
+        "concurrency": limiter_stats(),
+        "scheduler": scheduler_stats(),
+        "coalescing": coalescing_stats(),
+        "idempotency": idempotency_store.stats(),
+        "llm": llm_stats(),
+        "stt": google_audio.stt_stats(),
+        "rate_limit": rate_limit_stats()
     }
 
 
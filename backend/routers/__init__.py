@@ -1,2 +1,2 @@
 """Routers package"""
-from . import auth, conversation, audio
+from . import auth, conversation, audio, turn
@@ -2,59 +2,33 @@
 Audio Router
 Handles speech-to-text and text-to-speech processing
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import Response
-from pydantic import BaseModel
-from typing import Optional
-import tempfile
-import os
+from fastapi import APIRouter, Header, HTTPException, Request, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Optional
+import asyncio
+import base64
 import json
+import math
 
-from google.cloud import speech_v1p1beta1 as speech
-from google.cloud import texttospeech
 import sys
 sys.path.append('..')
 from config import get_settings
+from audio_format import AudioFormatError
+from resilience import CircuitOpen
+from services import google_audio, rate_limit
+from services.providers import circuit_open_headers, tts_breaker
+from services.idempotency import request_fingerprint, run_idempotent
+from services.scheduler import REPLAY, priority
+from services.sse import format_sse
+from services.uploads import read_audio_upload
+from tts_cache import make_cache_key
 
 router = APIRouter()
 settings = get_settings()
 
-
-def setup_google_credentials():
-    """Setup Google Cloud credentials from settings"""
-    if settings.google_credentials_path and os.path.isfile(settings.google_credentials_path):
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = settings.google_credentials_path
-    elif settings.google_credentials_json:
-        # Write JSON credentials to temp file
-        creds = json.loads(settings.google_credentials_json)
-        if 'private_key' in creds:
-            creds['private_key'] = creds['private_key'].replace('\\n', '\n')
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(creds, f)
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = f.name
-
-
-# Setup credentials on module load
-setup_google_credentials()
-
-# Initialize clients (lazy loading)
-_speech_client = None
-_tts_client = None
-
-
-def get_speech_client():
-    global _speech_client
-    if _speech_client is None:
-        _speech_client = speech.SpeechClient()
-    return _speech_client
-
-
-def get_tts_client():
-    global _tts_client
-    if _tts_client is None:
-        _tts_client = texttospeech.TextToSpeechClient()
-    return _tts_client
+# Audio frames buffered per streaming session; a full queue stops reading from the socket
+STREAM_QUEUE_FRAMES = 32
 
 
 # ==================== Pydantic Models ====================
@@ -68,6 +42,16 @@ class TranscribeResponse(BaseModel):
     """Transcription response"""
     transcript: str
     confidence: Optional[float] = None
+    audio: Optional[dict] = None  # format, bytes received/sent, speech and trimmed silence (ms)
+
+
+class StreamingTranscribeConfig(BaseModel):
+    """First message of a streaming transcription session"""
+    language_code: str = "en-US"
+    sample_rate_hertz: int = 16000
+    encoding: str = "LINEAR16"  # LINEAR16, OGG_OPUS or WEBM_OPUS
+    interim_results: bool = True
+    single_utterance: bool = False
 
 
 class SynthesizeRequest(BaseModel):
@@ -77,65 +61,60 @@ class SynthesizeRequest(BaseModel):
     voice_name: str = "en-US-Journey-F"
 
 
+class SynthesizeBatchRequest(BaseModel):
+    """Several texts to synthesize in one round trip"""
+    items: List[SynthesizeRequest] = Field(..., min_length=1)
+
+
 # ==================== Audio Endpoints ====================
 
 @router.post("/transcribe", response_model=TranscribeResponse)
 async def transcribe_audio(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...),
-    language_code: str = "en-US"
+    language_code: str = "en-US",
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Transcribe audio file to text using Google Cloud Speech-to-Text
     
-    - Accepts WAV, WEBM, or MP3 audio files
+    - Accepts WAV, FLAC, OGG/WEBM Opus, or MP3 audio files; WAV is downmixed and
+      resampled to 16 kHz mono before it is sent to Google
+    - Leading and trailing silence is trimmed before STT and all-silent WAV clips
+      return an empty transcript without a Google call; `audio` reports what was removed
     - Returns transcribed text with confidence score
+    - A retry with the same `Idempotency-Key` header reuses the first transcription
+    - 413 beyond MAX_UPLOAD_MB or MAX_AUDIO_SECONDS
     """
     try:
-        # Read audio content
-        audio_content = await file.read()
-        
-        if not audio_content:
-            raise HTTPException(status_code=400, detail="Empty audio file")
-        
-        client = get_speech_client()
+        audio_content = await read_audio_upload(file)
         
-        # Create audio object
-        audio = speech.RecognitionAudio(content=audio_content)
+        async def run() -> TranscribeResponse:
+            audio_report = {}
+            transcript, avg_confidence = await google_audio.transcribe(
+                audio_content, language_code, audio_report=audio_report
+            )
+            return TranscribeResponse(
+                transcript=transcript,
+                confidence=avg_confidence,
+                audio=audio_report
+            )
         
-        # Configure recognition
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=48000,
-            language_code=language_code,
-            enable_automatic_punctuation=True,
-            model="default"
-        )
-        
-        # Perform transcription
-        response = client.recognize(config=config, audio=audio)
-        
-        if not response.results:
-            return TranscribeResponse(transcript="", confidence=0.0)
-        
-        # Combine all transcripts
-        transcript = " ".join([
-            result.alternatives[0].transcript 
-            for result in response.results
-        ]).strip()
-        
-        # Get average confidence
-        confidences = [
-            result.alternatives[0].confidence 
-            for result in response.results 
-            if result.alternatives
-        ]
-        avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-        
-        return TranscribeResponse(
-            transcript=transcript,
-            confidence=avg_confidence
+        result, replayed = await run_idempotent(
+            request, "transcribe", idempotency_key, request_fingerprint(audio_content, language_code), run
         )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
         
+    except HTTPException:
+        raise
+    except AudioFormatError as e:
+        raise HTTPException(status_code=400, detail=f"Unsupported audio: {str(e)}")
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=f"Transcription unavailable: {str(e)}",
+                            headers=circuit_open_headers(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -143,46 +122,154 @@ async def transcribe_audio(
         )
 
 
+@router.websocket("/transcribe/stream")
+async def transcribe_stream(websocket: WebSocket):
+    """
+    Stream audio while the learner is speaking and receive transcripts as they form
+    
+    Protocol:
+    1. Client sends a JSON config message (see StreamingTranscribeConfig)
+    2. Client sends audio as binary frames
+    3. Client sends {"event": "end"} (or closes) when the learner stops talking
+    
+    Server sends {"type": "interim" | "final", "transcript", "confidence", "stability"}
+    messages, then {"type": "done", "transcript"} with the joined final transcript.
+    A session sending more than max_upload_mb (or, for LINEAR16, more than
+    max_audio_seconds) of audio gets an error message and is closed with 1009.
+    """
+    await websocket.accept()
+    
+    try:
+        config = StreamingTranscribeConfig(**await websocket.receive_json())
+    except (ValidationError, ValueError, TypeError) as e:
+        await websocket.send_json({"type": "error", "detail": f"Invalid config: {str(e)}"})
+        await websocket.close(code=1003)
+        return
+    except WebSocketDisconnect:
+        return
+    
+    max_bytes = int(settings.max_upload_mb * 1024 * 1024)
+    if config.encoding == "LINEAR16":
+        max_bytes = min(max_bytes, int(settings.max_audio_seconds * config.sample_rate_hertz * 2))
+    audio_queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_FRAMES)
+    too_large = False
+    
+    async def receive_audio():
+        nonlocal too_large
+        received = 0
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    received += len(message["bytes"])
+                    if received > max_bytes:
+                        too_large = True
+                        break
+                    await audio_queue.put(message["bytes"])
+                elif message.get("text"):
+                    try:
+                        if json.loads(message["text"]).get("event") == "end":
+                            break
+                    except (ValueError, AttributeError):
+                        pass
+        finally:
+            await audio_queue.put(None)
+    
+    async def audio_chunks():
+        while True:
+            chunk = await audio_queue.get()
+            if chunk is None:
+                return
+            yield chunk
+    
+    receiver = asyncio.create_task(receive_audio())
+    final_transcripts = []
+    try:
+        async for result in google_audio.stream_transcribe(
+            audio_chunks(),
+            language_code=config.language_code,
+            sample_rate_hertz=config.sample_rate_hertz,
+            encoding=config.encoding,
+            interim_results=config.interim_results,
+            single_utterance=config.single_utterance
+        ):
+            if result["is_final"]:
+                final_transcripts.append(result["transcript"])
+            await websocket.send_json({
+                "type": "final" if result["is_final"] else "interim",
+                **result
+            })
+        
+        if too_large:
+            await websocket.send_json({
+                "type": "error",
+                "detail": f"Audio stream is longer than {settings.max_audio_seconds:g} seconds "
+                          f"or larger than {settings.max_upload_mb:g} MB"
+            })
+            await websocket.close(code=1009)
+            return
+        await websocket.send_json({
+            "type": "done",
+            "transcript": " ".join(t for t in final_transcripts if t).strip()
+        })
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        try:
+            await websocket.send_json({"type": "error", "detail": f"Transcription error: {str(e)}"})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        receiver.cancel()
+
+
 @router.post("/synthesize")
-async def synthesize_speech(request: SynthesizeRequest):
+async def synthesize_speech(
+    request: SynthesizeRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Convert text to speech using Google Cloud Text-to-Speech
     
     - Returns MP3 audio file
     - Supports multiple voices and languages
+    - 503 with Retry-After while the TTS circuit is open: clients should fall back
+      to text-only mode
+    - Scheduled as a replay: behind live turns, ahead of background work
+    - A retry with the same `Idempotency-Key` header reuses the first result
     """
+    async def run() -> bytes:
+        with priority(REPLAY):
+            return await google_audio.synthesize(
+                request.text,
+                language_code=request.language_code,
+                voice_name=request.voice_name
+            )
+    
     try:
-        client = get_tts_client()
-        
-        # Create synthesis input
-        synthesis_input = texttospeech.SynthesisInput(text=request.text)
-        
-        # Configure voice
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=request.language_code,
-            name=request.voice_name
-        )
-        
-        # Configure audio output
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3
-        )
-        
-        # Perform synthesis
-        response = client.synthesize_speech(
-            input=synthesis_input,
-            voice=voice,
-            audio_config=audio_config
+        audio_content, replayed = await run_idempotent(
+            http_request, "synthesize", idempotency_key, request_fingerprint(request.model_dump_json()), run
         )
+        headers = {"Content-Disposition": "attachment; filename=speech.mp3"}
+        if replayed:
+            headers["Idempotent-Replayed"] = "true"
         
         return Response(
-            content=response.audio_content,
+            content=audio_content,
             media_type="audio/mpeg",
-            headers={
-                "Content-Disposition": "attachment; filename=speech.mp3"
-            }
+            headers=headers
         )
         
+    except HTTPException:
+        raise
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=f"Speech synthesis unavailable: {str(e)}",
+                            headers=circuit_open_headers(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -190,31 +277,95 @@ async def synthesize_speech(request: SynthesizeRequest):
         )
 
 
+@router.post("/synthesize/batch")
+async def synthesize_speech_batch(request: SynthesizeBatchRequest, http_request: Request):
+    """
+    Synthesize several texts in one round trip, streamed as server-sent events
+    
+    Meant for loading a transcript's audio (earlier tutor messages, corrections).
+    Identical items (same normalized text, voice and language) are synthesized
+    once; up to TTS_BATCH_CONCURRENCY run at a time, as replays behind live turns.
+    Events, in order of completion:
+    - `audio`: {indexes, audio} base64 MP3 for the items at those request indexes
+    - `error`: {indexes, detail} the items at those indexes failed
+    - `done`: {items, unique, failed}
+    503 with Retry-After while the TTS circuit is open; 413 beyond TTS_BATCH_MAX_ITEMS.
+    Each uncached item costs RATE_LIMIT_BATCH_ITEM_COST rate-limit tokens on top of
+    the request itself: 429 with Retry-After when they are not available, 413 when
+    the batch could never fit the per-user burst.
+    """
+    if len(request.items) > settings.tts_batch_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.tts_batch_max_items} items per batch")
+    if not google_audio.tts_available():
+        raise HTTPException(status_code=503, detail="Speech synthesis unavailable",
+                            headers={"Retry-After": str(max(1, int(tts_breaker.retry_after() + 0.5)))})
+    
+    # Request indexes per distinct synthesis, in first-seen order
+    groups: Dict[str, List[int]] = {}
+    unique: Dict[str, SynthesizeRequest] = {}
+    for index, item in enumerate(request.items):
+        key = make_cache_key(item.text, item.voice_name, item.language_code, "MP3")
+        groups.setdefault(key, []).append(index)
+        unique.setdefault(key, item)
+    
+    cached = await asyncio.to_thread(lambda: sum(google_audio.tts_cache.contains(key) for key in unique))
+    cost = (len(unique) - cached) * settings.rate_limit_batch_item_cost
+    if cost > settings.rate_limit_user_burst:
+        raise HTTPException(status_code=413, detail="Too many uncached items in one batch, please split it")
+    allowed, wait = await rate_limit.charge(http_request.scope, cost)
+    if not allowed:
+        raise HTTPException(status_code=429, detail="Too many requests, please slow down",
+                            headers={"Retry-After": str(max(1, math.ceil(wait)))})
+    
+    semaphore = asyncio.Semaphore(settings.tts_batch_concurrency)
+    
+    async def synthesize_one(key: str):
+        item = unique[key]
+        async with semaphore:
+            with priority(REPLAY):
+                try:
+                    audio = await google_audio.synthesize(
+                        item.text, language_code=item.language_code, voice_name=item.voice_name
+                    )
+                    return "audio", {"indexes": groups[key], "audio": base64.b64encode(audio).decode()}
+                except Exception as e:
+                    return "error", {"indexes": groups[key], "detail": str(e)}
+    
+    async def event_stream():
+        tasks = [asyncio.create_task(synthesize_one(key)) for key in unique]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event, data = await next_done
+                failed += len(data["indexes"]) if event == "error" else 0
+                yield format_sse(event, data)
+            yield format_sse("done", {"items": len(request.items), "unique": len(unique), "failed": failed})
+        finally:
+            # Client went away: stop what has not started yet
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/cache/stats")
+async def get_tts_cache_stats():
+    """
+    Get TTS cache hit/miss counters and tier sizes
+    """
+    return google_audio.tts_cache.stats()
+
+
 @router.get("/voices")
 async def get_voices(language: str = "en"):
     """
     Get available voice options for a language
     """
-    voices = {
-        "en": [
-            {"id": "en-US-Journey-F", "name": "Journey Female", "gender": "female"},
-            {"id": "en-US-Journey-D", "name": "Journey Male", "gender": "male"},
-            {"id": "en-US-Studio-O", "name": "Studio Female", "gender": "female"},
-            {"id": "en-US-Studio-M", "name": "Studio Male", "gender": "male"},
-            {"id": "en-US-Neural2-F", "name": "Neural2 Female", "gender": "female"},
-            {"id": "en-US-Neural2-D", "name": "Neural2 Male", "gender": "male"}
-        ],
-        "fr": [
-            {"id": "fr-FR-Neural2-A", "name": "Neural2 Female A", "gender": "female"},
-            {"id": "fr-FR-Neural2-B", "name": "Neural2 Male B", "gender": "male"},
-            {"id": "fr-FR-Neural2-C", "name": "Neural2 Female C", "gender": "female"},
-            {"id": "fr-FR-Neural2-D", "name": "Neural2 Male D", "gender": "male"},
-            {"id": "fr-FR-Standard-A", "name": "Standard Female A", "gender": "female"},
-            {"id": "fr-FR-Standard-B", "name": "Standard Male B", "gender": "male"}
-        ]
-    }
-    
-    return {"voices": voices.get(language, voices["en"])}
+    return {"voices": google_audio.VOICES.get(language, google_audio.VOICES["en"])}
 
 
 @router.get("/languages")
@@ -6,6 +6,7 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import datetime, timedelta
+import asyncio
 import httpx
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -14,6 +15,8 @@ from supabase import create_client, Client
 import sys
 sys.path.append('..')
 from config import get_settings
+from resilience import NO_RETRY, CircuitOpen, call
+from services.providers import circuit_open_headers, retry_policy, supabase_breaker
 
 router = APIRouter()
 settings = get_settings()
@@ -56,6 +59,23 @@ class OAuthCallback(BaseModel):
 
 # ==================== Helper Functions ====================
 
+async def execute_query(query, retry: bool = True):
+    """
+    Run a Supabase query through the circuit breaker (only retry idempotent queries)
+    The client and its retry backoff block, so they run in a worker thread.
+    """
+    return await asyncio.to_thread(call, supabase_breaker, query.execute, retry_policy if retry else NO_RETRY)
+
+
+def unavailable(error: CircuitOpen) -> HTTPException:
+    """503 with Retry-After while the user database is failing fast"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="User database temporarily unavailable, please retry shortly",
+        headers=circuit_open_headers(error)
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -83,7 +103,7 @@ async def login(credentials: UserLogin):
     """
     try:
         # Query user from Supabase
-        result = supabase.table("users").select("*").eq("username", credentials.username).execute()
+        result = await execute_query(supabase.table("users").select("*").eq("username", credentials.username))
         
         if not result.data:
             raise HTTPException(
@@ -115,6 +135,8 @@ async def login(credentials: UserLogin):
         )
     except HTTPException:
         raise
+    except CircuitOpen as e:
+        raise unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -129,7 +151,7 @@ async def register(user_data: UserRegister):
     """
     try:
         # Check if username exists
-        existing = supabase.table("users").select("id").eq("username", user_data.username).execute()
+        existing = await execute_query(supabase.table("users").select("id").eq("username", user_data.username))
         if existing.data:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -137,7 +159,7 @@ async def register(user_data: UserRegister):
             )
         
         # Check if email exists
-        existing_email = supabase.table("users").select("id").eq("email", user_data.email).execute()
+        existing_email = await execute_query(supabase.table("users").select("id").eq("email", user_data.email))
         if existing_email.data:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -145,14 +167,14 @@ async def register(user_data: UserRegister):
             )
         
         # Create user
-        new_user = supabase.table("users").insert({
+        new_user = await execute_query(supabase.table("users").insert({
             "username": user_data.username,
             "email": user_data.email,
             "password_hash": hash_password(user_data.password),
             "full_name": user_data.full_name,
             "is_admin": False,
             "created_at": datetime.utcnow().isoformat()
-        }).execute()
+        }), retry=False)
         
         user = new_user.data[0]
         
@@ -171,6 +193,8 @@ async def register(user_data: UserRegister):
         )
     except HTTPException:
         raise
+    except CircuitOpen as e:
+        raise unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -244,13 +268,13 @@ async def kakao_callback(callback: OAuthCallback):
             nickname = profile.get("nickname", f"kakao_user_{kakao_id}")
             
             # Find or create user
-            existing = supabase.table("users").select("*").eq("oauth_provider", "kakao").eq("oauth_id", kakao_id).execute()
+            existing = await execute_query(supabase.table("users").select("*").eq("oauth_provider", "kakao").eq("oauth_id", kakao_id))
             
             if existing.data:
                 user = existing.data[0]
             else:
                 # Create new user
-                new_user = supabase.table("users").insert({
+                new_user = await execute_query(supabase.table("users").insert({
                     "username": f"kakao_{kakao_id}",
                     "email": email,
                     "full_name": nickname,
@@ -258,7 +282,7 @@ async def kakao_callback(callback: OAuthCallback):
                     "oauth_id": kakao_id,
                     "is_admin": False,
                     "created_at": datetime.utcnow().isoformat()
-                }).execute()
+                }), retry=False)
                 user = new_user.data[0]
             
             # Create JWT token
@@ -276,6 +300,8 @@ async def kakao_callback(callback: OAuthCallback):
             )
     except HTTPException:
         raise
+    except CircuitOpen as e:
+        raise unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -346,13 +372,13 @@ async def naver_callback(callback: OAuthCallback):
             nickname = naver_user.get("nickname") or naver_user.get("name", f"naver_user_{naver_id}")
             
             # Find or create user
-            existing = supabase.table("users").select("*").eq("oauth_provider", "naver").eq("oauth_id", naver_id).execute()
+            existing = await execute_query(supabase.table("users").select("*").eq("oauth_provider", "naver").eq("oauth_id", naver_id))
             
             if existing.data:
                 user = existing.data[0]
             else:
                 # Create new user
-                new_user = supabase.table("users").insert({
+                new_user = await execute_query(supabase.table("users").insert({
                     "username": f"naver_{naver_id}",
                     "email": email,
                     "full_name": nickname,
@@ -360,7 +386,7 @@ async def naver_callback(callback: OAuthCallback):
                     "oauth_id": naver_id,
                     "is_admin": False,
                     "created_at": datetime.utcnow().isoformat()
-                }).execute()
+                }), retry=False)
                 user = new_user.data[0]
             
             # Create JWT token
@@ -378,6 +404,8 @@ async def naver_callback(callback: OAuthCallback):
             )
     except HTTPException:
         raise
+    except CircuitOpen as e:
+        raise unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -397,7 +425,7 @@ async def get_current_user(token: str):
         if not username:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        result = supabase.table("users").select("*").eq("username", username).execute()
+        result = await execute_query(supabase.table("users").select("*").eq("username", username))
         
         if not result.data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -413,3 +441,5 @@ async def get_current_user(token: str):
         }
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    except CircuitOpen as e:
+        raise unavailable(e)
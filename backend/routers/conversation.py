@@ -2,128 +2,284 @@
 Conversation Router
 Handles AI conversation interactions
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
-import re
+import asyncio
+import base64
+import logging
+import time
 
-from openai import OpenAI
 import sys
 sys.path.append('..')
 from config import get_settings
+from llm_deadline import Deadline, DeadlineExceeded, canned_reply
+from response_parser import parse_tutor_response
+from services.llm import complete
+from services.tutor import (
+    build_request_messages, generate_correction, language_code_for, schedule_history_fold, stream_reply
+)
+from services.sessions import Message, load_session, session_store
+from services.openers import generate_openers, opener_cache
+from services import google_audio
+from services.scheduler import interactive_budget
+from services.idempotency import request_fingerprint, run_idempotent
+from services.sse import format_sse
 
 router = APIRouter()
 settings = get_settings()
-
-# OpenAI client
-openai_client = OpenAI(api_key=settings.openai_api_key)
+logger = logging.getLogger(__name__)
 
 
 # ==================== Pydantic Models ====================
 
-class Message(BaseModel):
-    """Chat message model"""
-    role: str  # "user" or "assistant"
-    content: str
-
-
 class ConversationRequest(BaseModel):
     """Conversation request model"""
     message: str
+    session_id: Optional[str] = None  # use server-held history and settings instead of `history`
     history: Optional[List[Message]] = []
     language: str = "English"  # "English" or "French"
     level: str = "Intermediate (B1-B2)"
     persona: str = "Friendly"
     topic: str = "General"
+    voice_name: Optional[str] = None  # streaming only: also synthesize each sentence
+    language_code: Optional[str] = None
+    split_correction: bool = False  # generate the reply and the correction as two parallel requests
 
 
 class ConversationResponse(BaseModel):
     """Conversation response model"""
     conversation: str
     correction: Optional[str] = None
+    source: str = "primary"  # "primary", "hedge", "fallback" or "canned"
+
+
+class SessionCreateRequest(BaseModel):
+    """Session creation request model"""
+    language: str = "English"
+    level: str = "Intermediate (B1-B2)"
+    persona: str = "Friendly"
+    topic: str = "General"
+
+
+class SessionStartRequest(SessionCreateRequest):
+    """Session start request model"""
+    voice_name: Optional[str] = None
+    language_code: Optional[str] = None
+
+
+class SessionStartResponse(BaseModel):
+    """Session start response model"""
+    session_id: str
+    conversation: str
+    audio: Optional[str] = None  # base64 MP3
+    cached: bool
+
+
+class SessionResponse(BaseModel):
+    """Session state response model"""
+    session_id: str
+    settings: dict
+    messages: List[Message] = []
+    summary: Optional[str] = None
+    created_at: str
 
 
 # ==================== Conversation Endpoints ====================
 
 @router.post("/send", response_model=ConversationResponse)
-async def send_message(request: ConversationRequest):
+async def send_message(
+    request: ConversationRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Send a message to the AI tutor and receive a response
+    
+    The reply is bounded by the turn deadline (hedged request, then the fallback
+    model); when nothing answers in time a canned reply is returned instead.
+    A retry with the same `Idempotency-Key` header gets the original reply
+    (marked `Idempotent-Replayed: true`) instead of a new one.
+    
+    With `split_correction` the reply and the correction are requested in parallel,
+    so the response takes the longer of the two rather than their sum; it still
+    carries both. Clients that want the reply before the correction should use
+    /send/stream, which sends the correction as its own event.
     """
+    session = await load_session(request.session_id)
+    
+    async def run() -> ConversationResponse:
+        started = time.perf_counter()
+        deadline = Deadline(settings.llm_turn_deadline_seconds)
+        try:
+            messages, correction_messages = build_request_messages(request, session)
+            language = session.tutor_settings.get("language", request.language) if session else request.language
+            
+            async def reply():
+                try:
+                    content, source = await complete(messages, deadline)
+                except DeadlineExceeded:
+                    if not settings.llm_canned_reply_enabled:
+                        raise
+                    content, source = canned_reply(language), "canned"
+                return {**parse_tutor_response(content), "source": source}
+            
+            async def correction():
+                try:
+                    return await generate_correction(correction_messages, deadline)
+                except Exception as e:
+                    logger.warning("Correction error: %s", e)
+                    return None
+            
+            # Call OpenAI (reply and correction side by side when split)
+            if correction_messages:
+                parsed, parsed_correction = await asyncio.gather(reply(), correction())
+                parsed["correction"] = parsed_correction
+            else:
+                parsed = await reply()
+            interactive_budget.observe_turn(time.perf_counter() - started)
+            
+            if session:
+                await session_store.append(
+                    session,
+                    {"role": "user", "content": request.message},
+                    {"role": "assistant", "content": parsed["conversation"]}
+                )
+                schedule_history_fold(session)
+            
+            return ConversationResponse(
+                conversation=parsed["conversation"],
+                correction=parsed["correction"],
+                source=parsed["source"]
+            )
+            
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Conversation error: {str(e)}"
+            )
+    
+    result, replayed = await run_idempotent(
+        http_request, "send", idempotency_key, request_fingerprint(request.model_dump_json()), run
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+@router.post("/send/stream")
+async def send_message_stream(request: ConversationRequest):
+    """
+    Send a message to the AI tutor and stream the response as server-sent events
+    
+    - `conversation`: conversation text deltas, forwarded as tokens arrive
+    - `correction`: the grammar correction, sent once its block closes (with
+      `split_correction`, as soon as the parallel correction request finishes)
+    - `audio`: base64 MP3 for each finished sentence, in order (when `voice_name` is set)
+    - `text_only`: speech synthesis is unavailable, the reply continues without audio
+    - `done`: the final parsed conversation and correction
+    - `error`: sent instead of `done` if generation fails
+    """
+    session = await load_session(request.session_id)
+    messages, correction_messages = build_request_messages(request, session)
+    language = session.tutor_settings.get("language", request.language) if session else request.language
+    language_code = request.language_code or language_code_for(language)
+
+    async def event_stream():
+        try:
+            async for event, data in stream_reply(messages, request.voice_name, language_code, correction_messages):
+                if event == "done" and session:
+                    await session_store.append(
+                        session,
+                        {"role": "user", "content": request.message},
+                        {"role": "assistant", "content": data["conversation"]}
+                    )
+                    schedule_history_fold(session)
+                yield format_sse(event, data)
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Conversation error: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ==================== Session Endpoints ====================
+
+@router.post("/sessions", response_model=SessionResponse)
+async def create_session(request: SessionCreateRequest):
+    """
+    Start a server-held conversation session
+    
+    Pass the returned `session_id` to /send, /send/stream or /api/turn so each
+    turn only uploads the new message.
+    """
+    session = await session_store.create(request.model_dump())
+    return SessionResponse(**session.to_dict())
+
+
+@router.post("/start", response_model=SessionStartResponse)
+async def start_session(request: SessionStartRequest):
+    """
+    Start a session and get the tutor's first message right away
+    
+    Served from the precomputed opener cache (text and audio for the voice) when
+    available; otherwise the opener is generated and synthesized live. The cache
+    follows manifest rewrites by scripts/generate_openers.py without a restart.
+    """
+    tutor_settings = request.model_dump(include={"language", "level", "persona", "topic"})
+    opener = await opener_cache.pick(voice_name=request.voice_name, **tutor_settings)
+    cached = opener is not None
+    
     try:
-        language_name = "French" if request.language == "French" else "English"
-        
-        sys_prompt = f"""You are an experienced {language_name} language tutor with a {request.persona.lower()} teaching style.
-
-Your role:
-- Help students practice {language_name} conversation on the topic of {request.topic}
-- Adapt your language to {request.level} proficiency
-- Keep responses natural and conversational (2-3 sentences)
-- Provide grammar corrections when needed WITHOUT interrupting the conversation flow
-
-CRITICAL: You MUST use this exact format for EVERY response:
-
-<conversation>
-[Your natural, conversational response here - NO corrections, NO grammar mentions, ONLY conversation]
-</conversation>
-
-<correction>
-[ONLY if there was a grammar/vocabulary/spelling error, write it here. Otherwise leave empty]
-[Format: "You said: '[incorrect phrase]' → Better: '[corrected phrase]' - [brief explanation]"]
-</correction>
-
-IMPORTANT RULES:
-1. The <conversation> section should NEVER mention errors or corrections
-2. The <conversation> section should flow naturally as if nothing was wrong
-3. Keep the conversation going - ask follow-up questions, show interest
-4. The <correction> section is COMPLETELY SEPARATE - only grammar fixes go there
-5. If there are no errors, leave <correction> empty 
-6. Do NOT mix conversation and correction - they are separate sections
-
-Topic: {request.topic}
-Level: {request.level}
-Persona: {request.persona}
-"""
-        
-        # Build messages for API
-        messages = [{"role": "system", "content": sys_prompt}]
-        
-        # Add conversation history (last 6 turns)
-        for msg in request.history[-6:]:
-            messages.append({"role": msg.role, "content": msg.content})
-        
-        # Add current message
-        messages.append({"role": "user", "content": request.message})
-        
-        # Call OpenAI
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-        
-        full_response = response.choices[0].message.content.strip()
-        
-        # Parse the response
-        conversation_match = re.search(r'<conversation>(.*?)</conversation>', full_response, re.DOTALL)
-        correction_match = re.search(r'<correction>(.*?)</correction>', full_response, re.DOTALL)
-        
-        conversation = conversation_match.group(1).strip() if conversation_match else full_response
-        correction = correction_match.group(1).strip() if correction_match else None
-        
-        # Clean up empty or placeholder corrections
-        if correction and (len(correction) < 3 or correction.strip() in ['-', 'none', 'n/a', 'None', 'N/A']):
-            correction = None
-        
-        return ConversationResponse(
-            conversation=conversation,
-            correction=correction
-        )
-        
+        if opener is None:
+            texts = await generate_openers(count=1, **tutor_settings)
+            if not texts:
+                raise ValueError("no opener generated")
+            opener = {"text": texts[0], "audio": None}
+        # Text-only opener while the TTS circuit is open (PRD 5.3)
+        if opener["audio"] is None and request.voice_name and google_audio.tts_available():
+            opener["audio"] = await google_audio.synthesize(
+                opener["text"],
+                language_code=request.language_code or language_code_for(request.language),
+                voice_name=request.voice_name
+            )
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Conversation error: {str(e)}"
-        )
+        if opener is None:
+            raise HTTPException(status_code=500, detail=f"Opener error: {str(e)}")
+    
+    session = await session_store.create(tutor_settings)
+    await session_store.append(session, {"role": "assistant", "content": opener["text"]})
+    
+    return SessionStartResponse(
+        session_id=session.session_id,
+        conversation=opener["text"],
+        audio=base64.b64encode(opener["audio"]).decode() if opener["audio"] else None,
+        cached=cached
+    )
+
+
+@router.get("/sessions/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str):
+    """
+    Get a session's settings and recent messages
+    """
+    session = await load_session(session_id)
+    return SessionResponse(**session.to_dict())
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """
+    End a session and discard its history
+    """
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": True}
 
 
 @router.get("/topics")
@@ -0,0 +1,181 @@
+"""
+Turn Router
+Runs a whole conversation turn (STT -> LLM -> TTS) in a single round trip
+"""
+from fastapi import APIRouter, Header, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from typing import List, Optional
+import time
+
+import sys
+sys.path.append('..')
+from config import get_settings
+from llm_deadline import Deadline
+from services import google_audio
+from services.tutor import (
+    build_correction_messages, build_messages, language_code_for, schedule_history_fold, stream_reply
+)
+from services.scheduler import interactive_budget
+from services.sessions import Message, load_session, session_store
+from services.idempotency import EventRecording, idempotency_store, request_fingerprint, run_idempotent, scoped_key
+from services.sse import format_sse
+from services.uploads import read_audio_upload
+
+router = APIRouter()
+settings = get_settings()
+
+history_adapter = TypeAdapter(List[Message])
+
+
+def elapsed_ms(start: float) -> int:
+    """Milliseconds since a perf_counter() timestamp"""
+    return int((time.perf_counter() - start) * 1000)
+
+
+# ==================== Turn Endpoints ====================
+
+@router.post("")
+async def run_turn(
+    request: Request,
+    file: UploadFile = File(...),
+    language: str = Form("English"),
+    level: str = Form("Intermediate (B1-B2)"),
+    persona: str = Form("Friendly"),
+    topic: str = Form("General"),
+    voice_name: str = Form("en-US-Journey-F"),
+    language_code: Optional[str] = Form(None),
+    history: str = Form("[]"),
+    session_id: Optional[str] = Form(None),
+    split_correction: bool = Form(False),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Run one conversation turn server-side and stream the results as server-sent events
+    
+    Accepts the learner's recording plus session settings (multipart form, `history`
+    as a JSON list of {role, content}). With a `session_id`, history and tutor
+    settings come from the server-held session instead. With `split_correction`,
+    the correction is generated by a parallel request so it never delays the reply.
+    Events, in order of availability:
+    - `transcript`: what the learner said, with confidence and the audio report
+      (silence trimmed before STT; all-silent clips end the turn without a Google call)
+    - `conversation`: tutor reply text deltas
+    - `correction`: the grammar correction, once its block closes
+    - `audio`: base64 MP3 per reply sentence, in order
+    - `text_only`: speech synthesis is unavailable, the reply continues without audio
+    - `done`: final transcript, conversation, correction, reply source and per-stage timings (ms)
+    - `error`: sent instead of `done` if a stage fails
+    
+    The recording is subject to the same size and duration limits as
+    /api/audio/transcribe (413).
+    
+    A retry with the same `Idempotency-Key` header does not run the turn again: it
+    replays the events so far and follows the original turn to its end. The turn
+    keeps running if the client disconnects, so a retry can pick it up.
+    """
+    # Settle the form fields first: a bad request must fail before STT is billed
+    session = await load_session(session_id)
+    if session:
+        history_messages = session.history()
+        tutor_settings = {**session.tutor_settings, "summary": session.summary}
+        language = tutor_settings.get("language", language)
+    else:
+        try:
+            history_messages = [m.model_dump() for m in history_adapter.validate_json(history)]
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid history: {str(e)}")
+        tutor_settings = {"language": language, "level": level, "persona": persona, "topic": topic}
+    
+    audio_content = await read_audio_upload(file)
+    
+    speech_language_code = language_code or language_code_for(language)
+    
+    async def turn_events():
+        turn_start = time.perf_counter()
+        # One budget for the whole turn: the LLM gets whatever STT leaves of it
+        deadline = Deadline(settings.llm_turn_deadline_seconds)
+        timings = {}
+        try:
+            # 1. Speech-to-text
+            audio_report = {}
+            transcript, confidence = await google_audio.transcribe(
+                audio_content, speech_language_code, budget_seconds=deadline.remaining(),
+                audio_report=audio_report
+            )
+            timings["stt_ms"] = elapsed_ms(turn_start)
+            yield "transcript", {"text": transcript, "confidence": confidence, "audio": audio_report}
+            
+            if not transcript:
+                timings["total_ms"] = elapsed_ms(turn_start)
+                yield "done", {
+                    "transcript": "",
+                    "conversation": None,
+                    "correction": None,
+                    "no_speech": True,
+                    "timings": timings
+                }
+                return
+            
+            # 2. LLM reply, with 3. sentence-level TTS running alongside it
+            correction_messages = None
+            if split_correction:
+                messages = build_messages(transcript, history_messages, mode="conversation", **tutor_settings)
+                correction_messages = build_correction_messages(transcript, history_messages, **tutor_settings)
+            else:
+                messages = build_messages(transcript, history_messages, **tutor_settings)
+            llm_start = time.perf_counter()
+            async for event, data in stream_reply(
+                messages, voice_name, speech_language_code, correction_messages, deadline
+            ):
+                if event == "correction" and split_correction:
+                    timings["correction_ms"] = elapsed_ms(llm_start)
+                elif event in ("conversation", "correction"):
+                    timings.setdefault("llm_first_text_ms", elapsed_ms(llm_start))
+                    timings["llm_ms"] = elapsed_ms(llm_start)
+                elif event == "audio":
+                    timings.setdefault("tts_first_audio_ms", elapsed_ms(llm_start))
+                
+                if event == "done":
+                    if session:
+                        await session_store.append(
+                            session,
+                            {"role": "user", "content": transcript},
+                            {"role": "assistant", "content": data["conversation"]}
+                        )
+                        schedule_history_fold(session)
+                    timings["total_ms"] = elapsed_ms(turn_start)
+                    interactive_budget.observe_turn(timings["total_ms"] / 1000)
+                    data = {"transcript": transcript, **data, "no_speech": False, "timings": timings}
+                yield event, data
+        except Exception as e:
+            if idempotency_key:
+                # A failed turn is not replayed: a retry with the same key runs it again
+                idempotency_store.discard(scoped_key(request.scope, "turn", idempotency_key))
+            yield "error", {"detail": f"Turn error: {str(e)}", "timings": timings}
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if idempotency_key:
+        async def record() -> EventRecording:
+            return EventRecording(turn_events())
+        
+        fingerprint = request_fingerprint(
+            audio_content, language, level, persona, topic, voice_name, language_code, history,
+            session_id, str(split_correction)
+        )
+        recording, replayed = await run_idempotent(request, "turn", idempotency_key, fingerprint, record)
+        events = recording.subscribe()
+        if replayed:
+            headers["Idempotent-Replayed"] = "true"
+    else:
+        events = turn_events()
+    
+    async def event_stream():
+        async for event, data in events:
+            yield format_sse(event, data)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=headers
+    )
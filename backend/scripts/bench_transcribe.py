@@ -0,0 +1,96 @@
+"""
+Transcription Throughput Benchmark
+Measures how many concurrent /api/audio/transcribe requests one worker sustains
+
+Run the backend with a single worker, then sweep concurrency levels:
+
+    uvicorn main:app --workers 1 --port 8000
+    python scripts/bench_transcribe.py --file sample.wav --levels 1,2,4,8,16,32
+
+Run it once against the previous (sync client) build and once against the
+current one to compare. The "sustained" concurrency is the highest level whose
+p95 latency stays within --slowdown times the single-request latency.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+async def run_level(client: httpx.AsyncClient, url: str, audio: bytes, filename: str,
+                    language_code: str, concurrency: int, requests_per_worker: int) -> dict:
+    """Fire `concurrency` parallel request loops and collect latencies"""
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    url,
+                    params={"language_code": language_code},
+                    files={"file": (filename, audio, "application/octet-stream")}
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else float("nan"),
+    }
+
+
+async def main(args):
+    with open(args.file, "rb") as f:
+        audio = f.read()
+    url = args.url.rstrip("/") + "/api/audio/transcribe"
+    levels = [int(level) for level in args.levels.split(",")]
+
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        results = []
+        for concurrency in levels:
+            result = await run_level(client, url, audio, args.file, args.language_code,
+                                     concurrency, args.requests)
+            results.append(result)
+            print(
+                f"concurrency={result['concurrency']:>4}  ok={result['requests']:>5}  "
+                f"errors={result['errors']:>3}  throughput={result['throughput']:7.2f} req/s  "
+                f"p50={result['p50'] * 1000:8.1f} ms  p95={result['p95'] * 1000:8.1f} ms"
+            )
+
+    baseline = results[0]["p95"]
+    sustained = [
+        r["concurrency"] for r in results
+        if not r["errors"] and r["p95"] <= baseline * args.slowdown
+    ]
+    print(f"\nSustained concurrency (p95 within {args.slowdown}x of c={levels[0]}): "
+          f"{max(sustained) if sustained else 0}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--file", required=True, help="Audio file to upload")
+    parser.add_argument("--language-code", default="en-US")
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per concurrent worker")
+    parser.add_argument("--slowdown", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(main(parser.parse_args()))
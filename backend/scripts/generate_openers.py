@@ -0,0 +1,87 @@
+"""
+Opener Generation Job
+Pre-generates first-turn openers for every language/level/persona/topic
+combination and synthesizes each one for every voice of its language
+
+    cd backend
+    python scripts/generate_openers.py --variants 3
+
+The output directory (OPENERS_DIR, default ./openers) is served by
+POST /api/conversation/start. Combinations already in the manifest are
+skipped unless --force is given, so the job can be resumed. A running
+server picks up the rewritten manifest on its next session start; no
+restart is needed.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+
+# Run from the backend directory, like the server, so settings and imports resolve the same way
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.append(os.path.dirname(BACKEND_DIR))
+
+from tutor_prompt import LANGUAGES, LEVELS, PERSONAS, TOPICS
+from services import google_audio
+from services.llm import close_openai_client
+from services.openers import OpenerCache, generate_openers, opener_key, voice_language_code
+from config import get_settings
+
+settings = get_settings()
+
+
+async def build_combination(cache: OpenerCache, language: str, level: str, persona: str, topic: str,
+                            variants: int, semaphore: asyncio.Semaphore):
+    key = opener_key(language, level, persona, topic)
+    voices = [v["id"] for v in google_audio.VOICES["fr" if language == "French" else "en"]]
+    async with semaphore:
+        texts = await generate_openers(language, level, persona, topic, count=variants)
+        entries = []
+        for text in texts:
+            audio_files = {}
+            for voice_name in voices:
+                try:
+                    audio = await google_audio.synthesize(
+                        text, language_code=voice_language_code(voice_name), voice_name=voice_name
+                    )
+                    audio_files[voice_name] = cache.write_audio(audio)
+                except Exception as e:
+                    print(f"  ⚠️ TTS failed for {voice_name}: {e}")
+            entries.append({"text": text, "audio": audio_files})
+    cache.openers[key] = entries
+    print(f"✅ {key}: {len(entries)} openers")
+
+
+async def main(args):
+    cache = OpenerCache(args.output)
+    combinations = [
+        combo for combo in itertools.product(LANGUAGES, LEVELS, PERSONAS, TOPICS)
+        if args.force or opener_key(*combo) not in cache.openers
+    ]
+    print(f"Generating openers for {len(combinations)} combinations")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = await asyncio.gather(
+        *(build_combination(cache, *combo, args.variants, semaphore) for combo in combinations),
+        return_exceptions=True
+    )
+    for combo, result in zip(combinations, results):
+        if isinstance(result, Exception):
+            print(f"❌ {opener_key(*combo)}: {result}")
+
+    cache.save()
+    await close_openai_client()
+    await google_audio.close_clients()
+    print(f"Saved manifest: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=settings.openers_dir)
+    parser.add_argument("--variants", type=int, default=settings.opener_variants)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--force", action="store_true", help="Regenerate combinations already cached")
+    asyncio.run(main(parser.parse_args()))
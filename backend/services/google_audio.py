@@ -0,0 +1,375 @@
+"""
+Google Audio Service
+Async Speech-to-Text and Text-to-Speech clients shared across requests
+"""
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import tempfile
+import time
+import os
+import json
+
+from google.cloud import speech_v1p1beta1 as speech
+from google.cloud import texttospeech
+
+import sys
+sys.path.append('..')
+from config import get_settings
+from audio_format import VoiceActivityDetector, normalize_audio, select_model, split_at_silence, stitch_transcripts
+from llm_deadline import LatencyTracker
+from resilience import acall
+from tts_cache import DEFAULT_CACHE_DIR, TTSCache, make_cache_key
+from services.limiter import AdaptiveLimiter, stt_limiter, tts_limiter
+from services.providers import retry_policy, stt_breaker, tts_breaker
+from services.singleflight import SingleFlight
+
+settings = get_settings()
+
+# Synthesized audio cache, keyed by (normalized text, voice, language, encoding)
+tts_cache = TTSCache(
+    memory_max_bytes=settings.tts_cache_memory_mb * 1024 * 1024,
+    disk_dir=(settings.tts_cache_dir or DEFAULT_CACHE_DIR) if settings.tts_cache_disk_enabled else None,
+    disk_max_bytes=settings.tts_cache_disk_mb * 1024 * 1024
+)
+
+# Silence trimming ahead of STT
+vad = VoiceActivityDetector(
+    silence_db=settings.vad_silence_db,
+    padding_seconds=settings.vad_padding_ms / 1000,
+    min_speech_seconds=settings.vad_min_speech_ms / 1000
+) if settings.vad_enabled else None
+_stt_stats = {
+    "requests": 0, "silent_skipped": 0, "chunked": 0, "chunks": 0,
+    "received_bytes": 0, "sent_bytes": 0, "trimmed_seconds": 0.0
+}
+
+
+class ModelStats:
+    """Latency and confidence of one recognition model, to tune stt_short_max_seconds from real traffic"""
+
+    def __init__(self):
+        self.latency = LatencyTracker(min_samples=1)
+        self.requests = 0
+        self.audio_seconds = 0.0
+        self.empty = 0
+        self._confidence_total = 0.0
+        self._confidence_count = 0
+
+    def record(self, latency: float, audio_seconds: Optional[float], confidences: List[float]):
+        self.latency.record(latency)
+        self.requests += 1
+        self.audio_seconds += audio_seconds or 0.0
+        self.empty += not confidences
+        self._confidence_total += sum(confidences)
+        self._confidence_count += len(confidences)
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "latency_p50_ms": int(self.latency.percentile(50, 0.0) * 1000),
+            "latency_p95_ms": int(self.latency.percentile(95, 0.0) * 1000),
+            "avg_confidence": round(self._confidence_total / self._confidence_count, 3)
+                if self._confidence_count else None,
+            "empty_results": self.empty
+        }
+
+
+_model_stats: Dict[str, ModelStats] = {}
+
+# Identical syntheses requested at the same moment (a class starting a lesson) share one call
+tts_flights = SingleFlight("tts")
+
+
+def setup_google_credentials():
+    """Setup Google Cloud credentials from settings"""
+    if settings.google_credentials_path and os.path.isfile(settings.google_credentials_path):
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = settings.google_credentials_path
+    elif settings.google_credentials_json:
+        # Write JSON credentials to temp file
+        creds = json.loads(settings.google_credentials_json)
+        if 'private_key' in creds:
+            creds['private_key'] = creds['private_key'].replace('\\n', '\n')
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(creds, f)
+            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = f.name
+
+
+# Voice catalog served by /api/audio/voices
+VOICES = {
+    "en": [
+        {"id": "en-US-Journey-F", "name": "Journey Female", "gender": "female"},
+        {"id": "en-US-Journey-D", "name": "Journey Male", "gender": "male"},
+        {"id": "en-US-Studio-O", "name": "Studio Female", "gender": "female"},
+        {"id": "en-US-Studio-M", "name": "Studio Male", "gender": "male"},
+        {"id": "en-US-Neural2-F", "name": "Neural2 Female", "gender": "female"},
+        {"id": "en-US-Neural2-D", "name": "Neural2 Male", "gender": "male"}
+    ],
+    "fr": [
+        {"id": "fr-FR-Neural2-A", "name": "Neural2 Female A", "gender": "female"},
+        {"id": "fr-FR-Neural2-B", "name": "Neural2 Male B", "gender": "male"},
+        {"id": "fr-FR-Neural2-C", "name": "Neural2 Female C", "gender": "female"},
+        {"id": "fr-FR-Neural2-D", "name": "Neural2 Male D", "gender": "male"},
+        {"id": "fr-FR-Standard-A", "name": "Standard Female A", "gender": "female"},
+        {"id": "fr-FR-Standard-B", "name": "Standard Male B", "gender": "male"}
+    ]
+}
+
+
+# Setup credentials on module load
+setup_google_credentials()
+
+# Async gRPC clients, created at startup so their channels are reused
+_speech_client: Optional[speech.SpeechAsyncClient] = None
+_tts_client: Optional[texttospeech.TextToSpeechAsyncClient] = None
+
+
+async def start_clients():
+    """Open the gRPC channels (must run inside the server's event loop)"""
+    try:
+        get_speech_client()
+        get_tts_client()
+    except Exception as e:
+        # Clients are retried lazily on first use
+        print(f"⚠️ Google Cloud clients not initialized: {e}")
+
+
+async def close_clients():
+    """Close the gRPC channels"""
+    global _speech_client, _tts_client
+    for client in (_speech_client, _tts_client):
+        if client is not None:
+            await client.transport.close()
+    _speech_client = None
+    _tts_client = None
+
+
+def get_speech_client() -> speech.SpeechAsyncClient:
+    global _speech_client
+    if _speech_client is None:
+        _speech_client = speech.SpeechAsyncClient()
+    return _speech_client
+
+
+def get_tts_client() -> texttospeech.TextToSpeechAsyncClient:
+    global _tts_client
+    if _tts_client is None:
+        _tts_client = texttospeech.TextToSpeechAsyncClient()
+    return _tts_client
+
+
+async def _limited(limiter: AdaptiveLimiter, call: Callable[[], Awaitable]):
+    """Run a provider call in one of the limiter's adaptive in-flight slots"""
+    async with limiter.slot():
+        return await call()
+
+
+def stt_stats() -> Dict:
+    """Bytes received vs. sent to Google, silence trimmed, silent clips skipped and per-model latency/confidence"""
+    return {
+        **_stt_stats,
+        "trimmed_seconds": round(_stt_stats["trimmed_seconds"], 1),
+        "models": {model: stats.stats() for model, stats in _model_stats.items()}
+    }
+
+
+def tts_available() -> bool:
+    """False while the TTS circuit is open: replies should go out text-only (PRD 5.3)"""
+    return not tts_breaker.is_open
+
+
+# ==================== Speech Operations ====================
+
+async def transcribe(
+    audio_content: bytes,
+    language_code: str = "en-US",
+    budget_seconds: Optional[float] = None,
+    audio_report: Optional[Dict] = None
+) -> Tuple[str, float]:
+    """
+    Transcribe audio with Google Cloud Speech-to-Text
+    Returns the combined transcript and the average confidence
+    WAV is sent as 16 kHz mono LINEAR16 trimmed to the speech, and all-silent WAV
+    clips return ("", 0.0) without calling Google; other formats go out with the
+    encoding from their header (raises audio_format.AudioFormatError for a
+    malformed WAV file). audio_report, if given, is filled with what was removed.
+    Decoded audio longer than stt_chunk_seconds is split at silence into overlapping
+    chunks that are recognized concurrently and stitched back in order. Each request
+    uses the short-form model up to stt_short_max_seconds, else the long-form one.
+    Transient failures are retried while budget_seconds allows
+    """
+    normalized = await asyncio.to_thread(normalize_audio, audio_content, vad=vad)
+    _stt_stats["requests"] += 1
+    _stt_stats["received_bytes"] += normalized.source_bytes
+    _stt_stats["sent_bytes"] += len(normalized.content)
+    _stt_stats["trimmed_seconds"] += normalized.trimmed_seconds
+    if audio_report is not None:
+        audio_report.update(normalized.report())
+    if normalized.silent:
+        _stt_stats["silent_skipped"] += 1
+        return "", 0.0
+    
+    options = normalized.config_kwargs()
+    options["encoding"] = speech.RecognitionConfig.AudioEncoding[options["encoding"]]
+    options["language_code"] = language_code
+    
+    spans = [(0, len(normalized.samples) if normalized.samples is not None else 0)]
+    if settings.stt_chunking_enabled and normalized.samples is not None:
+        spans = split_at_silence(
+            normalized.samples, normalized.sample_rate_hertz,
+            chunk_seconds=settings.stt_chunk_seconds, overlap_seconds=settings.stt_chunk_overlap_seconds
+        )
+    if audio_report is not None:
+        audio_report["chunks"] = len(spans)
+    
+    if len(spans) == 1:
+        duration = normalized.duration_seconds
+        if audio_report is not None:
+            audio_report["model"] = select_model(duration, settings.stt_short_max_seconds,
+                                                 settings.stt_short_model, settings.stt_long_model)
+        transcript, confidences = await _recognize(normalized.content, options, duration, budget_seconds)
+    else:
+        _stt_stats["chunked"] += 1
+        _stt_stats["chunks"] += len(spans)
+        # LINEAR16 is 2 bytes per sample, so chunks are plain slices of the content
+        rate = normalized.sample_rate_hertz
+        results = await asyncio.gather(*(
+            _recognize(normalized.content[start * 2:end * 2], options, (end - start) / rate, budget_seconds)
+            for start, end in spans
+        ))
+        transcript = stitch_transcripts([text for text, _ in results])
+        confidences = [confidence for _, chunk_confidences in results for confidence in chunk_confidences]
+    
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return transcript, avg_confidence
+
+
+async def _recognize(
+    content: bytes,
+    options: Dict,
+    duration: Optional[float],
+    budget_seconds: Optional[float]
+) -> Tuple[str, List[float]]:
+    """
+    One synchronous recognize call with the model for the clip's duration
+    Returns the combined transcript and each result's confidence
+    """
+    model = select_model(duration, settings.stt_short_max_seconds, settings.stt_short_model, settings.stt_long_model)
+    config = speech.RecognitionConfig(**options, enable_automatic_punctuation=True, model=model)
+    audio = speech.RecognitionAudio(content=content)
+    start = time.perf_counter()
+    response = await acall(
+        stt_breaker,
+        lambda: _limited(stt_limiter, lambda: get_speech_client().recognize(config=config, audio=audio)),
+        retry_policy,
+        budget_seconds
+    )
+    
+    # Combine all transcripts
+    transcript = " ".join([
+        result.alternatives[0].transcript 
+        for result in response.results
+        if result.alternatives
+    ]).strip()
+    
+    confidences = [
+        result.alternatives[0].confidence 
+        for result in response.results 
+        if result.alternatives
+    ]
+    _model_stats.setdefault(model, ModelStats()).record(time.perf_counter() - start, duration, confidences)
+    return transcript, confidences
+
+
+async def stream_transcribe(
+    audio_chunks: AsyncIterator[bytes],
+    language_code: str = "en-US",
+    sample_rate_hertz: int = 16000,
+    encoding: str = "LINEAR16",
+    interim_results: bool = True,
+    single_utterance: bool = False
+) -> AsyncIterator[dict]:
+    """
+    Stream audio chunks to Google streaming recognition
+    Yields interim and final results as they arrive
+    Not retried: the audio chunks can only be consumed once. Not under the adaptive
+    limiter either: a stream lasts as long as the learner speaks, so its duration
+    says nothing about provider load.
+    """
+    streaming_config = speech.StreamingRecognitionConfig(
+        config=speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding[encoding],
+            sample_rate_hertz=sample_rate_hertz,
+            language_code=language_code,
+            enable_automatic_punctuation=True,
+            model="default"
+        ),
+        interim_results=interim_results,
+        single_utterance=single_utterance
+    )
+
+    async def requests():
+        # The first request carries only the config, the rest only audio
+        yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
+        async for chunk in audio_chunks:
+            yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+    stt_breaker.before_call()
+    try:
+        responses = await get_speech_client().streaming_recognize(requests=requests())
+        async for response in responses:
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                alternative = result.alternatives[0]
+                yield {
+                    "is_final": result.is_final,
+                    "transcript": alternative.transcript.strip(),
+                    "confidence": alternative.confidence if result.is_final else None,
+                    "stability": result.stability
+                }
+    except Exception as e:
+        stt_breaker.record_failure(e)
+        raise
+    except BaseException:
+        # Closed or cancelled by the caller: no verdict on the provider
+        stt_breaker.release()
+        raise
+    stt_breaker.record_success()
+
+
+async def synthesize(text: str, language_code: str = "en-US", voice_name: str = "en-US-Journey-F") -> bytes:
+    """
+    Synthesize MP3 speech with Google Cloud Text-to-Speech, served from cache when possible
+    Concurrent misses for the same key wait for a single upstream call.
+    """
+    cache_key = make_cache_key(text, voice_name, language_code, "MP3")
+    # The disk tier does blocking file IO
+    cached = await asyncio.to_thread(tts_cache.get, cache_key)
+    if cached is not None:
+        return cached
+    return await tts_flights.do(cache_key, lambda: _synthesize_uncached(cache_key, text, language_code, voice_name))
+
+
+async def _synthesize_uncached(cache_key: str, text: str, language_code: str, voice_name: str) -> bytes:
+    synthesis_input = texttospeech.SynthesisInput(text=text)
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=language_code,
+        name=voice_name
+    )
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.MP3
+    )
+    
+    response = await acall(
+        tts_breaker,
+        lambda: _limited(tts_limiter, lambda: get_tts_client().synthesize_speech(
+            input=synthesis_input,
+            voice=voice,
+            audio_config=audio_config
+        )),
+        retry_policy
+    )
+    await asyncio.to_thread(tts_cache.put, cache_key, response.audio_content)
+    return response.audio_content
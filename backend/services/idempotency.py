@@ -0,0 +1,191 @@
+"""
+Idempotency Service
+Idempotency-Key support: retried requests attach to the original computation while
+it runs and get its stored result afterwards, instead of another billed provider call
+"""
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Set, Tuple, Union
+import asyncio
+import hashlib
+import time
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from config import get_settings
+from services.rate_limit import client_identity
+from services.singleflight import SingleFlight
+
+settings = get_settings()
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a request with a different body"""
+
+
+def request_fingerprint(*parts: Union[str, bytes, None]) -> str:
+    """Digest of everything that makes two requests the same request"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode() if isinstance(part, str) else (part or b"")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def scoped_key(scope: dict, endpoint: str, key: str) -> str:
+    """Keys are per endpoint and per caller, so one client cannot replay another's result"""
+    return f"{endpoint}|{client_identity(scope)}|{key}"
+
+
+class IdempotencyStore:
+    """
+    Results of completed calls by key for ttl_seconds (at most max_entries, oldest
+    dropped first), plus the calls still running. Failed calls are not stored, so a
+    retry after an error runs again. In-process: with several workers, a retry that
+    lands on another worker is computed again.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (expires_at, fingerprint, result)
+        self._results: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._running: dict = {}  # key -> fingerprint
+        self._flights = SingleFlight("idempotency")
+        self.executed = 0
+        self.attached = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    async def run(self, key: str, fingerprint: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Result of fn() for this key, computed at most once; returns (result, replayed)"""
+        stored = self._get(key)
+        if stored is not None:
+            self._check(stored[0], fingerprint)
+            self.replayed += 1
+            return stored[1], True
+
+        running = self._running.get(key)
+        if running is not None:
+            self._check(running, fingerprint)
+            self.attached += 1
+            return await self._flights.do(key, fn), True
+
+        async def compute():
+            try:
+                result = await fn()
+                self.put(key, fingerprint, result)
+                return result
+            finally:
+                self._running.pop(key, None)
+
+        self._running[key] = fingerprint
+        self.executed += 1
+        return await self._flights.do(key, compute), False
+
+    def put(self, key: str, fingerprint: str, result: Any):
+        self._results[key] = (time.monotonic() + self.ttl_seconds, fingerprint, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def discard(self, key: str):
+        """Forget a stored result, e.g. a streamed computation that ended in an error"""
+        self._results.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "stored": len(self._results),
+            "running": len(self._running),
+            "executed": self.executed,
+            "attached": self.attached,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts
+        }
+
+    def _get(self, key: str) -> Optional[Tuple[str, Any]]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, fingerprint, result = entry
+        if time.monotonic() >= expires_at:
+            del self._results[key]
+            return None
+        return fingerprint, result
+
+    def _check(self, stored_fingerprint: str, fingerprint: str):
+        if stored_fingerprint != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+
+
+# ==================== Streamed Results ====================
+
+# Keep references to running recordings so they are not garbage collected
+_recording_tasks: Set[asyncio.Task] = set()
+
+
+class EventRecording:
+    """
+    Events of a streamed computation (e.g. a turn's SSE events), recorded as they
+    are produced. Any number of subscribers replay what has happened so far and
+    then follow along live. The computation runs on its own, so a client that
+    drops the connection does not stop it for a retry.
+    """
+
+    def __init__(self, source: AsyncIterator[Tuple[str, Any]]):
+        self.events: List[Tuple[str, Any]] = []
+        self.finished = False
+        self._updated = asyncio.Event()
+        task = asyncio.create_task(self._record(source))
+        _recording_tasks.add(task)
+        task.add_done_callback(_recording_tasks.discard)
+
+    async def subscribe(self) -> AsyncIterator[Tuple[str, Any]]:
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.finished:
+                return
+            await self._updated.wait()
+
+    async def _record(self, source: AsyncIterator[Tuple[str, Any]]):
+        try:
+            async for item in source:
+                self.events.append(item)
+                self._notify()
+        finally:
+            self.finished = True
+            self._notify()
+
+    def _notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+
+idempotency_store = IdempotencyStore(settings.idempotency_ttl_seconds, settings.idempotency_max_entries)
+
+
+async def run_idempotent(
+    request: Request,
+    endpoint: str,
+    idempotency_key: Optional[str],
+    fingerprint: str,
+    fn: Callable[[], Awaitable[Any]]
+) -> Tuple[Any, bool]:
+    """
+    Run fn() once per Idempotency-Key; returns (result, replayed)
+    A retry attaches to the running call or gets its stored result. Without a key
+    the call simply runs. 422 if the key was used for a different request.
+    """
+    if not idempotency_key:
+        return await fn(), False
+    if len(idempotency_key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+    try:
+        return await idempotency_store.run(scoped_key(request.scope, endpoint, idempotency_key), fingerprint, fn)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -0,0 +1,246 @@
+"""
+Concurrency Limiter Service
+Adaptive (AIMD) in-flight limits per provider, driven by observed latency and overload errors,
+shared by the scheduler's priority classes
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+import asyncio
+import time
+
+from config import get_settings
+from services.scheduler import BACKGROUND, PRIORITIES, PRIORITY_NAMES, current_priority, interactive_budget
+
+settings = get_settings()
+
+# Errors that mean the provider is saturated: rate limits and timeouts
+OVERLOAD_ERROR_NAMES = {
+    "RateLimitError", "TooManyRequests", "ResourceExhausted",
+    "APITimeoutError", "TimeoutError", "TimeoutException", "DeadlineExceeded"
+}
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether an error says the provider wants less traffic"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    if any(cls.__name__ in OVERLOAD_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    return getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429
+
+
+class Permit:
+    """A held slot; observe() overrides the latency sample (e.g. time to first token)"""
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.started_at = time.monotonic()
+        self.latency: Optional[float] = None
+
+    def observe(self, seconds: float):
+        self.latency = seconds
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one provider.
+    The limit grows by one after a full window of `limit` calls without overload,
+    and is multiplied by backoff_ratio on a 429/timeout or when a call takes longer
+    than latency_tolerance x the long-run latency (at most once per window, so one
+    burst of errors counts once). Calls beyond the limit wait in a local queue
+    instead of reaching a saturated upstream: interactive first, then replay, then
+    background, FIFO within a class. Background calls hold at most background_share
+    of the limit, and none start while interactive calls are over their latency budget.
+    """
+
+    def __init__(self, name: str, initial_limit: int, min_limit: int = 1, max_limit: int = 64,
+                 backoff_ratio: float = 0.7, latency_tolerance: float = 2.0, min_samples: int = 20,
+                 background_share: float = 0.5):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = max(min_limit, min(initial_limit, max_limit))
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.min_samples = min_samples
+        self.background_share = background_share
+
+        self.in_flight = 0
+        self._in_flight_by = {level: 0 for level in PRIORITIES}
+        self._waiters: Dict[int, Deque[asyncio.Future]] = {level: deque() for level in PRIORITIES}
+        self._recheck: Optional[asyncio.TimerHandle] = None
+        self._window_successes = 0
+        self._last_decrease = 0.0
+        self._baseline: Optional[float] = None  # slow EWMA of latency
+        self._samples = 0
+
+        self.increases = 0
+        self.decreases = 0
+        self.max_queue_depth = 0
+        self.deferred = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None) -> AsyncIterator[Permit]:
+        """Hold one in-flight slot for the duration of a provider call (priority defaults to the task's)"""
+        priority = current_priority() if priority is None else priority
+        await self._acquire(priority)
+        permit = Permit(priority)
+        try:
+            yield permit
+        except Exception as e:
+            # (A cancelled call, e.g. a losing hedge, is not an Exception: no sample)
+            if is_overload(e):
+                self._on_overload()
+            raise
+        else:
+            self._on_success(permit.latency if permit.latency is not None else time.monotonic() - permit.started_at)
+        finally:
+            self._release(priority)
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "by_priority": {
+                PRIORITY_NAMES[level]: {"in_flight": self._in_flight_by[level], "queued": len(self._waiters[level])}
+                for level in PRIORITIES
+            },
+            "deferred": self.deferred,
+            "latency_baseline_ms": int(self._baseline * 1000) if self._baseline is not None else None,
+            "increases": self.increases,
+            "decreases": self.decreases
+        }
+
+    # ==================== Internals ====================
+
+    def _background_room(self) -> bool:
+        """Whether a background call may start now"""
+        if interactive_budget.over_budget:
+            return False
+        return self._in_flight_by[BACKGROUND] < max(1, int(self.limit * self.background_share))
+
+    def _admissible(self, priority: int) -> bool:
+        if self.in_flight >= self.limit:
+            return False
+        # Never overtake a waiter of the same or a more urgent class
+        if any(self._waiters[level] for level in PRIORITIES if level <= priority):
+            return False
+        return priority != BACKGROUND or self._background_room()
+
+    def _admit(self, priority: int):
+        self.in_flight += 1
+        self._in_flight_by[priority] += 1
+
+    async def _acquire(self, priority: int):
+        if self._admissible(priority):
+            self._admit(priority)
+            return
+        if priority == BACKGROUND and interactive_budget.over_budget:
+            self.deferred += 1
+            self._schedule_recheck()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        queued_at = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we were cancelled: pass it on
+                self._release(priority)
+            else:
+                self._waiters[priority].remove(waiter)
+                # A departed head-of-line waiter may have been blocking less urgent classes
+                self._wake()
+            raise
+        interactive_budget.observe_wait(priority, time.monotonic() - queued_at)
+
+    def _release(self, priority: int):
+        self.in_flight -= 1
+        self._in_flight_by[priority] -= 1
+        self._wake()
+
+    def _wake(self):
+        for level in PRIORITIES:
+            waiters = self._waiters[level]
+            while waiters and self.in_flight < self.limit:
+                if level == BACKGROUND and not self._background_room():
+                    if interactive_budget.over_budget:
+                        self._schedule_recheck()
+                    return
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self._admit(level)
+                    waiter.set_result(None)
+            if waiters:
+                return
+
+    def _schedule_recheck(self):
+        """Wake deferred background work once the interactive pressure has passed"""
+        if self._recheck is None or self._recheck.cancelled():
+            def recheck():
+                self._recheck = None
+                self._wake()
+            self._recheck = asyncio.get_running_loop().call_later(
+                interactive_budget.pressure_remaining() + 0.01, recheck
+            )
+
+    def _on_success(self, latency: float):
+        self._samples += 1
+        if self._baseline is None:
+            self._baseline = latency
+        spike = self._samples >= self.min_samples and latency > self._baseline * self.latency_tolerance
+        # Spikes barely move the baseline, so a slow period cannot redefine "normal"
+        self._baseline += (0.01 if spike else 0.05) * (latency - self._baseline)
+        if spike:
+            self._on_overload()
+            return
+        self._window_successes += 1
+        # Only grow while the limit is actually in use, so an idle period does not inflate it
+        saturated = self.in_flight * 2 >= self.limit
+        if self._window_successes >= self.limit and saturated and self.limit < self.max_limit:
+            self.limit += 1
+            self.increases += 1
+            self._window_successes = 0
+            self._wake()
+
+    def _on_overload(self):
+        now = time.monotonic()
+        window = self._baseline or 1.0
+        self._window_successes = 0
+        if now - self._last_decrease < window:
+            return
+        self._last_decrease = now
+        new_limit = max(self.min_limit, int(self.limit * self.backoff_ratio))
+        if new_limit < self.limit:
+            self.limit = new_limit
+            self.decreases += 1
+
+
+def _limiter(name: str, initial: int, maximum: int) -> AdaptiveLimiter:
+    return AdaptiveLimiter(
+        name,
+        initial_limit=initial,
+        min_limit=settings.limiter_min_concurrency,
+        max_limit=maximum,
+        backoff_ratio=settings.limiter_backoff_ratio,
+        latency_tolerance=settings.limiter_latency_tolerance,
+        background_share=settings.scheduler_background_share
+    )
+
+
+openai_limiter = _limiter("openai", settings.openai_initial_concurrency, settings.openai_max_concurrency)
+stt_limiter = _limiter("google_stt", settings.google_initial_concurrency, settings.google_max_concurrency)
+tts_limiter = _limiter("google_tts", settings.google_initial_concurrency, settings.google_max_concurrency)
+
+
+def limiter_stats() -> Dict[str, Dict]:
+    """Current limit, in-flight calls and queue depth per provider and priority class"""
+    return {limiter.name: limiter.stats() for limiter in (openai_limiter, stt_limiter, tts_limiter)}
@@ -0,0 +1,281 @@
+"""
+LLM Service
+Shared async OpenAI client with a pooled HTTP connection and an adaptive in-flight
+limit, plus hedged, deadline-bounded calls with a fallback model
+"""
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+import sys
+sys.path.append('..')
+from config import get_settings
+from llm_deadline import Deadline, DeadlineExceeded, LatencyTracker
+from resilience import acall
+from services.limiter import Permit, openai_limiter
+from services.providers import openai_breaker
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_openai_client: Optional[AsyncOpenAI] = None
+
+# Primary-model latency to the first token (streaming) or the whole reply
+_latency = {"stream": LatencyTracker(), "complete": LatencyTracker()}
+_stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0, "deadline_misses": 0, "truncated": 0}
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Get the shared async OpenAI client (created on first use)"""
+    global _openai_client
+    if _openai_client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_keepalive_connections
+            ),
+            timeout=httpx.Timeout(settings.openai_timeout_seconds, connect=5.0)
+        )
+        _openai_client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=http_client,
+            # Retries belong to the breaker's RetryPolicy, where the limiter sees each failure
+            max_retries=0
+        )
+    return _openai_client
+
+
+async def close_openai_client():
+    """Close the shared client and its connection pool"""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+
+
+@asynccontextmanager
+async def llm_slot() -> AsyncIterator[Permit]:
+    """
+    Hold one of the adaptive in-flight LLM call slots (waits locally when saturated)
+    Overload errors raised inside the block shrink the limit; see services.limiter.
+    """
+    async with openai_limiter.slot() as permit:
+        yield permit
+
+
+def llm_in_flight() -> int:
+    """Number of LLM calls currently holding a slot"""
+    return openai_limiter.in_flight
+
+
+# ==================== Hedged Calls ====================
+
+class LLMStream:
+    """
+    Text deltas of the winning streamed attempt
+    source is "primary", "hedge" or "fallback"; aclose() releases the LLM slot.
+    Iteration ends early, with truncated set, when the turn deadline runs out.
+    """
+
+    def __init__(self, stack: AsyncExitStack, stream: Any, first_text: str, source: str, deadline: Deadline):
+        self._stack = stack
+        self._stream = stream
+        self._first_text = first_text
+        self._deadline = deadline
+        self.source = source
+        self.truncated = False
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        if self._first_text:
+            yield self._first_text
+        chunks = self._stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), self._deadline.remaining())
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                # A stalled stream ends the reply where it is instead of failing the turn
+                _stats["truncated"] += 1
+                self.truncated = True
+                return
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def aclose(self):
+        await self._stack.aclose()
+
+
+def hedge_delay(kind: str = "stream") -> float:
+    """Wait before sending a hedged duplicate: the configured percentile of observed latency"""
+    return _latency[kind].percentile(settings.llm_hedge_percentile, settings.llm_hedge_delay_seconds)
+
+
+async def _race(
+    attempt: Callable[[str, bool], Awaitable[Any]],
+    deadline: Deadline,
+    kind: str,
+    discard: Optional[Callable[[Any], Awaitable[None]]] = None
+) -> Tuple[Any, str]:
+    """
+    Run attempt(model, record_latency) against the budget and return (result, source)
+    
+    When a fallback model is configured, a streamed primary gets
+    llm_response_deadline_seconds (capped by the turn deadline) to its first token
+    before the fallback takes what is left of the turn. A non-streamed primary, or
+    any primary without a fallback, gets the whole turn: a long reply is not a miss.
+    If the primary has not answered by the hedge delay, a duplicate request is sent
+    and the first to answer wins while the other is cancelled. Attempts fail fast
+    while the OpenAI circuit is open. Raises DeadlineExceeded when nothing answers.
+    """
+    _stats["requests"] += 1
+    primary_budget = (
+        settings.llm_response_deadline_seconds
+        if settings.llm_fallback_model and kind == "stream" else None
+    )
+    stages = [(settings.openai_model, primary_budget, settings.llm_hedging_enabled)]
+    if settings.llm_fallback_model:
+        stages.append((settings.llm_fallback_model, None, False))
+    
+    for model, budget, hedge in stages:
+        stage_start = time.monotonic()
+        stage_end = stage_start + deadline.budget(budget)
+        if stage_end <= stage_start:
+            break
+        primary = model == settings.openai_model
+        tasks = [asyncio.create_task(attempt(model, primary))]
+        sources = {tasks[0]: "primary" if primary else "fallback"}
+        hedge_at = stage_start + hedge_delay(kind) if hedge else stage_end
+        try:
+            while tasks:
+                now = time.monotonic()
+                if now >= stage_end:
+                    break
+                if now >= hedge_at and len(sources) == 1:
+                    task = asyncio.create_task(attempt(model, primary))
+                    tasks.append(task)
+                    sources[task] = "hedge"
+                    _stats["hedged"] += 1
+                wait_until = stage_end if len(sources) > 1 else min(hedge_at, stage_end)
+                done, _ = await asyncio.wait(
+                    tasks, timeout=wait_until - now, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        source = sources[task]
+                        if source == "hedge":
+                            _stats["hedge_wins"] += 1
+                        elif source == "fallback":
+                            _stats["fallbacks"] += 1
+                        return task.result(), source
+                    logger.warning("LLM %s attempt failed (%s): %s", sources[task], model, task.exception())
+        finally:
+            for task in tasks:
+                task.cancel()
+            # An attempt can finish between wait() and cancel(); release what it holds
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if discard and not isinstance(result, BaseException):
+                    await discard(result)
+    
+    _stats["deadline_misses"] += 1
+    raise DeadlineExceeded(f"no reply within {settings.llm_turn_deadline_seconds:.1f}s")
+
+
+async def complete(
+    messages: List[dict],
+    deadline: Optional[Deadline] = None,
+    **kwargs
+) -> Tuple[str, str]:
+    """
+    Hedged, deadline-bounded chat completion
+    Returns (content, source); raises DeadlineExceeded.
+    """
+    deadline = deadline or Deadline(settings.llm_turn_deadline_seconds)
+    
+    async def attempt(model: str, record_latency: bool) -> str:
+        # Breaker outside the slot: an open circuit fails fast instead of queueing
+        async def limited_call():
+            async with llm_slot():
+                return await get_openai_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **kwargs
+                )
+        
+        start = time.perf_counter()
+        response = await acall(openai_breaker, limited_call)
+        if record_latency:
+            _latency["complete"].record(time.perf_counter() - start)
+        return response.choices[0].message.content or ""
+    
+    return await _race(attempt, deadline, "complete")
+
+
+async def open_stream(
+    messages: List[dict],
+    deadline: Optional[Deadline] = None,
+    **kwargs
+) -> LLMStream:
+    """
+    Hedged, deadline-bounded streamed chat completion
+    The deadline bounds the time to the first token and then the rest of the
+    stream, which is cut off when it expires; close the stream with aclose().
+    Raises DeadlineExceeded.
+    """
+    deadline = deadline or Deadline(settings.llm_turn_deadline_seconds)
+    
+    async def attempt(model: str, record_latency: bool) -> Tuple[AsyncExitStack, Any, str]:
+        stack = AsyncExitStack()
+        start = time.perf_counter()
+        try:
+            async def first_token() -> Tuple[Any, str]:
+                # The slot stays held until the stream is closed
+                permit = await stack.enter_async_context(llm_slot())
+                stream = await get_openai_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    **kwargs
+                )
+                if hasattr(stream, "close"):
+                    stack.push_async_callback(stream.close)
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        break
+                else:
+                    chunk = None
+                # Time to first token, not stream length, is the limiter's latency signal
+                permit.observe(time.monotonic() - permit.started_at)
+                return stream, chunk.choices[0].delta.content if chunk else ""
+            
+            # The provider counts as healthy once the first token arrives
+            stream, first_text = await acall(openai_breaker, first_token)
+            if record_latency:
+                _latency["stream"].record(time.perf_counter() - start)
+            return stack, stream, first_text
+        except BaseException as e:
+            # Pass the error in so the limiter sees failures and cancellations
+            await stack.__aexit__(type(e), e, e.__traceback__)
+            raise
+    
+    async def discard(result: Tuple[AsyncExitStack, Any, str]):
+        await result[0].aclose()
+    
+    (stack, stream, first_text), source = await _race(attempt, deadline, "stream", discard)
+    return LLMStream(stack, stream, first_text, source, deadline)
+
+
+def llm_stats() -> Dict[str, Any]:
+    """Hedging and fallback counters with the current hedge delays"""
+    return {
+        **_stats,
+        "in_flight": openai_limiter.in_flight,
+        "hedge_delay_ms": {kind: int(hedge_delay(kind) * 1000) for kind in _latency},
+        "latency_samples": {kind: len(tracker) for kind, tracker in _latency.items()}
+    }
@@ -0,0 +1,154 @@
+"""
+Opener Service
+Precomputed first-turn openers (text + audio) for every session combination
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import random
+
+import sys
+sys.path.append('..')
+from config import get_settings
+from tutor_prompt import build_system_prompt
+from resilience import acall
+from services.providers import openai_breaker, retry_policy
+from services.llm import get_openai_client, llm_slot
+from services.singleflight import SingleFlight
+
+settings = get_settings()
+
+# Sessions started at the same moment with the same settings share one live opener
+opener_flights = SingleFlight("openers")
+
+MANIFEST_NAME = "manifest.json"
+
+
+def opener_key(language: str, level: str, persona: str, topic: str) -> str:
+    """Manifest key for a session combination"""
+    return "|".join([language, level, persona, topic])
+
+
+def voice_language_code(voice_name: str) -> str:
+    """Language code of a Google voice id, e.g. en-US-Journey-F -> en-US"""
+    return "-".join(voice_name.split("-")[:2])
+
+
+async def generate_openers(language: str, level: str, persona: str, topic: str, count: int = 1) -> List[str]:
+    """Ask the LLM for `count` distinct first-turn openers for a combination"""
+    key = f"{opener_key(language, level, persona, topic)}|{count}"
+    openers = await opener_flights.do(key, lambda: _request_openers(language, level, persona, topic, count))
+    return list(openers)
+
+
+async def _request_openers(language: str, level: str, persona: str, topic: str, count: int) -> List[str]:
+    messages = [
+        {"role": "system", "content": build_system_prompt(language, persona, topic, level)},
+        {"role": "user", "content": (
+            f"Start the conversation. Write {count} different openers: greet the learner and "
+            f"ask one opening question about the session topic, 1-2 sentences each, in the "
+            f"session language, without tags. Reply as JSON: {{\"openers\": [\"...\"]}}"
+        )}
+    ]
+    async with llm_slot():
+        response = await acall(openai_breaker, lambda: get_openai_client().chat.completions.create(
+            model=settings.openai_model,
+            messages=messages,
+            response_format={"type": "json_object"},
+            temperature=1.0
+        ), retry_policy)
+    openers = json.loads(response.choices[0].message.content).get("openers", [])
+    return [opener.strip() for opener in openers if isinstance(opener, str) and opener.strip()][:count]
+
+
+class OpenerCache:
+    """
+    Openers generated by scripts/generate_openers.py
+    Layout: <directory>/manifest.json plus <directory>/audio/<sha256>.mp3
+    A manifest rewritten while the server runs is picked up on the next pick().
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.openers: Dict[str, List[dict]] = {}
+        self.generated_at: Optional[str] = None
+        self._loaded_mtime: Optional[int] = None
+        self.load()
+
+    def load(self):
+        """(Re)load the manifest if it exists"""
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.openers = manifest.get("openers", {})
+        self.generated_at = manifest.get("generated_at")
+        self._loaded_mtime = mtime
+
+    def refresh(self):
+        """Reload when the manifest has changed on disk (save() replaces it atomically)"""
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST_NAME)).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            self.load()
+
+    async def pick(self, language: str, level: str, persona: str, topic: str,
+                   voice_name: Optional[str] = None) -> Optional[dict]:
+        """
+        A random cached opener for the combination, with audio for the voice if available
+        The manifest check and the audio read run in a worker thread, off the event loop.
+        """
+        await asyncio.to_thread(self.refresh)
+        variants = self.openers.get(opener_key(language, level, persona, topic))
+        if not variants:
+            return None
+        variant = random.choice(variants)
+        audio_file = variant.get("audio", {}).get(voice_name) if voice_name else None
+        audio = await asyncio.to_thread(self._read_audio, audio_file) if audio_file else None
+        return {"text": variant["text"], "audio": audio}
+
+    def _read_audio(self, audio_file: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.directory, audio_file), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "combinations": len(self.openers),
+            "variants": sum(len(v) for v in self.openers.values()),
+            "generated_at": self.generated_at
+        }
+
+    # ==================== Writing (batch job) ====================
+
+    def write_audio(self, audio: bytes) -> str:
+        """Store opener audio content-addressed and return its manifest path"""
+        relative = os.path.join("audio", hashlib.sha256(audio).hexdigest() + ".mp3")
+        path = os.path.join(self.directory, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(audio)
+        return relative
+
+    def save(self):
+        """Atomically write the manifest"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.generated_at = datetime.utcnow().isoformat()
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"generated_at": self.generated_at, "openers": self.openers}, f, ensure_ascii=False, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+opener_cache = OpenerCache(settings.openers_dir)
@@ -0,0 +1,37 @@
+"""
+Provider Resilience
+Circuit breakers and the retry policy for each external dependency
+"""
+import sys
+sys.path.append('..')
+from config import get_settings
+from resilience import CircuitOpen, RetryPolicy, breaker_stats, get_breaker
+
+settings = get_settings()
+
+_breaker_options = {
+    "failure_threshold": settings.breaker_failure_threshold,
+    "recovery_seconds": settings.breaker_recovery_seconds
+}
+
+openai_breaker = get_breaker("openai", **_breaker_options)
+stt_breaker = get_breaker("google_stt", **_breaker_options)
+tts_breaker = get_breaker("google_tts", **_breaker_options)
+supabase_breaker = get_breaker("supabase", **_breaker_options)
+
+# Retries are only for idempotent calls (recognition, synthesis, reads)
+retry_policy = RetryPolicy(
+    max_attempts=settings.retry_max_attempts,
+    base_delay=settings.retry_base_delay_seconds,
+    max_delay=settings.retry_max_delay_seconds
+)
+
+
+def circuit_open_headers(error: CircuitOpen) -> dict:
+    """Retry-After header for a 503 caused by an open circuit"""
+    return {"Retry-After": str(max(1, int(error.retry_after + 0.5)))}
+
+
+def provider_stats() -> dict:
+    """State and counters of every provider circuit"""
+    return breaker_stats()
@@ -0,0 +1,322 @@
+"""
+Rate Limit Service
+Per-user and global token buckets plus a bounded admission queue for expensive endpoints
+"""
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+import asyncio
+import json
+import math
+import time
+
+from jose import JWTError, jwt
+
+from config import get_settings
+
+settings = get_settings()
+
+
+# ==================== Token Bucket Stores ====================
+
+class TokenBucketStore:
+    """Where bucket state lives; take() must be atomic per key"""
+
+    async def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take `cost` tokens; returns (allowed, seconds until enough tokens refill)"""
+        raise NotImplementedError
+
+
+class MemoryTokenBucketStore(TokenBucketStore):
+    """
+    In-process buckets: limits apply per worker
+    At most max_keys buckets are kept, least recently used first out.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at, rate, capacity), oldest updated_at first
+        self._buckets: "OrderedDict[str, Tuple[float, float, float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated_at, _, _ = self._buckets.get(key, (capacity, now, rate, capacity))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now, rate, capacity)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._evict(now)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def _evict(self, now: float):
+        """
+        Forget the oldest buckets that have refilled (they are indistinguishable from
+        new ones), stopping at the first one that has not; if that leaves too many,
+        the least recently used go anyway. Each bucket is dropped at most once, so
+        the cost per take() stays constant however many keys there are.
+        """
+        while self._buckets:
+            key, (tokens, updated_at, rate, capacity) = next(iter(self._buckets.items()))
+            if tokens + (now - updated_at) * rate < capacity:
+                break
+            del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+# Atomic refill-and-take; uses the server clock so every worker agrees on time
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisTokenBucketStore(TokenBucketStore):
+    """
+    Buckets shared by every worker, in Redis or any server that speaks its protocol
+    and supports EVAL (KeyDB, Dragonfly, Valkey, a local redis-server for development)
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_STORE=redis needs the 'redis' package (pip install redis)")
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, wait = await self._script(keys=[self.prefix + key], args=[rate, capacity, cost])
+        return bool(int(allowed)), float(wait)
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def build_store() -> TokenBucketStore:
+    """Bucket store selected by RATE_LIMIT_STORE"""
+    if settings.rate_limit_store == "redis":
+        return RedisTokenBucketStore(settings.rate_limit_redis_url)
+    return MemoryTokenBucketStore()
+
+
+# ==================== Admission Queue ====================
+
+class QueueFull(Exception):
+    """The admission queue is full or the wait timed out"""
+
+
+class AdmissionQueue:
+    """
+    At most max_concurrent requests run; up to max_waiting more wait (FIFO) for at
+    most wait_timeout seconds. Everything beyond that is rejected right away.
+    """
+
+    def __init__(self, max_concurrent: int, max_waiting: int, wait_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise QueueFull("admission queue full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise QueueFull("timed out waiting for admission")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.running += 1
+        self.admitted += 1
+
+    def release(self):
+        self.running -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+
+# ==================== Middleware ====================
+
+_middleware: Optional["RateLimitMiddleware"] = None
+
+
+def client_identity(scope: dict) -> str:
+    """Rate-limit key: the JWT subject when a valid bearer token is sent, else the client IP"""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+                    if payload.get("sub"):
+                        return f"user:{payload['sub']}"
+                except JWTError:
+                    pass
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying, in order:
+    1. the per-user token bucket (JWT `sub`, or client IP for anonymous calls)
+    2. the global token bucket (protects the shared provider quota)
+    3. for expensive endpoints, the bounded admission queue
+    Rejections are 429 responses with a Retry-After header.
+    """
+
+    def __init__(self, app, store: Optional[TokenBucketStore] = None):
+        self.app = app
+        self.store = store or build_store()
+        self.admission = AdmissionQueue(
+            settings.admission_max_concurrent,
+            settings.admission_max_waiting,
+            settings.admission_wait_timeout_seconds
+        )
+        self.expensive_prefixes = tuple(p.strip() for p in settings.rate_limit_expensive_paths.split(",") if p.strip())
+        self.exempt_paths = {"/", "/health", "/docs", "/openapi.json", "/redoc"}
+        self.limited = {"global": 0, "user": 0, "queue": 0}
+        global _middleware
+        _middleware = self
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope["type"] not in ("http", "websocket") or not settings.rate_limit_enabled \
+                or scope["path"] in self.exempt_paths or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        expensive = scope["path"].startswith(self.expensive_prefixes)
+        cost = settings.rate_limit_expensive_cost if expensive else 1.0
+
+        # Per-user first, so one client looping cannot drain the global bucket
+        allowed, wait = await self.store.take(
+            client_identity(scope), settings.rate_limit_user_per_minute / 60,
+            settings.rate_limit_user_burst, cost
+        )
+        if not allowed:
+            self.limited["user"] += 1
+            await self._reject(scope, send, wait, "Too many requests, please slow down")
+            return
+
+        allowed, wait = await self.store.take(
+            "global", settings.rate_limit_global_per_second, settings.rate_limit_global_burst, cost
+        )
+        if not allowed:
+            self.limited["global"] += 1
+            await self._reject(scope, send, wait, "Server is busy, please retry shortly")
+            return
+
+        if not expensive:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.admission.acquire()
+        except QueueFull:
+            self.limited["queue"] += 1
+            await self._reject(scope, send, 1.0, "Server is busy, please retry shortly")
+            return
+        try:
+            # Held until the response (including a streamed body) is finished
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release()
+
+    async def charge(self, scope: dict, cost: float) -> Tuple[bool, float]:
+        """Take extra tokens from the caller's bucket and the global one"""
+        allowed, wait = await self.store.take(
+            client_identity(scope), settings.rate_limit_user_per_minute / 60,
+            settings.rate_limit_user_burst, cost
+        )
+        if not allowed:
+            self.limited["user"] += 1
+            return allowed, wait
+        allowed, wait = await self.store.take(
+            "global", settings.rate_limit_global_per_second, settings.rate_limit_global_burst, cost
+        )
+        if not allowed:
+            self.limited["global"] += 1
+        return allowed, wait
+
+    async def _reject(self, scope: dict, send: Callable, wait: float, detail: str):
+        retry_after = str(max(1, math.ceil(wait)))
+        if scope["type"] == "websocket":
+            # Close the handshake; 1013 = try again later
+            await send({"type": "websocket.close", "code": 1013, "reason": f"{detail} (retry after {retry_after}s)"})
+            return
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after.encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.rate_limit_enabled,
+            "store": type(self.store).__name__,
+            "limited": dict(self.limited),
+            "admission": self.admission.stats()
+        }
+
+
+async def charge(scope: dict, cost: float) -> Tuple[bool, float]:
+    """
+    Charge a request for work only its handler can count (e.g. the items of a batch),
+    on top of what the middleware took; returns (allowed, seconds until enough tokens refill)
+    """
+    if _middleware is None or not settings.rate_limit_enabled or cost <= 0:
+        return True, 0.0
+    return await _middleware.charge(scope, cost)
+
+
+def rate_limit_stats() -> dict:
+    """Counters of the installed middleware (empty until the app has served a request)"""
+    return _middleware.stats() if _middleware else {"enabled": settings.rate_limit_enabled}
@@ -0,0 +1,108 @@
+"""
+Scheduler Service
+Priority classes for provider work. Live turns go first, user-initiated replays
+next, and background jobs (history folding, opener generation) only run on spare
+capacity while live turns are within their latency budget.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Coroutine, Dict, Iterator, Set
+import asyncio
+import time
+
+from config import get_settings
+
+settings = get_settings()
+
+INTERACTIVE = 0
+REPLAY = 1
+BACKGROUND = 2
+PRIORITIES = (INTERACTIVE, REPLAY, BACKGROUND)
+PRIORITY_NAMES = {INTERACTIVE: "interactive", REPLAY: "replay", BACKGROUND: "background"}
+
+# Inherited by tasks created inside the block, so call sites need not pass it down
+_priority: ContextVar[int] = ContextVar("provider_priority", default=INTERACTIVE)
+
+# Keep references to fire-and-forget tasks so they are not garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def current_priority() -> int:
+    """Priority class of provider calls made from the current task"""
+    return _priority.get()
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the provider calls of a block under another priority class"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def run_in_background(coro: Coroutine) -> asyncio.Task:
+    """Start a fire-and-forget task whose provider calls are background work"""
+    with priority(BACKGROUND):
+        task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+class InteractiveBudget:
+    """
+    Whether live turns are within their latency budget.
+    An interactive call that queued longer than wait_budget, or a turn slower than
+    turn_budget, puts the scheduler under pressure for cooldown seconds; background
+    work is held back until then.
+    """
+
+    def __init__(self, wait_budget: float, turn_budget: float, cooldown: float):
+        self.wait_budget = wait_budget
+        self.turn_budget = turn_budget
+        self.cooldown = cooldown
+        self._pressure_until = 0.0
+        self.pressure_events = 0
+
+    @property
+    def over_budget(self) -> bool:
+        return time.monotonic() < self._pressure_until
+
+    def pressure_remaining(self) -> float:
+        """Seconds until background work may run again"""
+        return max(0.0, self._pressure_until - time.monotonic())
+
+    def observe_wait(self, level: int, seconds: float):
+        """Time a call spent queued for a provider slot"""
+        if level == INTERACTIVE and seconds > self.wait_budget:
+            self._pressure()
+
+    def observe_turn(self, seconds: float):
+        """End-to-end latency of a live turn"""
+        if seconds > self.turn_budget:
+            self._pressure()
+
+    def stats(self) -> Dict:
+        return {
+            "over_budget": self.over_budget,
+            "pressure_events": self.pressure_events,
+            "background_share": settings.scheduler_background_share
+        }
+
+    def _pressure(self):
+        self.pressure_events += 1
+        self._pressure_until = time.monotonic() + self.cooldown
+
+
+interactive_budget = InteractiveBudget(
+    wait_budget=settings.scheduler_interactive_wait_ms / 1000,
+    turn_budget=settings.scheduler_turn_budget_seconds,
+    cooldown=settings.scheduler_cooldown_seconds
+)
+
+
+def scheduler_stats() -> Dict:
+    """Interactive latency pressure and the number of running background tasks"""
+    return {**interactive_budget.stats(), "background_tasks": len(_background_tasks)}
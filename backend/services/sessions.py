@@ -0,0 +1,248 @@
+"""
+Session Service
+Server-held conversation sessions so clients only upload the new message each turn
+"""
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+import asyncio
+import logging
+import time
+import uuid
+
+import sys
+sys.path.append('..')
+from pydantic import BaseModel
+from fastapi import HTTPException
+
+from config import get_settings
+from resilience import CircuitOpen, call
+from services.providers import circuit_open_headers, retry_policy, supabase_breaker
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class Message(BaseModel):
+    """Chat message model"""
+    role: str  # "user" or "assistant"
+    content: str
+
+
+class ConversationSession:
+    """
+    One learner's conversation: tutor settings plus its recent messages
+    Messages beyond max_messages stay until the history fold has summarized them
+    (services.tutor.fold_session_history); only past twice that, when folding keeps
+    failing, are the oldest dropped unsummarized.
+    """
+
+    def __init__(self, session_id: str, tutor_settings: dict, max_messages: int,
+                 messages: Optional[List[dict]] = None, created_at: Optional[str] = None,
+                 summary: Optional[str] = None):
+        self.session_id = session_id
+        self.tutor_settings = tutor_settings
+        self.max_messages = max_messages
+        self.messages: Deque[dict] = deque(messages or [], maxlen=2 * max_messages)
+        self.summary = summary  # rolling summary of turns folded out of the context window
+        self.folding = False
+        self.created_at = created_at or datetime.utcnow().isoformat()
+        self.last_access = time.monotonic()
+
+    def history(self) -> List[dict]:
+        """Messages in chronological order"""
+        return list(self.messages)
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "settings": self.tutor_settings,
+            "messages": self.history(),
+            "summary": self.summary,
+            "created_at": self.created_at
+        }
+
+
+class SessionBackend:
+    """Optional persistent storage behind the in-memory store"""
+
+    async def load(self, session_id: str) -> Optional[dict]:
+        """Stored session data plus its `updated_at` (ISO 8601), or None"""
+        raise NotImplementedError
+
+    async def save(self, session: ConversationSession):
+        raise NotImplementedError
+
+    async def delete(self, session_id: str):
+        raise NotImplementedError
+
+
+class SupabaseSessionBackend(SessionBackend):
+    """
+    Stores sessions in a Supabase table:
+    conversation_sessions(session_id text primary key, data jsonb, updated_at timestamptz)
+    All three operations are idempotent, so they go through the Supabase breaker with retries.
+    """
+
+    def __init__(self, client, table: str = "conversation_sessions"):
+        self.client = client
+        self.table = table
+
+    async def load(self, session_id: str) -> Optional[dict]:
+        result = await self._execute(
+            lambda: self.client.table(self.table).select("data, updated_at").eq("session_id", session_id).execute()
+        )
+        if not result.data:
+            return None
+        row = result.data[0]
+        return {**row["data"], "updated_at": row.get("updated_at")}
+
+    async def save(self, session: ConversationSession):
+        row = {
+            "session_id": session.session_id,
+            "data": session.to_dict(),
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        await self._execute(lambda: self.client.table(self.table).upsert(row).execute())
+
+    async def delete(self, session_id: str):
+        await self._execute(
+            lambda: self.client.table(self.table).delete().eq("session_id", session_id).execute()
+        )
+    
+    async def _execute(self, query):
+        return await asyncio.to_thread(call, supabase_breaker, query, retry_policy)
+
+
+class SessionStore:
+    """
+    In-memory session store with TTL and LRU eviction
+    Sessions idle longer than ttl_seconds are dropped; at most max_sessions are kept.
+    """
+
+    def __init__(self, max_messages: int = 20, ttl_seconds: float = 3600,
+                 max_sessions: int = 10000, backend: Optional[SessionBackend] = None):
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.backend = backend
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+
+    async def create(self, tutor_settings: dict) -> ConversationSession:
+        """Start a new session"""
+        self.evict_expired()
+        session = ConversationSession(uuid.uuid4().hex, tutor_settings, self.max_messages)
+        self._remember(session)
+        await self._persist(session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[ConversationSession]:
+        """Look up a live session, falling back to the persistent backend"""
+        self.evict_expired()
+        session = self._sessions.get(session_id)
+        if session is None and self.backend:
+            data = await self.backend.load(session_id)
+            if data and _idle_seconds(data.get("updated_at")) > self.ttl_seconds:
+                # Expired while out of memory: the TTL applies to stored sessions too
+                await self.backend.delete(session_id)
+                data = None
+            if data:
+                session = ConversationSession(
+                    session_id,
+                    data.get("settings", {}),
+                    self.max_messages,
+                    messages=data.get("messages"),
+                    created_at=data.get("created_at"),
+                    summary=data.get("summary")
+                )
+        if session is None:
+            return None
+        session.last_access = time.monotonic()
+        self._remember(session)
+        return session
+
+    async def append(self, session: ConversationSession, *messages: dict):
+        """Add messages to a session (schedule a history fold afterwards to keep it bounded)"""
+        session.messages.extend({"role": m["role"], "content": m["content"]} for m in messages)
+        session.last_access = time.monotonic()
+        await self._persist(session)
+
+    async def save(self, session: ConversationSession):
+        """Persist a session after an out-of-band change"""
+        await self._persist(session)
+
+    async def delete(self, session_id: str) -> bool:
+        """End a session"""
+        removed = self._sessions.pop(session_id, None) is not None
+        if self.backend:
+            await self.backend.delete(session_id)
+        return removed
+
+    def evict_expired(self):
+        """Drop sessions idle longer than the TTL (oldest access first)"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access >= cutoff:
+                break
+            del self._sessions[session_id]
+
+    def stats(self) -> dict:
+        return {"active_sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+    async def _persist(self, session: ConversationSession):
+        """Save to the backend; the in-memory copy keeps the turn going if Supabase is down"""
+        if not self.backend:
+            return
+        try:
+            await self.backend.save(session)
+        except Exception as e:
+            logger.warning("Session persist error: %s", e)
+
+    def _remember(self, session: ConversationSession):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+def _idle_seconds(updated_at: Optional[str]) -> float:
+    """Seconds since a stored session was last saved (0 when unknown)"""
+    if not updated_at:
+        return 0.0
+    try:
+        saved = datetime.fromisoformat(updated_at)
+    except ValueError:
+        return 0.0
+    if saved.tzinfo is None:
+        saved = saved.replace(tzinfo=timezone.utc)  # saved from datetime.utcnow()
+    return (datetime.now(timezone.utc) - saved).total_seconds()
+
+
+def _build_backend() -> Optional[SessionBackend]:
+    if not settings.session_persist:
+        return None
+    from supabase import create_client
+    return SupabaseSessionBackend(create_client(settings.supabase_url, settings.supabase_key))
+
+
+session_store = SessionStore(
+    max_messages=settings.session_max_messages,
+    ttl_seconds=settings.session_ttl_minutes * 60,
+    max_sessions=settings.session_max_sessions,
+    backend=_build_backend()
+)
+
+
+async def load_session(session_id: Optional[str]) -> Optional[ConversationSession]:
+    """Look up a session, 404 if the id is unknown or expired"""
+    if not session_id:
+        return None
+    try:
+        session = await session_store.get(session_id)
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail="Session storage temporarily unavailable",
+                            headers=circuit_open_headers(e))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
@@ -0,0 +1,64 @@
+"""
+Single-Flight Service
+Concurrent identical provider calls share one upstream request
+"""
+from typing import Any, Awaitable, Callable, Dict, List
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls by key: the first caller starts the work, callers
+    arriving while it runs wait for the same result (or exception). Nothing is
+    kept once the call finishes; caching stays with the caller.
+    The shared call runs as its own task, so a waiter that is cancelled (a
+    disconnected client) does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.calls = 0
+        self.executions = 0
+        self.max_fan_in = 0
+        _groups.append(self)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() unless an identical call is already in flight, then share its result"""
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._finish(key, done))
+        self._waiters[key] += 1
+        self.max_fan_in = max(self.max_fan_in, self._waiters[key])
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.executions,
+            "coalesced": self.calls - self.executions,
+            "fan_in_ratio": round(self.calls / self.executions, 2) if self.executions else None,
+            "max_fan_in": self.max_fan_in,
+            "in_flight": len(self._flights)
+        }
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self._flights.pop(key, None)
+        self._waiters.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter has gone
+            task.exception()
+
+
+_groups: List[SingleFlight] = []
+
+
+def coalescing_stats() -> Dict[str, Dict[str, Any]]:
+    """Fan-in counters per single-flight group"""
+    return {group.name: group.stats() for group in _groups}
@@ -0,0 +1,10 @@
+"""
+SSE Service
+Server-sent event formatting shared by the streaming endpoints
+"""
+import json
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,302 @@
+"""
+Tutor Service
+Builds tutor prompts and streams replies, synthesizing speech sentence by sentence
+"""
+from collections import deque
+from typing import Any, AsyncIterator, Deque, List, Optional, Tuple
+import asyncio
+import base64
+import logging
+
+import sys
+sys.path.append('..')
+from config import get_settings
+from context_window import ContextWindow, summary_messages
+from llm_deadline import Deadline, DeadlineExceeded, canned_reply
+from response_parser import CONVERSATION, CORRECTION, SentenceSplitter, TutorResponseParser, parse_correction
+from resilience import acall
+from tutor_prompt import build_system_prompt
+from services import google_audio
+from services.providers import openai_breaker, retry_policy
+from services.scheduler import run_in_background
+from services.llm import complete, get_openai_client, llm_slot, open_stream
+from services.sessions import ConversationSession, session_store
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Prompt history is bounded by tokens, not by message count
+context_window = ContextWindow(
+    budget_tokens=settings.context_budget_tokens,
+    min_recent_messages=settings.context_min_recent_messages,
+    model=settings.openai_model
+)
+
+
+def language_code_for(language: str) -> str:
+    """Default speech language code for a tutor language"""
+    return "fr-FR" if language == "French" else "en-US"
+
+
+def build_messages(
+    message: str,
+    history: List[dict],
+    language: str = "English",
+    level: str = "Intermediate (B1-B2)",
+    persona: str = "Friendly",
+    topic: str = "General",
+    summary: Optional[str] = None,
+    mode: str = "combined"
+) -> List[dict]:
+    """
+    Build the OpenAI message list for a tutor turn
+    mode "conversation" asks for the reply only (see build_correction_messages)
+    """
+    # Static instructions first so the provider can cache the shared prompt prefix
+    sys_prompt = build_system_prompt(language, persona, topic, level, mode=mode)
+    
+    # Build messages for API
+    messages = [{"role": "system", "content": sys_prompt}]
+    
+    # Add the rolling summary and the newest turns that fit the token budget
+    for msg in context_window.build(history, summary):
+        messages.append({"role": msg["role"], "content": msg["content"]})
+    
+    # Add current message
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+def build_correction_messages(
+    message: str,
+    history: List[dict],
+    language: str = "English",
+    level: str = "Intermediate (B1-B2)",
+    persona: str = "Friendly",
+    topic: str = "General",
+    summary: Optional[str] = None
+) -> List[dict]:
+    """
+    Build a correction-only request: just the tutor's last line and the learner's message
+    summary is accepted so the same settings dict works for both builders; it is not sent
+    """
+    messages = [{"role": "system", "content": build_system_prompt(language, persona, topic, level, mode="correction")}]
+    if history and history[-1]["role"] == "assistant":
+        messages.append({"role": "assistant", "content": history[-1]["content"]})
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+def build_request_messages(
+    request: Any,
+    session: Optional[ConversationSession] = None
+) -> Tuple[List[dict], Optional[List[dict]]]:
+    """
+    Build the OpenAI message lists for a conversation request
+    request is a ConversationRequest (message, history, split_correction and the
+    tutor settings); with a session, its history and settings are used instead.
+    Returns (reply messages, correction messages); the latter is None unless
+    split_correction is set, in which case the reply prompt is conversation-only.
+    """
+    if session:
+        history, summary, tutor_settings = session.history(), session.summary, session.tutor_settings
+    else:
+        history, summary = [msg.model_dump() for msg in request.history], None
+        tutor_settings = request.model_dump(include={"language", "level", "persona", "topic"})
+    
+    if not request.split_correction:
+        return build_messages(request.message, history, summary=summary, **tutor_settings), None
+    return (
+        build_messages(request.message, history, summary=summary, mode="conversation", **tutor_settings),
+        build_correction_messages(request.message, history, **tutor_settings)
+    )
+
+
+def language_for_code(language_code: str) -> str:
+    """Tutor language for a speech language code"""
+    return "French" if language_code.lower().startswith("fr") else "English"
+
+
+async def generate_correction(messages: List[dict], deadline: Optional[Deadline] = None) -> Optional[str]:
+    """Run a correction-only request"""
+    content, _ = await complete(messages, deadline)
+    return parse_correction(content)
+
+
+async def fold_session_history(session: ConversationSession):
+    """
+    Fold turns that left the context window, or that exceed the session's
+    max_messages, into the session's rolling summary
+    """
+    if session.folding:
+        return
+    history = session.history()
+    overflow = context_window.overflow(history)
+    excess = len(history) - session.max_messages
+    if excess > len(overflow):
+        overflow = history[:excess]
+    if not overflow:
+        return
+    session.folding = True
+    try:
+        async with llm_slot():
+            response = await acall(openai_breaker, lambda: get_openai_client().chat.completions.create(
+                model=settings.openai_model,
+                messages=summary_messages(session.summary, overflow),
+                max_tokens=settings.context_summary_max_tokens
+            ), retry_policy)
+        summary = (response.choices[0].message.content or "").strip()
+        if summary:
+            session.summary = summary
+            # Appends during the call may have pushed folded turns out of the buffer
+            # already; remove only the folded turns that are still at its head
+            for message in overflow:
+                if session.messages and session.messages[0] is message:
+                    session.messages.popleft()
+            await session_store.save(session)
+    except Exception as e:
+        logger.warning("History summary error: %s", e)
+    finally:
+        session.folding = False
+
+
+def schedule_history_fold(session: ConversationSession):
+    """Update the rolling summary as background work, off the turn's critical path"""
+    run_in_background(fold_session_history(session))
+
+
+async def stream_reply(
+    messages: List[dict],
+    voice_name: Optional[str] = None,
+    language_code: str = "en-US",
+    correction_messages: Optional[List[dict]] = None,
+    deadline: Optional[Deadline] = None
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Stream a tutor reply as (event, data) pairs
+    
+    - ("conversation", {"text"}): conversation text deltas
+    - ("correction", {"text"}): the correction, once its block closes
+    - ("audio", {"index", "text", "audio"}): base64 MP3 per sentence, in order,
+      only when voice_name is given; each sentence is sent to TTS as soon as it
+      is complete, while the LLM is still generating
+    - ("audio_error", {"index", "text", "detail"}): a sentence failed to synthesize
+    - ("text_only", {"detail"}): the TTS circuit is open, the rest of the reply
+      has no audio (PRD 5.3 text-only fallback)
+    - ("done", {"conversation", "correction", "source", "text_only"}): the final
+      parsed reply; source is "primary", "hedge", "fallback" or "canned" (see services.llm)
+    
+    The deadline (default: llm_turn_deadline_seconds from now) bounds the time to
+    the first token; when no model makes it, a canned reply is streamed instead.
+    With correction_messages, `messages` should be a conversation-only prompt: the
+    correction is generated by a concurrent request and sent as soon as it is ready,
+    so it never delays the reply text or audio.
+    """
+    deadline = deadline or Deadline(settings.llm_turn_deadline_seconds)
+    parser = TutorResponseParser()
+    correction_task = (
+        asyncio.create_task(generate_correction(correction_messages, deadline)) if correction_messages else None
+    )
+    
+    def correction_event() -> Optional[Tuple[str, dict]]:
+        nonlocal correction_task
+        if correction_task is None or not correction_task.done():
+            return None
+        task, correction_task = correction_task, None
+        try:
+            parser.correction = task.result()
+        except Exception as e:
+            # The reply still goes out; only the grammar feedback is lost
+            logger.warning("Correction error: %s", e)
+            return None
+        return (CORRECTION, {"text": parser.correction}) if parser.correction else None
+    
+    splitter = SentenceSplitter()
+    pending: Deque[Tuple[int, str, asyncio.Task]] = deque()
+    sentence_count = 0
+    speak = bool(voice_name)
+    
+    def start_tts(sentences: List[str]) -> List[Tuple[str, dict]]:
+        nonlocal sentence_count, speak
+        for sentence in sentences:
+            if not google_audio.tts_available():
+                # Fail fast instead of queueing sentences for a provider that is down
+                speak = False
+                return [("text_only", {"detail": "Speech synthesis is unavailable, continuing without audio"})]
+            task = asyncio.create_task(
+                google_audio.synthesize(sentence, language_code=language_code, voice_name=voice_name)
+            )
+            pending.append((sentence_count, sentence, task))
+            sentence_count += 1
+        return []
+    
+    async def pop_audio_event() -> Tuple[str, dict]:
+        index, sentence, task = pending.popleft()
+        try:
+            audio = await task
+            return "audio", {
+                "index": index,
+                "text": sentence,
+                "audio": base64.b64encode(audio).decode()
+            }
+        except Exception as e:
+            return "audio_error", {"index": index, "text": sentence, "detail": str(e)}
+    
+    def handle(events: List[Tuple[str, str]]) -> List[Tuple[str, dict]]:
+        out = []
+        for kind, text in events:
+            out.append((kind, {"text": text}))
+            if kind == CONVERSATION and speak:
+                out.extend(start_tts(splitter.feed(text)))
+        return out
+    
+    llm_stream = None
+    try:
+        try:
+            llm_stream = await open_stream(messages, deadline)
+            source = llm_stream.source
+        except DeadlineExceeded:
+            if not settings.llm_canned_reply_enabled:
+                raise
+            source = "canned"
+        
+        if llm_stream is None:
+            for event in handle(parser.feed(canned_reply(language_for_code(language_code)))):
+                yield event
+        else:
+            async for text in llm_stream:
+                for event in handle(parser.feed(text)):
+                    yield event
+                # Forward finished sentence audio without waiting for the LLM
+                while pending and pending[0][2].done():
+                    yield await pop_audio_event()
+                event = correction_event()
+                if event:
+                    yield event
+            await llm_stream.aclose()
+        
+        for event in handle(parser.close()):
+            yield event
+        if speak:
+            for event in start_tts(splitter.close()):
+                yield event
+        while pending:
+            yield await pop_audio_event()
+            event = correction_event()
+            if event:
+                yield event
+        
+        if correction_task is not None:
+            await asyncio.wait([correction_task])
+            event = correction_event()
+            if event:
+                yield event
+        
+        yield "done", {**parser.result(), "source": source, "text_only": bool(voice_name) and not speak}
+    finally:
+        if llm_stream is not None:
+            await llm_stream.aclose()
+        for _, _, task in pending:
+            task.cancel()
+        if correction_task is not None:
+            correction_task.cancel()
@@ -0,0 +1,139 @@
+"""
+Upload Service
+Rejects oversized multipart uploads before the body is parsed and spooled, and
+reads accepted recordings within the size and duration limits
+"""
+from typing import Callable
+import json
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from audio_format import AudioFormatError, probe_duration
+from config import get_settings
+
+settings = get_settings()
+
+# Room for the multipart framing and the form fields sent next to the file (e.g. history)
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+UPLOAD_CHUNK_BYTES = 256 * 1024
+
+
+def max_form_bytes() -> int:
+    """Largest multipart body accepted: the audio limit plus the form overhead"""
+    return int(settings.max_upload_mb * 1024 * 1024) + FORM_OVERHEAD_BYTES
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware bounding multipart/form-data request bodies.
+    A Content-Length over the limit is answered with 413 before anything is read;
+    a body without one (chunked) is counted as it arrives and cut off at the limit.
+    The exact per-file limits are checked again by read_audio_upload.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope["type"] != "http" or not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+
+        limit = max_form_bytes()
+        length = self._header(scope, b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            await self._reject(send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> dict:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing; FastAPI passes HTTPException through as is
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    def _header(scope: dict, name: bytes):
+        for key, value in scope.get("headers", []):
+            if key == name:
+                return value.decode("latin-1")
+        return None
+
+    def _is_multipart(self, scope: dict) -> bool:
+        content_type = self._header(scope, b"content-type") or ""
+        return content_type.lower().startswith("multipart/form-data")
+
+    @staticmethod
+    def _detail() -> str:
+        return f"Audio file is larger than {settings.max_upload_mb:g} MB"
+
+    async def _reject(self, send: Callable):
+        body = json.dumps({"detail": self._detail()}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def read_audio_upload(file: UploadFile) -> bytearray:
+    """
+    Read an uploaded recording into one buffer, in bounded chunks
+    
+    UploadLimitMiddleware has refused oversized bodies before parsing; the multipart
+    parser has spooled this one (to disk beyond 1 MB). It is read once, straight into
+    a buffer sized up front, without a second copy of the upload. Decoding a WAV later
+    works on float32 copies, so peak memory is a few times the upload, bounded by
+    max_upload_mb. 413 beyond max_upload_mb, or beyond max_audio_seconds
+    going by the container header (before any decoding or Google call); 400 when
+    the file is empty or has a broken WAV header.
+    """
+    max_bytes = int(settings.max_upload_mb * 1024 * 1024)
+    too_large = HTTPException(status_code=413, detail=f"Audio file is larger than {settings.max_upload_mb:g} MB")
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+    
+    readinto = getattr(file.file, "readinto", None)
+    if file.size is not None and readinto is not None:
+        buffer = bytearray(file.size)
+        filled = 0
+        with memoryview(buffer) as view:
+            while filled < len(buffer):
+                count = await run_in_threadpool(readinto, view[filled:filled + UPLOAD_CHUNK_BYTES])
+                if not count:
+                    break
+                filled += count
+        del buffer[filled:]
+    else:
+        buffer = bytearray()
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            if len(buffer) + len(chunk) > max_bytes:
+                raise too_large
+            buffer += chunk
+    
+    if not buffer:
+        raise HTTPException(status_code=400, detail="Empty audio file")
+    try:
+        duration = probe_duration(buffer)
+    except AudioFormatError as e:
+        raise HTTPException(status_code=400, detail=f"Unsupported audio: {str(e)}")
+    if duration is not None and duration > settings.max_audio_seconds:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Recording is {duration:.0f}s long; the limit is {settings.max_audio_seconds:g}s"
+        )
+    return buffer
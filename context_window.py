@@ -0,0 +1,146 @@
+"""
+Conversation context utilities for the AI Language Tutor app.
+This module keeps the prompt within a token budget: the newest turns are kept
+verbatim and older turns are folded into a rolling summary.
+"""
+
+import math
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+# Per-message overhead of the chat format (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of a language tutoring conversation.
+Merge the previous summary with the new turns into one short paragraph (at most 80 words).
+Keep facts the learner shared, topics covered and recurring mistakes. Write in English."""
+
+
+@lru_cache(maxsize=4)
+def _encoding(model: str):
+    """tiktoken encoding for a model, or None if it cannot be loaded"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # Encodings are downloaded on first use, which fails on offline hosts
+        print(f"Token counter falling back to estimates: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count tokens locally (tiktoken when available, ~4 chars/token otherwise)"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Leading part of text that fits in max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def message_tokens(message: Dict, model: str = "gpt-4o-mini") -> int:
+    """Tokens a chat message adds to the prompt"""
+    return count_tokens(message.get("content", ""), model) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextWindow:
+    """
+    Token-budgeted history window.
+    select() fills budget_tokens with the newest messages (always keeping at
+    least min_recent_messages, trimming the oldest of them when even those do
+    not fit); overflow() returns the older messages that no longer fit and
+    should be folded into the summary.
+    """
+
+    def __init__(self, budget_tokens: int = 1000, min_recent_messages: int = 2, model: str = "gpt-4o-mini"):
+        self.budget_tokens = budget_tokens
+        self.min_recent_messages = min_recent_messages
+        self.model = model
+
+    def _split_index(self, history: List[Dict]) -> int:
+        """Index of the first message that fits in the window"""
+        used = 0
+        index = len(history)
+        while index > 0:
+            cost = message_tokens(history[index - 1], self.model)
+            kept = len(history) - index
+            if used + cost > self.budget_tokens and kept >= self.min_recent_messages:
+                break
+            used += cost
+            index -= 1
+        return index
+
+    def select(self, history: List[Dict]) -> List[Dict]:
+        """Newest messages that fit in the budget"""
+        selected = history[self._split_index(history):]
+        excess = sum(message_tokens(m, self.model) for m in selected) - self.budget_tokens
+        # Only the min_recent_messages can exceed the budget: cut them oldest first
+        trimmed = []
+        for message in selected:
+            if excess > 0:
+                content = message.get("content", "")
+                kept = truncate_tokens(content, count_tokens(content, self.model) - excess, self.model)
+                excess -= count_tokens(content, self.model) - count_tokens(kept, self.model)
+                message = {**message, "content": kept}
+            trimmed.append(message)
+        return trimmed
+
+    def overflow(self, history: List[Dict]) -> List[Dict]:
+        """Older messages that fall outside the budget"""
+        return history[:self._split_index(history)]
+
+    def build(self, history: List[Dict], summary: Optional[str] = None) -> List[Dict]:
+        """Prompt messages for the history: the summary (if any) then the window"""
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        return messages + self.select(history)
+
+
+def summary_messages(previous_summary: Optional[str], folded: List[Dict]) -> List[Dict]:
+    """Messages asking an LLM to merge folded turns into the running summary"""
+    turns = "\n".join(f"{m['role']}: {m['content']}" for m in folded)
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": f"Previous summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{turns}"}
+    ]
+
+
+def fold_history(
+    window: ContextWindow,
+    history: List[Dict],
+    summary: Optional[str],
+    summarized_count: int,
+    summarize: Callable[[List[Dict]], str]
+) -> Tuple[Optional[str], int]:
+    """
+    Fold messages that left the window into the summary.
+    history is the full message list and summarized_count how many of its
+    leading messages the summary already covers. Returns the new
+    (summary, summarized_count); summarize() receives the LLM messages.
+    """
+    overflow = window.overflow(history)
+    if len(overflow) <= summarized_count:
+        return summary, summarized_count
+    new_summary = summarize(summary_messages(summary, overflow[summarized_count:]))
+    return new_summary.strip() or summary, len(overflow)
@@ -0,0 +1,79 @@
+"""
+LLM latency budget utilities for the AI Language Tutor app.
+This module holds the per-turn deadline, the latency tracker that sets the
+hedge delay, and the canned replies used when the budget runs out.
+It is shared by the Streamlit app and the FastAPI backend.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional
+
+# PRD targets: NFR-1.2 (LLM response < 2s) and NFR-1.4 (end-to-end turn < 5s)
+LLM_RESPONSE_DEADLINE_SECONDS = 2.0
+TURN_DEADLINE_SECONDS = 5.0
+
+# Said by the tutor when no model answers in time; keeps the conversation going
+CANNED_REPLIES = {
+    "English": "Sorry, I didn't quite catch that. Could you say it again?",
+    "French": "Pardon, je n'ai pas bien compris. Tu peux répéter ?"
+}
+
+
+class DeadlineExceeded(Exception):
+    """No model produced a reply within the turn's budget"""
+
+
+class Deadline:
+    """Absolute point in time a turn must finish by, passed down to each stage"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, seconds: Optional[float] = None) -> float:
+        """The smaller of a stage budget and the time left"""
+        return self.remaining() if seconds is None else min(seconds, self.remaining())
+
+
+class LatencyTracker:
+    """
+    Sliding window of observed latencies (seconds).
+    percentile() falls back to `default` until min_samples have been recorded.
+    """
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, default: float) -> float:
+        """Nearest-rank percentile (0-100) of the window"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return default
+            ordered = sorted(self._samples)
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+def canned_reply(language: str = "English") -> str:
+    """Tagged tutor reply used when the deadline runs out"""
+    text = CANNED_REPLIES.get(language, CANNED_REPLIES["English"])
+    return f"<conversation>\n{text}\n</conversation>"
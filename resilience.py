@@ -0,0 +1,267 @@
+"""
+Provider resilience utilities for the AI Language Tutor app.
+This module wraps calls to external providers (OpenAI, Google STT/TTS, Supabase)
+in per-dependency circuit breakers and retries transient failures with bounded,
+jittered exponential backoff. When a circuit is open, calls fail fast with
+CircuitOpen instead of waiting out the provider timeout.
+It is shared by the Streamlit app, user_auth and the FastAPI backend.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# HTTP statuses worth retrying: rate limited or a server-side failure
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Exception class names of timeouts and connection failures across the provider SDKs
+TRANSIENT_ERROR_NAMES = {
+    "TimeoutError", "ConnectionError", "APITimeoutError", "APIConnectionError",
+    "TimeoutException", "ConnectTimeout", "ReadTimeout", "ConnectError", "ReadError",
+    "RemoteProtocolError", "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests",
+    "InternalServerError", "BadGateway", "GatewayTimeout", "ResourceExhausted", "RetryError"
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """A dependency's circuit is open; the call was not attempted"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an error is a timeout, connection failure, rate limit or 5xx"""
+    if isinstance(error, CircuitOpen):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    for cls in type(error).__mro__:
+        if cls.__name__ in TRANSIENT_ERROR_NAMES:
+            return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if callable(status):  # grpc.RpcError.code()
+        status = getattr(status(), "name", None)
+        return status in ("UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED", "INTERNAL")
+    return isinstance(status, int) and status in TRANSIENT_STATUS_CODES
+
+
+class CircuitBreaker:
+    """
+    Per-dependency circuit breaker.
+    Opens after failure_threshold consecutive transient failures, rejects calls
+    for recovery_seconds, then lets half_open_max_calls probes through: a
+    successful probe closes the circuit, a failed one opens it again.
+    Thread-safe, so the Streamlit worker threads can share one breaker.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_seconds: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being rejected"""
+        return self.state == OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed"""
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.recovery_seconds - time.monotonic())
+
+    def before_call(self):
+        """Reserve a call, raising CircuitOpen when the circuit rejects it"""
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN and self._probes >= self.half_open_max_calls:
+                state = OPEN
+            if state == OPEN:
+                self.rejected += 1
+                retry_after = max(1.0, self._opened_at + self.recovery_seconds - time.monotonic())
+                raise CircuitOpen(self.name, retry_after)
+            if state == HALF_OPEN:
+                self._probes += 1
+            self.calls += 1
+
+    def release(self):
+        """Give back a reservation whose outcome is unknown (the call was cancelled)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        """Count a failure; non-transient errors (bad input, auth) do not trip the circuit"""
+        if error is not None and not is_transient(error):
+            self.record_success()
+            return
+        with self._lock:
+            self.failures += 1
+            self._failures += 1
+            if self._current_state() == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "opened": self.opened
+            }
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+
+class RetryPolicy:
+    """Bounded exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Build a policy from RETRY_MAX_ATTEMPTS / RETRY_BASE_DELAY_SECONDS / RETRY_MAX_DELAY_SECONDS"""
+        return cls(
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.2")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY_SECONDS", "2.0"))
+        )
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **options) -> CircuitBreaker:
+    """
+    Process-wide breaker for a dependency, created on first use.
+    Options default to BREAKER_FAILURE_THRESHOLD / BREAKER_RECOVERY_SECONDS.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            options.setdefault("failure_threshold", int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")))
+            options.setdefault("recovery_seconds", float(os.getenv("BREAKER_RECOVERY_SECONDS", "30")))
+            breaker = _breakers[name] = CircuitBreaker(name, **options)
+        return breaker
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """State and counters of every breaker"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+# ==================== Guarded Calls ====================
+
+def _should_retry(error: BaseException, attempt: int, policy: RetryPolicy, budget_end: Optional[float],
+                  delay: float) -> bool:
+    if attempt >= policy.max_attempts or not is_transient(error):
+        return False
+    return budget_end is None or time.monotonic() + delay < budget_end
+
+
+def call(breaker: CircuitBreaker, fn: Callable[[], Any], policy: RetryPolicy = NO_RETRY,
+         budget_seconds: Optional[float] = None) -> Any:
+    """
+    Call fn() through a breaker, retrying transient failures.
+    Only retry idempotent calls. budget_seconds stops retries that would not
+    finish in time. Raises CircuitOpen without calling fn when the circuit is open.
+    """
+    budget_end = time.monotonic() + budget_seconds if budget_seconds is not None else None
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            breaker.record_failure(e)
+            delay = policy.delay(attempt)
+            if not _should_retry(e, attempt, policy, budget_end, delay):
+                raise
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+async def acall(breaker: CircuitBreaker, fn: Callable[[], Awaitable[Any]], policy: RetryPolicy = NO_RETRY,
+                budget_seconds: Optional[float] = None) -> Any:
+    """Async version of call(): fn() returns a fresh awaitable per attempt"""
+    budget_end = time.monotonic() + budget_seconds if budget_seconds is not None else None
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # A cancelled call (e.g. a losing hedge) says nothing about the provider
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure(e)
+            delay = policy.delay(attempt)
+            if not _should_retry(e, attempt, policy, budget_end, delay):
+                raise
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
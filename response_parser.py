@@ -0,0 +1,238 @@
+"""
+Tutor response parsing utilities for the AI Language Tutor app.
+This module splits the tutor's tagged reply into its <conversation> and
+<correction> parts, either all at once or incrementally while the LLM streams,
+and cuts streamed conversation text into sentences for early synthesis.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+CONVERSATION = "conversation"
+CORRECTION = "correction"
+
+PLACEHOLDER_CORRECTIONS = ['-', 'none', 'n/a', 'None', 'N/A']
+
+# Sentence end: terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_END = re.compile(r'[.!?…]+["\'”’»)\]]*\s+')
+
+# Words ending in "." that do not end a sentence (English and French)
+ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'st', 'vs', 'etc', 'e.g', 'i.e', 'mme', 'mlle', 'm', 'p', 'ex'}
+
+
+def clean_correction(correction: Optional[str]) -> Optional[str]:
+    """Drop empty or placeholder corrections"""
+    if correction is None:
+        return None
+    correction = correction.strip()
+    if len(correction) < 3 or correction in PLACEHOLDER_CORRECTIONS:
+        return None
+    return correction
+
+
+def parse_tutor_response(full_response: str) -> Dict[str, Optional[str]]:
+    """
+    Parse a complete tutor reply.
+    Falls back to the whole text as conversation when the tags are missing.
+    """
+    full_response = full_response.strip()
+    conversation_match = re.search(r'<conversation>(.*?)</conversation>', full_response, re.DOTALL)
+    correction_match = re.search(r'<correction>(.*?)</correction>', full_response, re.DOTALL)
+
+    conversation = conversation_match.group(1).strip() if conversation_match else full_response
+    correction = correction_match.group(1) if correction_match else None
+
+    return {
+        "conversation": conversation,
+        "correction": clean_correction(correction)
+    }
+
+
+def parse_correction(response: str) -> Optional[str]:
+    """Parse the reply of a correction-only request"""
+    match = re.search(r'<correction>(.*?)(</correction>|$)', response, re.DOTALL)
+    return clean_correction(match.group(1) if match else response)
+
+
+class TutorResponseParser:
+    """
+    Incremental parser for a streamed tutor reply.
+
+    feed() returns a list of (kind, text) events:
+    - ("conversation", delta) as soon as conversation text is known to be final
+    - ("correction", text) once, when the <correction> block closes
+    Text that could be the start of a tag is held back until the next chunk.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._raw: List[str] = []
+        self._section: Optional[str] = None
+        self._section_started = False
+        self._conversation_parts: List[str] = []
+        self._correction_parts: List[str] = []
+        self._saw_conversation = False
+        self._correction_sent = False
+        self.correction: Optional[str] = None
+
+    @property
+    def conversation(self) -> str:
+        """Conversation text received so far"""
+        return "".join(self._conversation_parts).strip()
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume the next chunk of model output"""
+        if not chunk:
+            return []
+        self._raw.append(chunk)
+        self._buffer += chunk
+        events: List[Tuple[str, str]] = []
+
+        while True:
+            if self._section is None:
+                if not self._open_next_section():
+                    break
+                continue
+
+            closing_tag = f"</{self._section}>"
+            end = self._buffer.find(closing_tag)
+            if end != -1:
+                self._emit(self._buffer[:end], events, final=True)
+                self._buffer = self._buffer[end + len(closing_tag):]
+                self._close_section(events)
+                continue
+
+            # Hold back a trailing fragment that may be the start of the closing tag
+            hold = _partial_tag_length(self._buffer, closing_tag)
+            ready = self._buffer[:len(self._buffer) - hold]
+            self._buffer = self._buffer[len(self._buffer) - hold:]
+            self._emit(ready, events, final=False)
+            break
+
+        return events
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush remaining text once the stream has ended"""
+        events: List[Tuple[str, str]] = []
+
+        if self._section is not None:
+            # Unterminated section: treat the rest of the buffer as its content
+            self._emit(self._buffer, events, final=True)
+            self._buffer = ""
+            self._close_section(events)
+
+        if not self._saw_conversation:
+            # Model ignored the format: the whole reply is conversation
+            text = "".join(self._raw).strip()
+            text = re.sub(r'<correction>.*?(</correction>|$)', '', text, flags=re.DOTALL).strip()
+            if text:
+                self._conversation_parts.append(text)
+                events.append((CONVERSATION, text))
+
+        return events
+
+    def result(self) -> Dict[str, Optional[str]]:
+        """Final parsed response, same shape as parse_tutor_response()"""
+        return {
+            "conversation": self.conversation,
+            "correction": self.correction
+        }
+
+    # ==================== Internals ====================
+
+    def _open_next_section(self) -> bool:
+        """Skip text outside of tags until the next opening tag"""
+        found = []
+        for section in (CONVERSATION, CORRECTION):
+            start = self._buffer.find(f"<{section}>")
+            if start != -1:
+                found.append((start, section))
+        if found:
+            start, section = min(found)
+            self._buffer = self._buffer[start + len(section) + 2:]
+            self._section = section
+            self._section_started = False
+            if section == CONVERSATION:
+                self._saw_conversation = True
+            return True
+
+        # Keep only what could still become an opening tag
+        hold = max(
+            _partial_tag_length(self._buffer, f"<{CONVERSATION}>"),
+            _partial_tag_length(self._buffer, f"<{CORRECTION}>")
+        )
+        self._buffer = self._buffer[len(self._buffer) - hold:] if hold else ""
+        return False
+
+    def _emit(self, text: str, events: List[Tuple[str, str]], final: bool):
+        if not self._section_started:
+            text = text.lstrip()
+        if final:
+            text = text.rstrip()
+        if not text:
+            return
+        self._section_started = True
+
+        if self._section == CONVERSATION:
+            self._conversation_parts.append(text)
+            events.append((CONVERSATION, text))
+        else:
+            self._correction_parts.append(text)
+
+    def _close_section(self, events: List[Tuple[str, str]]):
+        if self._section == CORRECTION and not self._correction_sent:
+            self._correction_sent = True
+            self.correction = clean_correction("".join(self._correction_parts))
+            if self.correction:
+                events.append((CORRECTION, self.correction))
+        self._section = None
+
+
+def _partial_tag_length(buffer: str, tag: str) -> int:
+    """Length of the longest buffer suffix that is a proper prefix of tag"""
+    start = buffer.find("<", max(0, len(buffer) - len(tag) + 1))
+    while start != -1:
+        if tag.startswith(buffer[start:]):
+            return len(buffer) - start
+        start = buffer.find("<", start + 1)
+    return 0
+
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitter for streamed conversation text.
+    feed() returns the sentences completed by the new text; close() returns the rest.
+    Sentences shorter than min_chars are merged into the next one so TTS is not
+    called for tiny fragments.
+    """
+
+    def __init__(self, min_chars: int = 8):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return any completed sentences"""
+        self._buffer += text
+        sentences: List[str] = []
+        search_from = 0
+
+        while True:
+            match = SENTENCE_END.search(self._buffer, search_from)
+            if not match:
+                break
+            candidate = self._buffer[:match.end()].strip()
+            last_word = candidate.rstrip('.!?…"\'”’») ]').split()[-1:] or ['']
+            if (candidate.endswith('.') and last_word[0].lower() in ABBREVIATIONS) or len(candidate) < self.min_chars:
+                search_from = match.end()
+                continue
+            sentences.append(candidate)
+            self._buffer = self._buffer[match.end():]
+            search_from = 0
+
+        return sentences
+
+    def close(self) -> List[str]:
+        """Return the trailing text once the stream has ended"""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
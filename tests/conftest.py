@@ -0,0 +1,89 @@
+"""
+Shared test setup: root modules and the backend package are importable, and the
+backend settings have the values they require without a .env file. The fixtures
+fake the OpenAI and Google TTS clients for the endpoint tests.
+"""
+import asyncio
+import os
+import re
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    TestClient for the backend app, without rate limits
+    Not entered as a context manager: the lifespan would start the real Google clients.
+    """
+    from fastapi.testclient import TestClient
+
+    import main
+
+    monkeypatch.setattr(main.settings, "rate_limit_enabled", False)
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """
+    OpenAI client answering every chat completion with reply(messages), after
+    delay(messages) seconds, streamed word by word when asked to; the prompts it
+    was sent are kept in prompts
+    """
+    from services import llm, openers, tutor
+
+    fake = SimpleNamespace(
+        prompts=[],
+        reply=lambda messages: "<conversation>\nHello there!\n</conversation>",
+        delay=lambda messages: 0
+    )
+
+    async def create(model, messages, stream=False, **kwargs):
+        fake.prompts.append(messages)
+        await asyncio.sleep(fake.delay(messages))
+        text = fake.reply(messages)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+        async def chunks():
+            for piece in re.findall(r"\s*\S+", text):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+        return chunks()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    for module in (llm, openers, tutor):
+        monkeypatch.setattr(module, "get_openai_client", lambda: client)
+    return fake
+
+
+@pytest.fixture
+def fake_tts(monkeypatch, tmp_path):
+    """
+    Google TTS client returning b"mp3:<text>", behind an empty cache; the texts
+    sent to Google are kept in the returned list
+    """
+    from services import google_audio
+    from tts_cache import TTSCache
+
+    synthesized = []
+
+    async def synthesize_speech(input, voice, audio_config):
+        synthesized.append(input.text)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(audio_content=f"mp3:{input.text}".encode())
+
+    monkeypatch.setattr(google_audio, "get_tts_client", lambda: SimpleNamespace(synthesize_speech=synthesize_speech))
+    monkeypatch.setattr(google_audio, "tts_cache", TTSCache(disk_dir=str(tmp_path)))
+    return synthesized
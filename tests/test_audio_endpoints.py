@@ -0,0 +1,136 @@
+"""Tests for the transcription and speech synthesis endpoints, against fake Google clients"""
+import base64
+import io
+import json
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from resilience import CircuitBreaker
+from services import google_audio
+
+
+def wav_bytes(samples: np.ndarray, rate: int = 44100) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes((samples * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def tone(seconds: float, rate: int = 44100) -> np.ndarray:
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.5 * np.sin(2 * np.pi * 300 * t)).astype(np.float32)
+
+
+@pytest.fixture
+def fake_speech(monkeypatch):
+    """Google STT client recognizing every clip as "bonjour"; the configs it got are kept"""
+    configs = []
+
+    async def recognize(config, audio):
+        configs.append(config)
+        alternative = SimpleNamespace(transcript="bonjour", confidence=0.8)
+        return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative])])
+
+    monkeypatch.setattr(google_audio, "get_speech_client", lambda: SimpleNamespace(recognize=recognize))
+    return configs
+
+
+def upload(client, content: bytes, **params):
+    return client.post("/api/audio/transcribe", params=params, files={"file": ("clip.wav", content, "audio/wav")})
+
+
+def test_wav_is_normalized_and_transcribed(client, fake_speech):
+    response = upload(client, wav_bytes(tone(1.0)), language_code="fr-FR")
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["transcript"], body["confidence"]) == ("bonjour", pytest.approx(0.8))
+    config = fake_speech[0]
+    assert (config.sample_rate_hertz, config.audio_channel_count, config.language_code) == (16000, 1, "fr-FR")
+
+
+def test_silent_clip_skips_google(client, fake_speech):
+    response = upload(client, wav_bytes(np.zeros(44100, dtype=np.float32)))
+    assert response.status_code == 200
+    assert response.json()["transcript"] == ""
+    assert fake_speech == []
+
+
+def test_broken_wav_is_a_400(client, fake_speech):
+    assert upload(client, b"RIFF\x04\0\0\0WAVE").status_code == 400
+    assert fake_speech == []
+
+
+def test_synthesize_returns_mp3_and_caches_it(client, fake_tts):
+    request = {"text": "Bonjour !", "language_code": "fr-FR", "voice_name": "fr-FR-Neural2-A"}
+    first = client.post("/api/audio/synthesize", json=request)
+    second = client.post("/api/audio/synthesize", json=request)
+    assert first.status_code == second.status_code == 200
+    assert first.headers["content-type"] == "audio/mpeg"
+    assert first.content == second.content == b"mp3:Bonjour !"
+    assert fake_tts == ["Bonjour !"]
+
+
+def test_synthesize_while_the_circuit_is_open_is_a_503(client, fake_tts, monkeypatch):
+    breaker = CircuitBreaker("tts", failure_threshold=1, recovery_seconds=30)
+    breaker.record_failure(TimeoutError())
+    monkeypatch.setattr(google_audio, "tts_breaker", breaker)
+    response = client.post("/api/audio/synthesize", json={"text": "Hello"})
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) > 0
+    assert fake_tts == []
+
+
+def sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_batch_synthesizes_each_distinct_item_once(client, fake_tts):
+    items = [{"text": "Hello"}, {"text": "Goodbye"}, {"text": "  Hello "}, {"text": "Hello"},
+             {"text": "Hello", "voice_name": "en-US-Neural2-C"}]
+    response = client.post("/api/audio/synthesize/batch", json={"items": items})
+    assert response.status_code == 200
+    events = sse_events(response.text)
+
+    assert sorted(fake_tts) == ["Goodbye", "Hello", "Hello"]
+    audio = {tuple(data["indexes"]): base64.b64decode(data["audio"]) for event, data in events if event == "audio"}
+    assert audio == {(0, 2, 3): b"mp3:Hello", (1,): b"mp3:Goodbye", (4,): b"mp3:Hello"}
+    assert events[-1] == ("done", {"items": 5, "unique": 3, "failed": 0})
+
+
+def test_batch_reports_failed_items_by_index(client, fake_tts, monkeypatch):
+    synthesize = google_audio.synthesize
+
+    async def failing_synthesize(text, **options):
+        if text == "Broken":
+            raise ValueError("voice not found")
+        return await synthesize(text, **options)
+
+    monkeypatch.setattr(google_audio, "synthesize", failing_synthesize)
+    items = [{"text": "Broken"}, {"text": "Fine"}, {"text": "Broken"}]
+    events = sse_events(client.post("/api/audio/synthesize/batch", json={"items": items}).text)
+    assert ("error", {"indexes": [0, 2], "detail": "voice not found"}) in events
+    assert events[-1] == ("done", {"items": 3, "unique": 2, "failed": 2})
+
+
+def test_batch_beyond_the_item_limit_is_a_413(client, fake_tts, monkeypatch):
+    monkeypatch.setattr(google_audio.settings, "tts_batch_max_items", 2)
+    response = client.post("/api/audio/synthesize/batch", json={"items": [{"text": str(i)} for i in range(3)]})
+    assert response.status_code == 413
+    assert fake_tts == []
+
+
+def test_batch_that_could_never_fit_the_burst_is_a_413(client, fake_tts, monkeypatch):
+    monkeypatch.setattr(google_audio.settings, "rate_limit_user_burst", 2.0)
+    response = client.post("/api/audio/synthesize/batch", json={"items": [{"text": str(i)} for i in range(3)]})
+    assert response.status_code == 413
+    assert fake_tts == []
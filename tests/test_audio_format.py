@@ -0,0 +1,260 @@
+"""Tests for recording decoding, resampling and normalization"""
+import io
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from audio_format import (
+    AudioFormatError, VoiceActivityDetector, decode_wav, downmix, normalize_audio, probe_duration, resample,
+    select_model, sniff_format, split_at_silence, stitch_transcripts, to_linear16
+)
+
+
+def tone(frequency: float, seconds: float, rate: int, amplitude: float = 0.5) -> np.ndarray:
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def wav_bytes(samples: np.ndarray, rate: int, channels: int = 1) -> bytes:
+    """16-bit PCM WAV of float samples shaped (frames,) or (frames, channels)"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(to_linear16(samples.reshape(-1)))
+    return buffer.getvalue()
+
+
+def float_wav_bytes(samples: np.ndarray, rate: int) -> bytes:
+    """32-bit IEEE float mono WAV"""
+    pcm = samples.astype("<f4").tobytes()
+    fmt = struct.pack("<HHIIHH", 3, 1, rate, rate * 4, 4, 32)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(pcm)) + pcm
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def dominant_frequency(samples: np.ndarray, rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    return np.fft.rfftfreq(len(samples), 1 / rate)[int(np.argmax(spectrum))]
+
+
+def test_sniff_format():
+    assert sniff_format(wav_bytes(tone(440, 0.1, 8000), 8000)) == "wav"
+    assert sniff_format(b"fLaC\0\0\0\x22") == "flac"
+    assert sniff_format(b"OggS\0\x02") == "ogg"
+    assert sniff_format(b"\x1a\x45\xdf\xa3\x01") == "webm"
+    assert sniff_format(b"ID3\x04\0") == "mp3"
+    assert sniff_format(b"\0\0\0\0") == "unknown"
+
+
+def test_decode_16_bit_stereo():
+    left, right = tone(440, 0.1, 8000), np.zeros(800, dtype=np.float32)
+    samples, rate = decode_wav(wav_bytes(np.stack([left, right], axis=1), 8000, channels=2))
+    assert rate == 8000 and samples.shape == (800, 2)
+    np.testing.assert_allclose(samples[:, 0], left, atol=1e-4)
+    np.testing.assert_allclose(downmix(samples), left / 2, atol=1e-4)
+
+
+def test_decode_float_wav():
+    signal = tone(440, 0.05, 16000)
+    samples, rate = decode_wav(float_wav_bytes(signal, 16000))
+    assert rate == 16000
+    np.testing.assert_array_equal(samples[:, 0], signal)
+
+
+def test_streamed_wav_with_zero_data_size_takes_the_rest():
+    data = bytearray(wav_bytes(tone(440, 0.1, 8000), 8000))
+    data[40:44] = b"\0\0\0\0"
+    samples, _ = decode_wav(bytes(data))
+    assert len(samples) == 800
+
+
+def test_malformed_wav_is_rejected():
+    with pytest.raises(AudioFormatError):
+        decode_wav(b"RIFF\x04\0\0\0WAVE")
+    with pytest.raises(AudioFormatError):
+        normalize_audio(b"RIFF\x04\0\0\0WAVEjunk")
+
+
+def test_inconsistent_block_align_is_a_format_error():
+    data = bytearray(wav_bytes(np.zeros((8, 2), dtype=np.float32), 8000, channels=2))
+    data[32:34] = struct.pack("<H", 3)  # 16-bit stereo frames are 4 bytes, not 3
+    with pytest.raises(AudioFormatError):
+        decode_wav(bytes(data))
+    with pytest.raises(AudioFormatError):
+        normalize_audio(bytes(data))
+
+
+def test_resample_keeps_length_and_pitch():
+    signal = tone(440, 1.0, 48000)
+    resampled = resample(signal, 48000, 16000)
+    assert len(resampled) == 16000
+    assert dominant_frequency(resampled, 16000) == pytest.approx(440, abs=2)
+    assert resample(signal, 16000, 16000) is signal
+
+
+def test_downsampling_filters_out_what_would_alias():
+    # 12 kHz is above the 8 kHz Nyquist limit at 16 kHz and would fold down to 4 kHz
+    resampled = resample(tone(12000, 1.0, 48000), 48000, 16000)
+    interior = resampled[1000:-1000]
+    assert 20 * np.log10(np.abs(interior).max() / 0.5) < -40
+
+
+def test_to_linear16_clips():
+    pcm = np.frombuffer(to_linear16(np.array([-2.0, 0.0, 0.5, 2.0])), dtype="<i2")
+    assert list(pcm) == [-32767, 0, 16383, 32767]
+
+
+def test_wav_is_normalized_to_16_khz_mono_linear16():
+    stereo = np.stack([tone(440, 1.0, 44100)] * 2, axis=1)
+    data = wav_bytes(stereo, 44100, channels=2)
+    audio = normalize_audio(data)
+    assert (audio.encoding, audio.sample_rate_hertz, audio.source_format) == ("LINEAR16", 16000, "wav")
+    assert audio.duration_seconds == pytest.approx(1.0, abs=0.01)
+    assert len(audio.content) == 2 * len(audio.samples)
+    assert audio.config_kwargs() == {"encoding": "LINEAR16", "sample_rate_hertz": 16000, "audio_channel_count": 1}
+    assert audio.report()["received_bytes"] == len(data)
+
+
+def test_low_rate_wav_is_not_upsampled():
+    audio = normalize_audio(wav_bytes(tone(440, 0.5, 8000), 8000))
+    assert audio.sample_rate_hertz == 8000
+
+
+def test_compressed_formats_pass_through():
+    flac = normalize_audio(bytearray(b"fLaC" + bytes(40)))
+    assert flac.encoding == "FLAC" and flac.sample_rate_hertz is None and isinstance(flac.content, bytes)
+    raw = normalize_audio(bytes(96000))
+    assert (raw.encoding, raw.sample_rate_hertz) == ("LINEAR16", 48000)
+
+
+# ==================== Voice Activity ====================
+
+def noise(seconds: float, rate: int, level_db: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(seconds * rate)) * 10 ** (level_db / 20)).astype(np.float32)
+
+
+def test_vad_trims_silence_around_speech():
+    rate = 16000
+    clip = np.concatenate([noise(1.0, rate, -60), tone(300, 1.0, rate), noise(1.0, rate, -60)])
+    start, end = VoiceActivityDetector(padding_seconds=0.2).speech_span(clip, rate)
+    assert start == pytest.approx(0.8 * rate, abs=0.05 * rate)
+    assert end == pytest.approx(2.2 * rate, abs=0.05 * rate)
+
+
+def test_vad_keeps_quiet_fricatives_next_to_speech():
+    rate = 16000
+    # "s": under the energy threshold (-45 dB here), but with a high zero-crossing rate
+    hiss = noise(0.3, rate, -48)
+    clip = np.concatenate([noise(1.0, rate, -70), hiss, tone(300, 0.5, rate), noise(1.0, rate, -70)])
+    start, _ = VoiceActivityDetector(padding_seconds=0.0).speech_span(clip, rate)
+    assert start <= 1.05 * rate
+
+
+def test_vad_flags_silent_and_too_short_clips():
+    rate = 16000
+    vad = VoiceActivityDetector()
+    assert vad.speech_span(noise(2.0, rate, -70), rate) is None
+    click = np.concatenate([noise(1.0, rate, -70), tone(300, 0.05, rate), noise(1.0, rate, -70)])
+    assert vad.speech_span(click, rate) is None
+
+
+def test_vad_leaves_clips_without_dynamics_alone():
+    rate = 16000
+    clip = noise(2.0, rate, -20)
+    assert VoiceActivityDetector().speech_span(clip, rate) == (0, len(clip))
+
+
+def test_normalize_trims_and_reports():
+    rate = 16000
+    clip = np.concatenate([noise(1.0, rate, -60), tone(300, 1.0, rate), noise(1.0, rate, -60)])
+    audio = normalize_audio(wav_bytes(clip, rate), vad=VoiceActivityDetector(padding_seconds=0.2))
+    assert audio.duration_seconds == pytest.approx(1.4, abs=0.06)
+    assert audio.trimmed_seconds == pytest.approx(1.6, abs=0.06)
+    silent = normalize_audio(wav_bytes(noise(1.0, rate, -70), rate), vad=VoiceActivityDetector())
+    assert silent.silent and silent.content == b"" and silent.report()["silent"]
+
+
+# ==================== Chunking ====================
+
+def test_short_clips_are_one_chunk():
+    assert split_at_silence(np.zeros(16000 * 10, dtype=np.float32), 16000) == [(0, 160000)]
+
+
+def test_chunks_are_cut_at_pauses_and_overlap():
+    rate = 16000
+    # Speech with a pause at 13-13.5 s, inside the search window before the 15 s boundary
+    clip = np.concatenate([tone(300, 13.0, rate), np.zeros(rate // 2, dtype=np.float32), tone(300, 10.0, rate)])
+    spans = split_at_silence(clip, rate, chunk_seconds=15, overlap_seconds=0.5, search_seconds=3)
+    assert len(spans) == 2
+    (first_start, first_end), (second_start, second_end) = spans
+    cut = first_end - rate // 2
+    assert 13.0 * rate <= cut <= 13.5 * rate
+    assert second_start == cut - rate // 2
+    assert (first_start, second_end) == (0, len(clip))
+
+
+def test_every_sample_is_covered_and_chunks_stay_bounded():
+    rate = 8000
+    clip = tone(300, 61.0, rate)
+    spans = split_at_silence(clip, rate, chunk_seconds=15, overlap_seconds=0.5)
+    assert spans[0][0] == 0 and spans[-1][1] == len(clip)
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert start < end  # neighbours overlap
+    assert all(end - start <= 16 * rate for start, end in spans)
+
+
+def test_stitch_drops_words_repeated_across_a_seam():
+    assert stitch_transcripts(["I went to the", "to the market yesterday"]) == "I went to the market yesterday"
+    assert stitch_transcripts(["Hello, World.", "world. How are you"]) == "Hello, World. How are you"
+
+
+def test_stitch_keeps_text_without_a_repeat():
+    assert stitch_transcripts(["I like", "tea", "", "a lot"]) == "I like tea a lot"
+    # Only the longest run up to max_overlap_words is considered
+    assert stitch_transcripts(["a b c", "a b c d"], max_overlap_words=2) == "a b c a b c d"
+
+
+# ==================== Duration Probes and Model Selection ====================
+
+def flac_header(sample_rate: int, total_samples: int) -> bytes:
+    info = bytearray(18)
+    info[10:13] = (sample_rate << 4).to_bytes(3, "big")
+    info[13] = (total_samples >> 32) & 0x0F
+    info[14:18] = (total_samples & 0xFFFFFFFF).to_bytes(4, "big")
+    return b"fLaC" + bytes([0x80, 0, 0, 34]) + bytes(info) + bytes(16)
+
+
+def test_probe_duration_reads_headers():
+    assert probe_duration(wav_bytes(tone(440, 2.5, 8000), 8000)) == pytest.approx(2.5)
+    assert probe_duration(flac_header(16000, 16000 * 30)) == pytest.approx(30.0)
+    # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz: size / bitrate
+    mp3 = b"\xff\xfb\x90\x00" + bytes(160000 - 4)
+    assert probe_duration(mp3) == pytest.approx(10.0)
+    opus = b"OggS" + bytes(24) + b"OpusHead" + bytes([1, 1, 0x38, 0x01]) + bytes(200)
+    last_page = b"OggS\x00\x04" + struct.pack("<q", 48000 * 4 + 312) + bytes(20)
+    assert probe_duration(opus + last_page) == pytest.approx(4.0)
+
+
+def test_probe_duration_unknown_header():
+    assert probe_duration(b"\x1a\x45\xdf\xa3" + bytes(100)) is None
+    with pytest.raises(AudioFormatError):
+        probe_duration(b"RIFF\x04\0\0\0WAVE")
+
+
+def test_select_model_by_duration():
+    assert select_model(3.0) == "latest_short"
+    assert select_model(8.0) == "latest_short"
+    assert select_model(8.1) == "latest_long"
+    assert select_model(None) == "latest_long"
+    assert select_model(20, short_max_seconds=30, short_model="a", long_model="b") == "a"
+
+
+def test_pass_through_audio_reports_its_header_duration():
+    audio = normalize_audio(flac_header(16000, 16000 * 5))
+    assert audio.duration_seconds == pytest.approx(5.0)
+    assert audio.report()["speech_ms"] == 5000
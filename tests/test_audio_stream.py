@@ -0,0 +1,57 @@
+"""Tests for the streaming transcription WebSocket"""
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from routers import audio
+
+
+@pytest.fixture
+def client(client, monkeypatch):
+    """The app client, with a Google streaming recognizer that keeps the audio it got"""
+    received = []
+
+    async def stream_transcribe(chunks, **options):
+        async for chunk in chunks:
+            received.append(chunk)
+        yield {"transcript": "bonjour", "is_final": True, "confidence": 0.9, "stability": 1.0}
+
+    monkeypatch.setattr(audio.google_audio, "stream_transcribe", stream_transcribe)
+    client.received = received
+    return client
+
+
+def test_stream_is_transcribed_until_the_end_event(client):
+    with client.websocket_connect("/api/audio/transcribe/stream") as ws:
+        ws.send_json({"language_code": "fr-FR"})
+        ws.send_bytes(b"\0" * 3200)
+        ws.send_bytes(b"\0" * 3200)
+        ws.send_json({"event": "end"})
+        assert ws.receive_json()["type"] == "final"
+        assert ws.receive_json() == {"type": "done", "transcript": "bonjour"}
+    assert len(client.received) == 2
+
+
+def test_stream_longer_than_max_audio_seconds_is_closed_with_1009(client, monkeypatch):
+    monkeypatch.setattr(audio.settings, "max_audio_seconds", 0.1)  # 3200 bytes of 16 kHz LINEAR16
+    with client.websocket_connect("/api/audio/transcribe/stream") as ws:
+        ws.send_json({"sample_rate_hertz": 16000})
+        ws.send_bytes(b"\0" * 3200)
+        ws.send_bytes(b"\0" * 3200)
+        assert ws.receive_json()["type"] == "final"
+        assert ws.receive_json()["type"] == "error"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1009
+    assert len(client.received) == 1
+
+
+def test_compressed_stream_is_bounded_by_max_upload_mb(client, monkeypatch):
+    monkeypatch.setattr(audio.settings, "max_upload_mb", 0.001)
+    with client.websocket_connect("/api/audio/transcribe/stream") as ws:
+        ws.send_json({"encoding": "OGG_OPUS"})
+        ws.send_bytes(b"\0" * 2000)
+        ws.receive_json()
+        assert ws.receive_json()["type"] == "error"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1009
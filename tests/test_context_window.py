@@ -0,0 +1,76 @@
+"""Tests for the token-budgeted history window and the rolling summary fold"""
+from context_window import ContextWindow, count_tokens, fold_history, message_tokens
+
+
+def history(count: int):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message number {i} " * 5}
+            for i in range(count)]
+
+
+def test_window_keeps_the_newest_messages_within_budget():
+    messages = history(10)
+    cost = message_tokens(messages[0])
+    window = ContextWindow(budget_tokens=cost * 3 + 1, min_recent_messages=1)
+    selected = window.select(messages)
+    assert selected == messages[-len(selected):]
+    assert sum(message_tokens(m) for m in selected) <= window.budget_tokens
+    assert len(selected) >= 2
+    assert window.overflow(messages) + selected == messages
+
+
+def test_window_always_keeps_min_recent_messages():
+    messages = history(6)
+    window = ContextWindow(budget_tokens=1, min_recent_messages=2)
+    assert [m["role"] for m in window.select(messages)] == [m["role"] for m in messages[-2:]]
+    assert window.overflow(messages) == messages[:-2]
+
+
+def test_min_recent_messages_are_trimmed_to_the_budget_oldest_first():
+    messages = history(4)
+    newest = message_tokens(messages[-1])
+    window = ContextWindow(budget_tokens=newest + message_tokens(messages[-2]) - 5, min_recent_messages=2)
+    selected = window.select(messages)
+    assert sum(message_tokens(m) for m in selected) <= window.budget_tokens
+    assert selected[1] == messages[-1]
+    assert messages[-2]["content"].startswith(selected[0]["content"])
+    assert 0 < count_tokens(selected[0]["content"]) < count_tokens(messages[-2]["content"])
+    assert messages[-2]["content"] == "message number 2 " * 5  # the history itself is untouched
+
+
+def test_short_history_fits_entirely():
+    messages = history(2)
+    window = ContextWindow(budget_tokens=10000)
+    assert window.select(messages) == messages
+    assert window.overflow(messages) == []
+
+
+def test_build_puts_the_summary_first():
+    messages = history(2)
+    built = ContextWindow(budget_tokens=10000).build(messages, "Learner likes jazz.")
+    assert built[0]["role"] == "system" and "Learner likes jazz." in built[0]["content"]
+    assert built[1:] == messages
+
+
+def test_fold_history_summarizes_only_new_overflow():
+    messages = history(8)
+    window = ContextWindow(budget_tokens=1, min_recent_messages=2)
+    folded = []
+
+    def summarize(llm_messages):
+        folded.append(llm_messages[-1]["content"])
+        return " summary "
+
+    summary, count = fold_history(window, messages, None, 0, summarize)
+    assert (summary, count) == ("summary", 6)
+    # Nothing new left the window: no LLM call
+    assert fold_history(window, messages, summary, count, summarize) == ("summary", 6)
+    assert len(folded) == 1
+
+    summary, count = fold_history(window, history(10), summary, count, summarize)
+    assert count == 8
+    assert "message number 6" in folded[-1] and "message number 5" not in folded[-1]
+
+
+def test_empty_summary_keeps_the_previous_one():
+    window = ContextWindow(budget_tokens=1, min_recent_messages=1)
+    assert fold_history(window, history(4), "old", 0, lambda _: "  ") == ("old", 3)
@@ -0,0 +1,115 @@
+"""Tests for the conversation endpoints, against a fake OpenAI client"""
+import json
+import time
+
+from tutor_prompt import CONVERSATION_ONLY_INSTRUCTIONS, CORRECTION_ONLY_INSTRUCTIONS
+
+REPLY = "<conversation>\nI went to Paris. Did you travel too?\n</conversation>\n<correction>\nYou said: 'I goed' → Better: 'I went'\n</correction>"
+
+
+def sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_send_returns_the_parsed_reply(client, fake_openai):
+    fake_openai.reply = lambda messages: REPLY
+    response = client.post("/api/conversation/send", json={"message": "I goed to Paris"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "conversation": "I went to Paris. Did you travel too?",
+        "correction": "You said: 'I goed' → Better: 'I went'",
+        "source": "primary"
+    }
+    assert fake_openai.prompts[0][-1] == {"role": "user", "content": "I goed to Paris"}
+
+
+def test_send_includes_the_client_history(client, fake_openai):
+    history = [{"role": "assistant", "content": "Where did you go?"}]
+    client.post("/api/conversation/send", json={"message": "Paris", "history": history})
+    assert fake_openai.prompts[0][-2:] == [*history, {"role": "user", "content": "Paris"}]
+
+
+def test_send_stream_forwards_deltas_then_correction_and_done(client, fake_openai):
+    fake_openai.reply = lambda messages: REPLY
+    response = client.post("/api/conversation/send/stream", json={"message": "I goed to Paris"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response.text)
+
+    kinds = [event for event, _ in events]
+    assert kinds[-2:] == ["correction", "done"]
+    assert set(kinds[:-2]) == {"conversation"} and len(kinds) > 3  # deltas as they arrive
+    text = "".join(data["text"] for event, data in events if event == "conversation")
+    assert text.strip() == "I went to Paris. Did you travel too?"
+    assert events[-1][1]["correction"] == "You said: 'I goed' → Better: 'I went'"
+    assert events[-1][1]["source"] == "primary"
+
+
+def test_send_stream_with_a_voice_sends_audio_per_sentence(client, fake_openai, fake_tts):
+    fake_openai.reply = lambda messages: REPLY
+    response = client.post("/api/conversation/send/stream", json={
+        "message": "I goed to Paris", "voice_name": "en-US-Journey-F"
+    })
+    audio = [data for event, data in sse_events(response.text) if event == "audio"]
+    assert [item["index"] for item in audio] == [0, 1]
+    assert [item["text"] for item in audio] == ["I went to Paris.", "Did you travel too?"]
+    assert fake_tts == ["I went to Paris.", "Did you travel too?"]
+
+
+def test_unknown_session_is_a_404(client, fake_openai):
+    response = client.post("/api/conversation/send", json={"message": "Hi", "session_id": "missing"})
+    assert response.status_code == 404
+    assert fake_openai.prompts == []
+
+
+def split_replies(messages):
+    if messages[0]["content"].startswith(CORRECTION_ONLY_INSTRUCTIONS):
+        return "<correction>\nYou said: 'I goed' → Better: 'I went'\n</correction>"
+    return "<conversation>\nI went to Paris. Did you travel too?\n</conversation>"
+
+
+def test_split_send_runs_reply_and_correction_in_parallel(client, fake_openai):
+    fake_openai.reply = split_replies
+    fake_openai.delay = lambda messages: 0.3
+    started = time.perf_counter()
+    response = client.post("/api/conversation/send", json={"message": "I goed to Paris", "split_correction": True})
+    assert time.perf_counter() - started < 0.55
+    assert response.json() == {
+        "conversation": "I went to Paris. Did you travel too?",
+        "correction": "You said: 'I goed' → Better: 'I went'",
+        "source": "primary"
+    }
+    reply_prompt, correction_prompt = sorted(
+        fake_openai.prompts, key=lambda messages: messages[0]["content"].startswith(CORRECTION_ONLY_INSTRUCTIONS)
+    )
+    assert reply_prompt[0]["content"].startswith(CONVERSATION_ONLY_INSTRUCTIONS)
+    assert correction_prompt[-1] == {"role": "user", "content": "I goed to Paris"}
+
+
+def test_split_stream_sends_the_reply_without_waiting_for_the_correction(client, fake_openai):
+    fake_openai.reply = split_replies
+    fake_openai.delay = lambda messages: 0.3 if messages[0]["content"].startswith(CORRECTION_ONLY_INSTRUCTIONS) else 0
+    response = client.post("/api/conversation/send/stream", json={
+        "message": "I goed to Paris", "split_correction": True
+    })
+    kinds = [event for event, _ in sse_events(response.text)]
+    assert kinds[0] == "conversation"
+    assert kinds[-2:] == ["correction", "done"]
+    assert sse_events(response.text)[-1][1]["correction"] == "You said: 'I goed' → Better: 'I went'"
+
+
+def test_failed_split_correction_still_returns_the_reply(client, fake_openai):
+    def replies(messages):
+        if messages[0]["content"].startswith(CORRECTION_ONLY_INSTRUCTIONS):
+            raise ValueError("bad request")
+        return split_replies(messages)
+
+    fake_openai.reply = replies
+    response = client.post("/api/conversation/send", json={"message": "I goed to Paris", "split_correction": True})
+    assert response.status_code == 200
+    assert response.json()["conversation"] == "I went to Paris. Did you travel too?"
+    assert response.json()["correction"] is None
@@ -0,0 +1,127 @@
+"""Tests for Idempotency-Key results and recorded event streams"""
+import asyncio
+
+import pytest
+
+from services.idempotency import (
+    EventRecording, IdempotencyConflict, IdempotencyStore, request_fingerprint, scoped_key
+)
+
+
+def counter():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"reply": len(calls)}
+
+    return fn, calls
+
+
+def test_fingerprint_separates_parts():
+    assert request_fingerprint("ab", "c") != request_fingerprint("a", "bc")
+    assert request_fingerprint(b"audio", None) == request_fingerprint("audio", "")
+
+
+def test_keys_are_scoped_per_endpoint_and_caller():
+    alice = {"headers": [], "client": ("1.1.1.1", 1)}
+    bob = {"headers": [], "client": ("2.2.2.2", 1)}
+    assert scoped_key(alice, "send", "k") != scoped_key(bob, "send", "k")
+    assert scoped_key(alice, "send", "k") != scoped_key(alice, "synthesize", "k")
+
+
+def test_completed_result_is_replayed():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60, max_entries=10)
+        fn, calls = counter()
+        assert await store.run("k", "fp", fn) == ({"reply": 1}, False)
+        assert await store.run("k", "fp", fn) == ({"reply": 1}, True)
+        assert len(calls) == 1 and store.replayed == 1
+
+    asyncio.run(scenario())
+
+
+def test_retry_during_the_call_attaches_to_it():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60, max_entries=10)
+        fn, calls = counter()
+        first, retry = await asyncio.gather(store.run("k", "fp", fn), store.run("k", "fp", fn))
+        assert first == ({"reply": 1}, False) and retry == ({"reply": 1}, True)
+        assert len(calls) == 1 and store.attached == 1
+
+    asyncio.run(scenario())
+
+
+def test_reused_key_with_another_body_conflicts():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60, max_entries=10)
+        fn, _ = counter()
+        running = asyncio.create_task(store.run("k", "fp", fn))
+        await asyncio.sleep(0)
+        with pytest.raises(IdempotencyConflict):
+            await store.run("k", "other", fn)
+        await running
+        with pytest.raises(IdempotencyConflict):
+            await store.run("k", "other", fn)
+        assert store.conflicts == 2
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_not_stored():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60, max_entries=10)
+
+        async def fail():
+            raise RuntimeError("provider down")
+
+        with pytest.raises(RuntimeError):
+            await store.run("k", "fp", fail)
+        fn, calls = counter()
+        assert await store.run("k", "fp", fn) == ({"reply": 1}, False)
+
+    asyncio.run(scenario())
+
+
+def test_results_are_bounded_and_expire():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=60, max_entries=2)
+        for key in "abc":
+            store.put(key, "fp", key)
+        assert store.stats()["stored"] == 2
+        fn, calls = counter()
+        assert (await store.run("a", "fp", fn))[1] is False  # oldest entry was dropped
+        assert (await store.run("c", "fp", fn)) == ("c", True)
+
+        expiring = IdempotencyStore(ttl_seconds=0, max_entries=2)
+        expiring.put("k", "fp", "stale")
+        assert (await expiring.run("k", "fp", fn))[1] is False
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_event_recording_replays_then_follows_live():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def source():
+            yield "transcript", {"text": "hi"}
+            await release.wait()
+            yield "done", {}
+
+        recording = EventRecording(source())
+        await asyncio.sleep(0)
+
+        async def collect():
+            return [event async for event, _ in recording.subscribe()]
+
+        early = asyncio.create_task(collect())
+        await asyncio.sleep(0)
+        release.set()
+        late = await collect()
+        assert await early == late == ["transcript", "done"]
+        assert recording.finished
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+"""Tests for the adaptive (AIMD) concurrency limiter"""
+import asyncio
+
+import pytest
+
+from services.limiter import AdaptiveLimiter, is_overload
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def test_overload_errors_are_recognized():
+    assert is_overload(RateLimitError())
+    assert is_overload(asyncio.TimeoutError())
+    assert not is_overload(ValueError("bad request"))
+
+
+def test_limit_grows_by_one_after_a_saturated_window():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=2, max_limit=3)
+
+        async def call():
+            async with limiter.slot():
+                await asyncio.sleep(0.001)
+
+        await asyncio.gather(call(), call())
+        assert limiter.limit == 3
+        await asyncio.gather(*(call() for _ in range(3)))
+        assert limiter.limit == 3  # capped at max_limit
+
+    asyncio.run(scenario())
+
+
+def test_limit_does_not_grow_while_idle():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=10)
+        for _ in range(30):
+            async with limiter.slot():
+                pass
+        assert limiter.limit == 10
+
+    asyncio.run(scenario())
+
+
+def test_overload_shrinks_the_limit_once_per_window():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=10, backoff_ratio=0.5)
+        for _ in range(3):
+            with pytest.raises(RateLimitError):
+                async with limiter.slot():
+                    raise RateLimitError()
+        assert limiter.limit == 5
+        assert limiter.decreases == 1
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_other_errors_leave_the_limit_alone():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=4)
+        with pytest.raises(ValueError):
+            async with limiter.slot():
+                raise ValueError()
+        assert limiter.limit == 4
+
+    asyncio.run(scenario())
+
+
+def test_latency_spike_counts_as_overload():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=8, min_samples=5, latency_tolerance=2.0)
+        for _ in range(10):
+            async with limiter.slot() as permit:
+                permit.observe(0.1)
+        async with limiter.slot() as permit:
+            permit.observe(1.0)
+        assert limiter.limit < 8
+
+    asyncio.run(scenario())
+
+
+def test_calls_beyond_the_limit_wait_in_order():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=1, max_limit=1)
+        order = []
+        gate = asyncio.Event()
+
+        async def call(name):
+            async with limiter.slot():
+                order.append(name)
+                await gate.wait()
+
+        tasks = [asyncio.create_task(call(n)) for n in "abc"]
+        await asyncio.sleep(0)
+        assert limiter.in_flight == 1 and limiter.queue_depth == 2
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=1, max_limit=1)
+        gate = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await gate.wait()
+
+        async def quick():
+            async with limiter.slot():
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(quick())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        gate.set()
+        await holder
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.in_flight == 0 and limiter.queue_depth == 0
+        await asyncio.wait_for(quick(), 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+"""Tests for hedged, deadline-bounded LLM attempts"""
+import asyncio
+from contextlib import AsyncExitStack
+from types import SimpleNamespace
+
+import pytest
+
+from llm_deadline import Deadline, DeadlineExceeded
+from services import llm
+
+
+@pytest.fixture
+def fast_settings(monkeypatch):
+    monkeypatch.setattr(llm.settings, "llm_response_deadline_seconds", 0.1)
+    monkeypatch.setattr(llm.settings, "llm_hedging_enabled", False)
+    monkeypatch.setattr(llm.settings, "llm_fallback_model", None)
+    return llm.settings
+
+
+def attempt_taking(seconds: float, failing_models=()):
+    async def attempt(model, record_latency):
+        if model in failing_models:
+            raise RuntimeError("provider error")
+        await asyncio.sleep(seconds)
+        return model
+    return attempt
+
+
+def race(attempt, seconds: float, kind: str):
+    return asyncio.run(llm._race(attempt, Deadline(seconds), kind))
+
+
+@pytest.mark.parametrize("kind", ["complete", "stream"])
+def test_without_fallback_the_primary_gets_the_whole_turn(fast_settings, kind):
+    assert race(attempt_taking(0.2), 1.0, kind) == (fast_settings.openai_model, "primary")
+
+
+def test_nothing_within_the_turn_raises(fast_settings):
+    with pytest.raises(DeadlineExceeded):
+        race(attempt_taking(0.5), 0.1, "complete")
+
+
+def test_slow_first_token_goes_to_the_fallback(fast_settings, monkeypatch):
+    monkeypatch.setattr(fast_settings, "llm_fallback_model", "fallback-model")
+    assert race(attempt_taking(0.2), 1.0, "stream") == ("fallback-model", "fallback")
+
+
+def test_slow_complete_reply_is_not_cut_short_by_the_fallback(fast_settings, monkeypatch):
+    monkeypatch.setattr(fast_settings, "llm_fallback_model", "fallback-model")
+    assert race(attempt_taking(0.2), 1.0, "complete") == (fast_settings.openai_model, "primary")
+
+
+def test_primary_error_falls_back(fast_settings, monkeypatch):
+    monkeypatch.setattr(fast_settings, "llm_fallback_model", "fallback-model")
+    attempt = attempt_taking(0.01, failing_models=(fast_settings.openai_model,))
+    assert race(attempt, 1.0, "complete") == ("fallback-model", "fallback")
+
+
+def test_hedge_wins_when_the_first_attempt_stalls(fast_settings, monkeypatch):
+    monkeypatch.setattr(fast_settings, "llm_hedging_enabled", True)
+    monkeypatch.setattr(llm, "hedge_delay", lambda kind="stream": 0.05)
+    delays = [1.0, 0.01]
+
+    async def attempt(model, record_latency):
+        await asyncio.sleep(delays.pop(0))
+        return model
+
+    assert race(attempt, 2.0, "complete") == (fast_settings.openai_model, "hedge")
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def test_stream_stalling_past_the_deadline_is_truncated():
+    async def stream():
+        yield chunk("Hello ")
+        yield chunk("there.")
+        await asyncio.sleep(10)
+        yield chunk(" Never sent.")
+
+    async def scenario():
+        llm_stream = llm.LLMStream(AsyncExitStack(), stream(), "Oh! ", "primary", Deadline(0.1))
+        texts = [text async for text in llm_stream]
+        await llm_stream.aclose()
+        return texts, llm_stream.truncated
+
+    assert asyncio.run(scenario()) == (["Oh! ", "Hello ", "there."], True)
+
+
+def test_stream_finishing_in_time_is_complete():
+    async def stream():
+        yield chunk("Hi.")
+
+    async def scenario():
+        llm_stream = llm.LLMStream(AsyncExitStack(), stream(), "", "primary", Deadline(1.0))
+        return [text async for text in llm_stream], llm_stream.truncated
+
+    assert asyncio.run(scenario()) == (["Hi."], False)
@@ -0,0 +1,93 @@
+"""Tests for the precomputed opener cache"""
+import asyncio
+import base64
+import os
+
+import pytest
+
+from routers import conversation
+from services.openers import OpenerCache, opener_key
+from services.sessions import session_store
+
+COMBINATION = {"language": "French", "level": "beginner", "persona": "friend", "topic": "travel"}
+
+
+def build_cache(directory) -> OpenerCache:
+    cache = OpenerCache(str(directory))
+    audio_file = cache.write_audio(b"opener audio")
+    cache.openers[opener_key(**COMBINATION)] = [
+        {"text": "Salut ! Tu pars en vacances ?", "audio": {"fr-FR-Neural2-A": audio_file}}
+    ]
+    cache.save()
+    return cache
+
+
+def test_pick_returns_a_stored_variant_with_its_audio(tmp_path):
+    build_cache(tmp_path)
+    cache = OpenerCache(str(tmp_path))
+    opener = asyncio.run(cache.pick(voice_name="fr-FR-Neural2-A", **COMBINATION))
+    assert opener == {"text": "Salut ! Tu pars en vacances ?", "audio": b"opener audio"}
+
+
+def test_pick_without_the_voice_returns_text_only(tmp_path):
+    cache = build_cache(tmp_path)
+    opener = asyncio.run(cache.pick(voice_name="fr-FR-Neural2-B", **COMBINATION))
+    assert opener == {"text": "Salut ! Tu pars en vacances ?", "audio": None}
+
+
+def test_unknown_combination_is_a_miss(tmp_path):
+    cache = build_cache(tmp_path)
+    assert asyncio.run(cache.pick("French", "advanced", "friend", "travel")) is None
+
+
+def test_rewritten_manifest_is_picked_up(tmp_path):
+    build_cache(tmp_path)
+    cache = OpenerCache(str(tmp_path))
+    writer = OpenerCache(str(tmp_path))
+    writer.openers[opener_key(**COMBINATION)] = [{"text": "Bonjour !", "audio": {}}]
+    writer.save()
+    # A different mtime marks the rewrite even within the filesystem's timestamp granularity
+    os.utime(os.path.join(str(tmp_path), "manifest.json"), ns=(cache._loaded_mtime + 1, cache._loaded_mtime + 1))
+    assert asyncio.run(cache.pick(**COMBINATION))["text"] == "Bonjour !"
+
+
+@pytest.fixture
+def start(client, monkeypatch, tmp_path):
+    """POST /start against an opener cache in tmp_path and in-memory sessions"""
+    monkeypatch.setattr(conversation, "opener_cache", build_cache(tmp_path))
+    monkeypatch.setattr(session_store, "backend", None)
+
+    def post(**request):
+        return client.post("/api/conversation/start", json={
+            "language": COMBINATION["language"], "level": COMBINATION["level"],
+            "persona": COMBINATION["persona"], "topic": COMBINATION["topic"], **request
+        })
+
+    return post
+
+
+def test_start_serves_a_cached_opener_without_provider_calls(start, fake_openai, fake_tts):
+    response = start(voice_name="fr-FR-Neural2-A")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["cached"] is True
+    assert body["conversation"] == "Salut ! Tu pars en vacances ?"
+    assert base64.b64decode(body["audio"]) == b"opener audio"
+    assert fake_openai.prompts == [] and fake_tts == []
+    session = asyncio.run(session_store.get(body["session_id"]))
+    assert session.history() == [{"role": "assistant", "content": "Salut ! Tu pars en vacances ?"}]
+
+
+def test_start_synthesizes_a_cached_opener_for_another_voice(start, fake_openai, fake_tts):
+    body = start(voice_name="fr-FR-Neural2-B").json()
+    assert body["cached"] is True
+    assert base64.b64decode(body["audio"]) == b"mp3:Salut ! Tu pars en vacances ?"
+    assert fake_openai.prompts == []
+
+
+def test_start_generates_an_opener_on_a_miss(start, fake_openai, fake_tts):
+    fake_openai.reply = lambda messages: '{"openers": ["Bonjour ! Tu travailles ?"]}'
+    body = start(topic="work", voice_name="fr-FR-Neural2-A").json()
+    assert body["cached"] is False
+    assert body["conversation"] == "Bonjour ! Tu travailles ?"
+    assert fake_tts == ["Bonjour ! Tu travailles ?"]
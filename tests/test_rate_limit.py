@@ -0,0 +1,116 @@
+"""Tests for the token buckets, the admission queue and rate-limit identities"""
+import asyncio
+
+import pytest
+from jose import jwt
+
+from config import get_settings
+from services import rate_limit
+from services.rate_limit import AdmissionQueue, MemoryTokenBucketStore, QueueFull, client_identity
+
+settings = get_settings()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def take(store, key="user", rate=1.0, capacity=3.0, cost=1.0):
+    return asyncio.run(store.take(key, rate, capacity, cost))
+
+
+def test_bucket_allows_a_burst_then_reports_the_wait(clock):
+    store = MemoryTokenBucketStore()
+    assert [take(store)[0] for _ in range(3)] == [True, True, True]
+    allowed, wait = take(store)
+    assert not allowed
+    assert wait == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_rate_up_to_capacity(clock):
+    store = MemoryTokenBucketStore()
+    for _ in range(3):
+        take(store)
+    clock[0] += 1.5
+    assert take(store)[0]
+    assert not take(store)[0]
+    clock[0] += 100
+    assert [take(store)[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_costly_requests_take_several_tokens(clock):
+    store = MemoryTokenBucketStore()
+    assert take(store, cost=2.0) == (True, 0.0)
+    allowed, wait = take(store, cost=2.0)
+    assert not allowed and wait == pytest.approx(1.0)
+    # A refused request takes nothing
+    assert take(store, cost=1.0)[0]
+
+
+def test_buckets_are_per_key_and_full_ones_are_forgotten(clock):
+    store = MemoryTokenBucketStore(max_keys=2)
+    take(store, key="a", cost=3.0)
+    assert take(store, key="b")[0]
+    clock[0] += 10
+    take(store, key="c")
+    # Refilled buckets are indistinguishable from new ones, so they are dropped
+    assert set(store._buckets) == {"c"}
+
+
+def test_least_recently_used_bucket_goes_when_none_has_refilled(clock):
+    store = MemoryTokenBucketStore(max_keys=2)
+    take(store, key="a")
+    take(store, key="b")
+    clock[0] += 0.5
+    take(store, key="a")
+    take(store, key="c")
+    assert list(store._buckets) == ["a", "c"]
+
+
+def test_admission_queue_rejects_beyond_waiting_room():
+    async def scenario():
+        queue = AdmissionQueue(max_concurrent=1, max_waiting=1, wait_timeout=5)
+        await queue.acquire()
+        waiter = asyncio.create_task(queue.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await queue.acquire()
+        queue.release()
+        await waiter
+        assert queue.stats()["running"] == 1 and queue.rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_admission_queue_wait_times_out():
+    async def scenario():
+        queue = AdmissionQueue(max_concurrent=1, max_waiting=5, wait_timeout=0.01)
+        await queue.acquire()
+        with pytest.raises(QueueFull):
+            await queue.acquire()
+        assert queue.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_client_identity_prefers_a_valid_token_subject():
+    token = jwt.encode({"sub": "alice"}, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    scope = {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("1.2.3.4", 5)}
+    assert client_identity(scope) == "user:alice"
+    scope["headers"] = [(b"authorization", b"Bearer forged")]
+    assert client_identity(scope) == "ip:1.2.3.4"
+
+
+def test_charge_takes_from_the_callers_bucket(clock, monkeypatch):
+    middleware = rate_limit.RateLimitMiddleware(app=None, store=MemoryTokenBucketStore())
+    monkeypatch.setattr(rate_limit, "_middleware", middleware)
+    scope = {"headers": [], "client": ("1.2.3.4", 5)}
+    burst = settings.rate_limit_user_burst
+    assert asyncio.run(rate_limit.charge(scope, burst)) == (True, 0.0)
+    allowed, wait = asyncio.run(rate_limit.charge(scope, 1.0))
+    assert not allowed and wait > 0
+    assert middleware.limited["user"] == 1
+    assert asyncio.run(rate_limit.charge(scope, 0)) == (True, 0.0)
@@ -0,0 +1,228 @@
+"""Tests for the provider circuit breakers and retry policy"""
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, RetryPolicy, acall, call, is_transient
+)
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class Clock(list):
+    """[now] plus the sleeps taken"""
+    sleeps: list
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen monotonic clock advanced by hand; sleeps are recorded instead of taken"""
+    now = Clock([1000.0])
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(resilience.time, "sleep", sleep)
+    now.sleeps = sleeps
+    return now
+
+
+@pytest.fixture
+def flaky():
+    """Callable failing with the queued errors in order, then returning "ok" """
+    def make(*errors):
+        remaining = list(errors)
+
+        def fn():
+            fn.calls += 1
+            if remaining:
+                raise remaining.pop(0)
+            return "ok"
+
+        fn.calls = 0
+        return fn
+
+    return make
+
+
+def test_transient_errors_are_recognized():
+    assert is_transient(TimeoutError())
+    assert is_transient(ConnectionError())
+    assert is_transient(APITimeoutError())
+    assert is_transient(StatusError(429))
+    assert is_transient(StatusError(503))
+    assert not is_transient(StatusError(400))
+    assert not is_transient(StatusError(401))
+    assert not is_transient(ValueError("bad input"))
+    assert not is_transient(CircuitOpen("openai", 5))
+
+
+def test_breaker_opens_after_consecutive_transient_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_seconds=10)
+    for _ in range(2):
+        breaker.record_failure(TimeoutError())
+    assert breaker.state == CLOSED
+    breaker.record_failure(TimeoutError())
+    assert breaker.state == OPEN
+    assert breaker.is_open
+    assert breaker.retry_after() == 10
+
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == 10
+    assert breaker.rejected == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure(TimeoutError())
+    breaker.record_success()
+    breaker.record_failure(TimeoutError())
+    assert breaker.state == CLOSED
+
+
+def test_permanent_errors_do_not_trip_the_breaker(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    breaker.record_failure(StatusError(400))
+    breaker.record_failure(ValueError("bad input"))
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_half_open_probe_success_closes_the_circuit(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_seconds=10)
+    breaker.record_failure(TimeoutError())
+    clock[0] += 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.retry_after() == 0
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_half_open_probe_failure_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_seconds=10)
+    for _ in range(3):
+        breaker.record_failure(TimeoutError())
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record_failure(TimeoutError())  # a single failed probe is enough
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+    assert breaker.retry_after() == 10
+
+
+def test_release_frees_the_probe_of_a_cancelled_call(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_seconds=10)
+    breaker.record_failure(TimeoutError())
+    clock[0] += 10
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # the probe slot is available again
+
+
+def test_backoff_is_jittered_and_bounded():
+    policy = RetryPolicy(max_attempts=5, base_delay=0.2, max_delay=1.0)
+    for attempt, ceiling in [(1, 0.2), (2, 0.4), (3, 0.8), (4, 1.0), (10, 1.0)]:
+        delays = [policy.delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert len(set(delays)) > 1
+
+
+def test_retry_policy_has_at_least_one_attempt():
+    assert RetryPolicy(max_attempts=0).max_attempts == 1
+
+
+def test_call_retries_transient_failures(clock, flaky):
+    breaker = CircuitBreaker("test", failure_threshold=5)
+    fn = flaky(TimeoutError(), StatusError(503))
+    assert call(breaker, fn, RetryPolicy(max_attempts=3, base_delay=0.1)) == "ok"
+    assert fn.calls == 3
+    assert len(clock.sleeps) == 2
+    assert breaker.state == CLOSED
+
+
+def test_call_does_not_retry_permanent_failures(clock, flaky):
+    breaker = CircuitBreaker("test")
+    fn = flaky(StatusError(400))
+    with pytest.raises(StatusError):
+        call(breaker, fn, RetryPolicy(max_attempts=3))
+    assert fn.calls == 1
+    assert clock.sleeps == []
+
+
+def test_call_gives_up_after_max_attempts(clock, flaky):
+    breaker = CircuitBreaker("test", failure_threshold=10)
+    fn = flaky(*[TimeoutError()] * 5)
+    with pytest.raises(TimeoutError):
+        call(breaker, fn, RetryPolicy(max_attempts=3))
+    assert fn.calls == 3
+
+
+def test_call_stops_retrying_when_the_budget_would_run_out(clock, flaky):
+    breaker = CircuitBreaker("test", failure_threshold=10)
+    fn = flaky(*[TimeoutError()] * 5)
+    policy = RetryPolicy(max_attempts=5, base_delay=10, max_delay=10)
+    with pytest.raises(TimeoutError):
+        call(breaker, fn, policy, budget_seconds=0.001)
+    assert fn.calls == 1
+
+
+def test_call_fails_fast_while_the_circuit_is_open(clock, flaky):
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    breaker.record_failure(TimeoutError())
+    fn = flaky()
+    with pytest.raises(CircuitOpen):
+        call(breaker, fn)
+    assert fn.calls == 0
+
+
+def test_acall_retries_transient_failures(flaky):
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=5)
+        fn = flaky(APITimeoutError())
+
+        async def attempt():
+            return fn()
+
+        assert await acall(breaker, attempt, RetryPolicy(max_attempts=2, base_delay=0)) == "ok"
+        assert fn.calls == 2
+        assert breaker.failures == 1
+        assert breaker.state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_acall_releases_its_probe():
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_seconds=0)
+        breaker.record_failure(TimeoutError())
+        assert breaker.state == HALF_OPEN
+
+        task = asyncio.create_task(acall(breaker, lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert breaker.failures == 1  # the cancellation was not counted
+        breaker.before_call()  # and the probe slot is free again
+
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+"""Tests for the batch and streaming tutor reply parsers and the sentence splitter"""
+import pytest
+
+from response_parser import SentenceSplitter, TutorResponseParser, parse_correction, parse_tutor_response
+
+REPLIES = [
+    "<conversation>Hi there! How was your day?</conversation><correction>I go -> I went</correction>",
+    "<conversation>\n  Bonjour ! Ça va ?\n</conversation>\n<correction>\n-\n</correction>",
+    "Just plain text without any tags.",
+    "Preamble <conversation>Tagged reply.</conversation>",
+    "<correction>Fix this</correction><conversation>Correction came first.</conversation>",
+    "<conversation>Uses a < sign and <b>other</b> tags.</conversation>",
+]
+
+
+def stream(reply: str, size: int) -> TutorResponseParser:
+    parser = TutorResponseParser()
+    for start in range(0, len(reply), size):
+        parser.feed(reply[start:start + size])
+    parser.close()
+    return parser
+
+
+@pytest.mark.parametrize("reply", REPLIES)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_streamed_result_matches_batch_parse(reply, size):
+    assert stream(reply, size).result() == parse_tutor_response(reply)
+
+
+def test_unterminated_section_keeps_its_text_when_streamed():
+    # The batch parser falls back to the raw reply; the stream knows where the tag opened
+    assert stream("<conversation>Cut off mid reply", 4).result() == {"conversation": "Cut off mid reply", "correction": None}
+
+
+def test_conversation_deltas_add_up_and_correction_is_sent_once():
+    parser = TutorResponseParser()
+    events = []
+    for char in REPLIES[0]:
+        events += parser.feed(char)
+    events += parser.close()
+    assert "".join(text for kind, text in events if kind == "conversation") == "Hi there! How was your day?"
+    assert [text for kind, text in events if kind == "correction"] == ["I go -> I went"]
+
+
+def test_text_is_held_back_only_while_it_could_be_a_tag():
+    parser = TutorResponseParser()
+    assert parser.feed("<conversation>Hello </conv") == [("conversation", "Hello ")]
+    assert parser.feed("ersation>") == []
+    assert parser.conversation == "Hello"
+
+
+def test_placeholder_corrections_are_dropped():
+    assert parse_tutor_response("<conversation>Hi</conversation><correction>N/A</correction>")["correction"] is None
+    assert parse_correction("<correction>none</correction>") is None
+    assert parse_correction("<correction>Say 'I went'") == "Say 'I went'"
+
+
+def test_sentence_splitter_skips_abbreviations_and_merges_short_sentences():
+    splitter = SentenceSplitter()
+    sentences = []
+    for word in "Hi. I met Dr. Smith today! Did you? Yes.".split(" "):
+        sentences += splitter.feed(word + " ")
+    sentences += splitter.close()
+    assert sentences == ["Hi. I met Dr. Smith today!", "Did you?", "Yes."]
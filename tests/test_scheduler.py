@@ -0,0 +1,98 @@
+"""Tests for priority classes in the provider limiter"""
+import asyncio
+
+import pytest
+
+from services import scheduler
+from services.limiter import AdaptiveLimiter
+from services.scheduler import BACKGROUND, INTERACTIVE, REPLAY, InteractiveBudget, current_priority, priority
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    budget = InteractiveBudget(wait_budget=0.2, turn_budget=5.0, cooldown=0.05)
+    monkeypatch.setattr(scheduler, "interactive_budget", budget)
+    monkeypatch.setattr("services.limiter.interactive_budget", budget)
+    return budget
+
+
+def test_priority_is_inherited_by_tasks_started_in_the_block():
+    async def scenario():
+        assert current_priority() == INTERACTIVE
+        with priority(REPLAY):
+            inner = asyncio.create_task(asyncio.sleep(0, result=current_priority()))
+        assert current_priority() == INTERACTIVE
+        assert await inner == REPLAY
+
+    asyncio.run(scenario())
+
+
+def test_run_in_background_marks_the_task_background():
+    async def scenario():
+        async def job():
+            return current_priority()
+        assert await scheduler.run_in_background(job()) == BACKGROUND
+
+    asyncio.run(scenario())
+
+
+def test_waiters_are_served_by_priority_then_arrival(budget):
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=1, max_limit=1, background_share=1.0)
+        order = []
+        gate = asyncio.Event()
+
+        async def call(name, level):
+            async with limiter.slot(level):
+                order.append(name)
+                await gate.wait()
+
+        tasks = [asyncio.create_task(call("first", INTERACTIVE))]
+        await asyncio.sleep(0)
+        for name, level in [("bg", BACKGROUND), ("replay", REPLAY), ("live1", INTERACTIVE), ("live2", INTERACTIVE)]:
+            tasks.append(asyncio.create_task(call(name, level)))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert order == ["first", "live1", "live2", "replay", "bg"]
+
+    asyncio.run(scenario())
+
+
+def test_background_share_of_the_limit(budget):
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=4, max_limit=4, background_share=0.5)
+        gate = asyncio.Event()
+
+        async def call(level):
+            async with limiter.slot(level):
+                await gate.wait()
+
+        tasks = [asyncio.create_task(call(BACKGROUND)) for _ in range(4)]
+        await asyncio.sleep(0)
+        assert limiter.stats()["by_priority"]["background"] == {"in_flight": 2, "queued": 2}
+        tasks.append(asyncio.create_task(call(INTERACTIVE)))
+        await asyncio.sleep(0)
+        assert limiter.stats()["by_priority"]["interactive"]["in_flight"] == 1
+        gate.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_background_work_waits_out_interactive_pressure(budget):
+    async def scenario():
+        limiter = AdaptiveLimiter("test", initial_limit=4, max_limit=4)
+        budget.observe_turn(10.0)
+        assert budget.over_budget
+        started = asyncio.get_running_loop().time()
+        async with limiter.slot(BACKGROUND):
+            waited = asyncio.get_running_loop().time() - started
+        assert waited >= 0.04
+        assert limiter.deferred == 1
+        # Interactive calls are not held back
+        budget.observe_turn(10.0)
+        async with limiter.slot(INTERACTIVE):
+            pass
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+"""Tests for server-held sessions and history folding"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from services import tutor
+from services.sessions import ConversationSession, SessionBackend, SessionStore
+
+
+class MemoryBackend(SessionBackend):
+    def __init__(self):
+        self.rows = {}
+        self.deleted = []
+
+    async def load(self, session_id):
+        return self.rows.get(session_id)
+
+    async def save(self, session):
+        self.rows[session.session_id] = {**session.to_dict(), "updated_at": datetime.utcnow().isoformat()}
+
+    async def delete(self, session_id):
+        self.deleted.append(session_id)
+        self.rows.pop(session_id, None)
+
+
+def message(i):
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+
+
+def test_sessions_come_back_from_the_backend():
+    async def scenario():
+        backend = MemoryBackend()
+        session = await SessionStore(backend=backend).create({"language": "French"})
+        restarted = SessionStore(backend=backend)
+        loaded = await restarted.get(session.session_id)
+        assert loaded.tutor_settings == {"language": "French"}
+
+    asyncio.run(scenario())
+
+
+def test_expired_backend_sessions_are_deleted_not_revived():
+    async def scenario():
+        backend = MemoryBackend()
+        stale = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+        backend.rows["old"] = {"settings": {}, "messages": [], "updated_at": stale + "+00:00"}
+        store = SessionStore(ttl_seconds=3600, backend=backend)
+        assert await store.get("old") is None
+        assert backend.deleted == ["old"]
+
+    asyncio.run(scenario())
+
+
+def test_messages_beyond_the_limit_wait_for_the_fold():
+    async def scenario():
+        store = SessionStore(max_messages=3)
+        session = await store.create({})
+        await store.append(session, *(message(i) for i in range(5)))
+        assert len(session.history()) == 5
+        # Only a fold that keeps failing lets the buffer hit its hard cap
+        await store.append(session, *(message(i) for i in range(5, 10)))
+        assert [m["content"] for m in session.history()][0] == "message 4"
+
+    asyncio.run(scenario())
+
+
+def fake_summary_call(monkeypatch, on_call=None):
+    """Replace the summary LLM client; returns the folded messages of each call"""
+    prompts = []
+
+    async def create(messages, **kwargs):
+        if on_call:
+            on_call()
+        prompts.append(messages)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"summary {len(prompts)}"))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(tutor, "get_openai_client", lambda: client)
+    monkeypatch.setattr(tutor, "summary_messages", lambda summary, folded: [m["content"] for m in folded])
+    monkeypatch.setattr(tutor.session_store, "backend", None)
+    return prompts
+
+
+def test_many_short_turns_reach_the_summary(monkeypatch):
+    async def scenario():
+        prompts = fake_summary_call(monkeypatch)
+        store = SessionStore(max_messages=40)
+        session = await store.create({})
+        for turn in range(30):
+            await store.append(session, message(2 * turn), message(2 * turn + 1))
+            await tutor.fold_session_history(session)
+        folded = [content for prompt in prompts for content in prompt]
+        assert folded == [f"message {i}" for i in range(20)]
+        assert len(session.history()) == 40
+        assert session.history()[0]["content"] == "message 20"
+
+    asyncio.run(scenario())
+
+
+def test_fold_keeps_turns_appended_during_the_summary_call(monkeypatch):
+    async def scenario():
+        session = ConversationSession("s", {}, max_messages=3, messages=[message(i) for i in range(6)])
+        monkeypatch.setattr(tutor.context_window, "overflow", lambda history: history[:4])
+
+        def new_turn():
+            # A new turn arrives while the summary is being written; the buffer's hard
+            # cap pushes out two of the messages being folded
+            session.messages.extend([message(6), message(7)])
+
+        fake_summary_call(monkeypatch, on_call=new_turn)
+        await tutor.fold_session_history(session)
+        assert session.summary == "summary 1"
+        assert [m["content"] for m in session.history()] == ["message 4", "message 5", "message 6", "message 7"]
+
+    asyncio.run(scenario())
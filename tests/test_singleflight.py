@@ -0,0 +1,71 @@
+"""Tests for single-flight call coalescing"""
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        group = SingleFlight("test-share")
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "audio"
+
+        results = await asyncio.gather(*(group.do("key", fetch) for _ in range(5)))
+        assert results == ["audio"] * 5 and len(calls) == 1
+        stats = group.stats()
+        assert stats["coalesced"] == 4 and stats["max_fan_in"] == 5 and stats["in_flight"] == 0
+        # Nothing is kept once the call is done
+        await group.do("key", fetch)
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        group = SingleFlight("test-keys")
+        results = await asyncio.gather(group.do("a", lambda: asyncio.sleep(0, "a")),
+                                       group.do("b", lambda: asyncio.sleep(0, "b")))
+        assert results == ["a", "b"] and group.stats()["upstream_calls"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        group = SingleFlight("test-errors")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(group.do("key", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def scenario():
+        group = SingleFlight("test-cancel")
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.create_task(group.do("key", fetch))
+        second = asyncio.create_task(group.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "done"
+        assert group.stats()["upstream_calls"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,46 @@
+"""Tests for the two-tier TTS audio cache"""
+from tts_cache import TTSCache, make_cache_key
+
+
+def test_cache_key_ignores_whitespace_differences():
+    assert make_cache_key("Hello  world ", "v", "en-US") == make_cache_key("Hello world", "v", "en-US")
+    assert make_cache_key("Hello", "v", "en-US") != make_cache_key("Hello", "w", "en-US")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = TTSCache(memory_max_bytes=10, disk_dir=None)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.get("a")
+    cache.put("c", b"12345")
+    assert cache.get("a") == b"12345"
+    assert cache.get("b") is None
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    TTSCache(disk_dir=str(tmp_path)).put("key", b"audio")
+    cache = TTSCache(memory_max_bytes=0, disk_dir=str(tmp_path))
+    assert cache.get("key") == b"audio"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_files_written_by_another_instance_are_served(tmp_path):
+    reader = TTSCache(disk_dir=str(tmp_path))
+    writer = TTSCache(disk_dir=str(tmp_path))
+    assert not reader.contains("key")
+    writer.put("key", b"audio")
+    assert reader.contains("key")
+    assert reader.get("key") == b"audio"
+
+
+def test_get_or_synthesize_calls_synthesize_once(tmp_path):
+    cache = TTSCache(disk_dir=str(tmp_path))
+    calls = []
+
+    def synthesize():
+        calls.append(1)
+        return b"audio"
+
+    assert cache.get_or_synthesize("Hi", "v", "en-US", synthesize) == b"audio"
+    assert cache.get_or_synthesize("Hi ", "v", "en-US", synthesize) == b"audio"
+    assert len(calls) == 1
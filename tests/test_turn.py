@@ -0,0 +1,89 @@
+"""Tests for the single-round-trip turn endpoint, against fake providers"""
+import io
+import json
+import wave
+
+import pytest
+
+from services import google_audio
+
+REPLY = "<conversation>\nGreat trip! What did you see?\n</conversation>\n<correction>\nYou said: 'I goed' → Better: 'I went'\n</correction>"
+
+
+def sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def recording() -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(16000)
+        out.writeframes(bytes(16000))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def fake_stt(monkeypatch):
+    """transcribe() hearing the queued transcript; the audio it got is kept in calls"""
+    fake = type("FakeSTT", (), {"transcript": "I goed to Paris", "calls": []})()
+
+    async def transcribe(audio_content, language_code="en-US", budget_seconds=None, audio_report=None):
+        fake.calls.append((bytes(audio_content), language_code))
+        return fake.transcript, 0.9
+
+    monkeypatch.setattr(google_audio, "transcribe", transcribe)
+    return fake
+
+
+def run_turn(client, headers=None, **form):
+    return client.post("/api/turn", data=form, headers=headers or {},
+                       files={"file": ("turn.wav", recording(), "audio/wav")})
+
+
+def test_turn_streams_transcript_reply_audio_and_done(client, fake_stt, fake_openai, fake_tts):
+    fake_openai.reply = lambda messages: REPLY
+    response = run_turn(client, language="English")
+    assert response.status_code == 200
+    events = sse_events(response.text)
+    kinds = [event for event, _ in events]
+
+    assert events[0] == ("transcript", {"text": "I goed to Paris", "confidence": 0.9, "audio": {}})
+    assert "conversation" in kinds and "correction" in kinds
+    assert [data["index"] for event, data in events if event == "audio"] == [0, 1]
+    assert fake_tts == ["Great trip!", "What did you see?"]
+    event, done = events[-1]
+    assert event == "done"
+    assert done["transcript"] == "I goed to Paris"
+    assert done["conversation"] == "Great trip! What did you see?"
+    assert done["correction"] == "You said: 'I goed' → Better: 'I went'"
+    assert {"stt_ms", "llm_first_text_ms", "tts_first_audio_ms", "total_ms"} <= set(done["timings"])
+    assert fake_openai.prompts[0][-1] == {"role": "user", "content": "I goed to Paris"}
+
+
+def test_invalid_history_is_rejected_before_stt(client, fake_stt, fake_openai):
+    response = run_turn(client, history='[{"role": "user"}]')
+    assert response.status_code == 400
+    assert fake_stt.calls == []
+
+
+def test_no_speech_ends_the_turn_without_the_llm(client, fake_stt, fake_openai):
+    fake_stt.transcript = ""
+    events = sse_events(run_turn(client).text)
+    assert [event for event, _ in events] == ["transcript", "done"]
+    assert events[-1][1]["no_speech"] is True
+    assert fake_openai.prompts == []
+
+
+def test_retry_with_the_same_key_replays_the_turn(client, fake_stt, fake_openai, fake_tts):
+    headers = {"Idempotency-Key": "turn-retry-test"}
+    first = run_turn(client, headers=headers, topic="Travel")
+    second = run_turn(client, headers=headers, topic="Travel")
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert sse_events(second.text) == sse_events(first.text)
+    assert len(fake_stt.calls) == 1 and len(fake_openai.prompts) == 1
@@ -0,0 +1,46 @@
+"""Tests for the cache-friendly tutor system prompt"""
+import itertools
+
+import pytest
+
+from tutor_prompt import (
+    LANGUAGES, LEVELS, PERSONAS, PROMPT_MODES, TOPICS, build_system_prompt, common_prefix_length,
+    provider_cacheable_tokens, session_settings_block
+)
+
+
+@pytest.mark.parametrize("mode", sorted(PROMPT_MODES))
+def test_every_session_shares_the_static_prefix(mode):
+    prompts = [build_system_prompt(language, persona, topic, level, mode=mode)
+               for language, level, persona, topic in itertools.product(LANGUAGES, LEVELS, PERSONAS, TOPICS)]
+    assert all(prompt.startswith(PROMPT_MODES[mode]) for prompt in prompts)
+    assert common_prefix_length(prompts) >= len(PROMPT_MODES[mode])
+
+
+def test_session_settings_come_last():
+    prompt = build_system_prompt("French", "Casual", "Food", "Beginner (A1-A2)")
+    block = session_settings_block("French", "Casual", "Food", "Beginner (A1-A2)")
+    assert prompt.endswith(block)
+    assert "Language: French" in block and "Topic: Food" in block and "Persona: Casual" in block
+
+
+def test_common_prefix_length():
+    assert common_prefix_length(["abcx", "abcy", "abz"]) == 2
+    assert common_prefix_length(["same", "same"]) == 4
+
+
+def test_provider_caches_whole_increments_past_the_minimum():
+    assert provider_cacheable_tokens(1000) == 0
+    assert provider_cacheable_tokens(1024) == 1024
+    assert provider_cacheable_tokens(1200) == 1152
+
+
+def test_backend_turns_use_the_shared_prompt():
+    from services.tutor import build_messages
+
+    messages = build_messages("Bonjour", [], language="French", level="Advanced (C1-C2)",
+                              persona="Professional", topic="Work")
+    assert messages[0] == {
+        "role": "system",
+        "content": build_system_prompt("French", "Professional", "Work", "Advanced (C1-C2)")
+    }
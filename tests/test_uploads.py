@@ -0,0 +1,57 @@
+"""Tests for the multipart upload size limit"""
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from services import uploads
+from services.uploads import UploadLimitMiddleware
+
+
+async def echo_size(request: Request):
+    form = await request.form()
+    return JSONResponse({"size": len(await form["file"].read())})
+
+
+async def body_size(request: Request):
+    return JSONResponse({"size": len(await request.body())})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(uploads.settings, "max_upload_mb", 1)
+    monkeypatch.setattr(uploads, "FORM_OVERHEAD_BYTES", 1024)
+    app = Starlette(routes=[
+        Route("/upload", echo_size, methods=["POST"]),
+        Route("/raw", body_size, methods=["POST"])
+    ])
+    app.add_middleware(UploadLimitMiddleware)
+    return TestClient(app)
+
+
+def test_uploads_within_the_limit_pass(client):
+    response = client.post("/upload", files={"file": ("a.wav", b"\0" * 1000)})
+    assert response.status_code == 200 and response.json() == {"size": 1000}
+
+
+def test_oversized_content_length_is_refused_up_front(client):
+    response = client.post("/upload", files={"file": ("a.wav", b"\0" * (2 * 1024 * 1024))})
+    assert response.status_code == 413
+
+
+def test_chunked_bodies_are_cut_off_at_the_limit(client):
+    def body():
+        yield b'--x\r\nContent-Disposition: form-data; name="file"; filename="a"\r\n\r\n'
+        for _ in range(16):
+            yield b"\0" * (256 * 1024)
+        yield b"\r\n--x--\r\n"
+
+    response = client.post("/upload", content=body(), headers={"content-type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
+
+
+def test_other_requests_are_not_limited(client):
+    response = client.post("/raw", content=b"\0" * (2 * 1024 * 1024), headers={"content-type": "application/octet-stream"})
+    assert response.json() == {"size": 2 * 1024 * 1024}
@@ -0,0 +1,231 @@
+"""
+Text-to-speech audio cache for the AI Language Tutor app.
+This module caches synthesized audio by content (normalized text, voice,
+language and encoding) in a size-bounded memory tier backed by an on-disk tier.
+It is shared by the Streamlit app and the FastAPI backend.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ai_tutor_tts_cache")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry"""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+def make_cache_key(text: str, voice_name: str, language_code: str, audio_encoding: str = "MP3") -> str:
+    """Content address for a synthesis request"""
+    payload = json.dumps(
+        [normalize_text(text), voice_name, language_code, str(audio_encoding)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Two-tier LRU cache for synthesized audio.
+    The memory tier and the disk tier are each bounded by total bytes.
+    Set disk_dir to None to keep the cache in memory only. Several processes may
+    share disk_dir: files another process writes are picked up on lookup.
+    Lookups and stores do blocking file IO; call them from a worker thread in async code.
+    """
+
+    def __init__(
+        self,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        disk_max_bytes: int = 1024 * 1024 * 1024
+    ):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    @classmethod
+    def from_env(cls) -> "TTSCache":
+        """Build a cache from TTS_CACHE_DIR / TTS_CACHE_MEMORY_MB / TTS_CACHE_DISK_MB"""
+        disk_dir = os.getenv("TTS_CACHE_DIR", DEFAULT_CACHE_DIR) or None
+        return cls(
+            memory_max_bytes=int(os.getenv("TTS_CACHE_MEMORY_MB", "64")) * 1024 * 1024,
+            disk_dir=disk_dir,
+            disk_max_bytes=int(os.getenv("TTS_CACHE_DISK_MB", "1024")) * 1024 * 1024
+        )
+
+    # ==================== Public API ====================
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Look up audio by cache key, promoting disk hits into memory"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+
+            audio = self._read_disk(key)
+            if audio is not None:
+                self.disk_hits += 1
+                self._put_memory(key, audio)
+                return audio
+
+            self.misses += 1
+            return None
+
+    def contains(self, key: str) -> bool:
+        """Whether audio is cached under a key, without reading it or counting a lookup"""
+        with self._lock:
+            if key in self._memory or key in self._disk_index:
+                return True
+            return bool(self.disk_dir) and os.path.exists(self._path(key))
+
+    def put(self, key: str, audio: bytes):
+        """Store audio under a cache key in both tiers"""
+        if not audio:
+            return
+        with self._lock:
+            self._put_memory(key, audio)
+            self._write_disk(key, audio)
+
+    def get_or_synthesize(
+        self,
+        text: str,
+        voice_name: str,
+        language_code: str,
+        synthesize: Callable[[], Optional[bytes]],
+        audio_encoding: str = "MP3"
+    ) -> Optional[bytes]:
+        """Return cached audio, calling synthesize() and caching its result on a miss"""
+        key = make_cache_key(text, voice_name, language_code, audio_encoding)
+        audio = self.get(key)
+        if audio is None:
+            audio = synthesize()
+            if audio:
+                self.put(key, audio)
+        return audio
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_items": len(self._disk_index),
+                "disk_bytes": self._disk_bytes
+            }
+
+    # ==================== Memory Tier ====================
+
+    def _put_memory(self, key: str, audio: bytes):
+        if len(audio) > self.memory_max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # ==================== Disk Tier ====================
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key + ".bin")
+
+    def _load_disk_index(self):
+        """Rebuild the LRU index from files on disk, oldest first"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".bin"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        if key not in self._disk_index:
+            # Written by another process (the app, another worker) after the index was built
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return None
+            self._disk_index[key] = size
+            self._disk_bytes += size
+            self._evict_disk()
+            if key not in self._disk_index:
+                return None
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)
+        except OSError:
+            self._disk_bytes -= self._disk_index.pop(key)
+            return None
+        self._disk_index.move_to_end(key)
+        return audio
+
+    def _write_disk(self, key: str, audio: bytes):
+        if not self.disk_dir or key in self._disk_index or len(audio) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so readers never see partial audio
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"TTS cache write error: {e}")
+            return
+        self._disk_index[key] = len(audio)
+        self._disk_bytes += len(audio)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_max_bytes and self._disk_index:
+            key, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
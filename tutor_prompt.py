@@ -0,0 +1,211 @@
+"""
+Tutor system prompt for the AI Language Tutor app.
+The fixed instructions come first as a byte-identical prefix shared by every
+session, and the per-session settings (language, persona, topic, level) are
+appended at the end, so provider-side prompt-prefix caching can reuse the prefix.
+Besides the combined reply+correction prompt there are conversation-only and
+correction-only variants, used when the two parts are generated in parallel.
+
+Run `python tutor_prompt.py` for a per-combination token report.
+"""
+
+import argparse
+import itertools
+from typing import List
+
+from context_window import count_tokens
+
+LANGUAGES = ["English", "French"]
+LEVELS = ["Beginner (A1-A2)", "Intermediate (B1-B2)", "Advanced (C1-C2)"]
+PERSONAS = ["Friendly", "Professional", "Casual"]
+TOPICS = ["General", "Food", "Travel", "Work", "Shopping", "Job Interview"]
+
+# OpenAI caches prompt prefixes of at least 1024 tokens, in 128-token steps
+PROVIDER_MIN_CACHED_TOKENS = 1024
+PROVIDER_CACHE_INCREMENT = 128
+
+# Must not contain any per-session value: every byte here is part of the shared prefix
+STATIC_INSTRUCTIONS = """You are an experienced language tutor.
+
+Your role:
+- Help students practice conversation in the session language on the session topic
+- Adapt your language to the session proficiency level
+- Use the teaching style of the session persona
+- Keep responses natural and conversational (2-3 sentences)
+- Provide grammar corrections when needed WITHOUT interrupting the conversation flow
+
+The session settings are listed at the end of these instructions.
+
+CRITICAL: You MUST use this exact format for EVERY response:
+
+<conversation>
+[Your natural, conversational response here - NO corrections, NO grammar mentions, ONLY conversation]
+</conversation>
+
+<correction>
+[ONLY if there was a grammar/vocabulary/spelling error, write it here. Otherwise leave empty]
+[Format: "You said: '[incorrect phrase]' → Better: '[corrected phrase]' - [brief explanation]"]
+</correction>
+
+IMPORTANT RULES:
+1. The <conversation> section should NEVER mention errors or corrections
+2. The <conversation> section should flow naturally as if nothing was wrong
+3. Keep the conversation going - ask follow-up questions, show interest
+4. The <correction> section is COMPLETELY SEPARATE - only grammar fixes go there
+5. If there are no errors, leave <correction> empty
+6. Do NOT mix conversation and correction - they are separate sections
+
+Example 1 (with error):
+User: "I goed to store yesterday"
+<conversation>
+Oh nice! What did you buy at the store? I love shopping too.
+</conversation>
+<correction>
+You said: 'I goed to store' → Better: 'I went to the store' - "Go" is irregular (went, not goed), and we need "the" before "store".
+</correction>
+
+Example 2 (no error):
+User: "I went to the store yesterday"
+<conversation>
+Oh nice! What did you buy at the store? I love shopping too.
+</conversation>
+"""
+
+
+CONVERSATION_ONLY_INSTRUCTIONS = """You are an experienced language tutor.
+
+Your role:
+- Help students practice conversation in the session language on the session topic
+- Adapt your language to the session proficiency level
+- Use the teaching style of the session persona
+- Keep responses natural and conversational (2-3 sentences)
+
+The session settings are listed at the end of these instructions.
+
+CRITICAL: You MUST use this exact format for EVERY response:
+
+<conversation>
+[Your natural, conversational response here - NO corrections, NO grammar mentions, ONLY conversation]
+</conversation>
+
+IMPORTANT RULES:
+1. NEVER mention errors or corrections - grammar feedback is handled separately
+2. Respond naturally as if nothing was wrong
+3. Keep the conversation going - ask follow-up questions, show interest
+
+Example:
+User: "I goed to store yesterday"
+<conversation>
+Oh nice! What did you buy at the store? I love shopping too.
+</conversation>
+"""
+
+CORRECTION_ONLY_INSTRUCTIONS = """You are an experienced language tutor reviewing a student's last message.
+
+Your role:
+- Find grammar, vocabulary or spelling errors in the student's LAST message only
+- Explain each fix briefly, at a level the student can follow
+- Do NOT continue the conversation
+
+The session settings are listed at the end of these instructions.
+
+CRITICAL: You MUST use this exact format for EVERY response:
+
+<correction>
+[ONLY if there was a grammar/vocabulary/spelling error, write it here. Otherwise leave empty]
+[Format: "You said: '[incorrect phrase]' → Better: '[corrected phrase]' - [brief explanation]"]
+</correction>
+
+Example 1 (with error):
+User: "I goed to store yesterday"
+<correction>
+You said: 'I goed to store' → Better: 'I went to the store' - "Go" is irregular (went, not goed), and we need "the" before "store".
+</correction>
+
+Example 2 (no error):
+User: "I went to the store yesterday"
+<correction>
+</correction>
+"""
+
+PROMPT_MODES = {
+    "combined": STATIC_INSTRUCTIONS,
+    "conversation": CONVERSATION_ONLY_INSTRUCTIONS,
+    "correction": CORRECTION_ONLY_INSTRUCTIONS
+}
+
+
+def session_settings_block(language: str, persona: str, topic: str, level: str) -> str:
+    """The per-session part of the system prompt"""
+    language_name = "French" if language == "French" else "English"
+    return f"""
+SESSION SETTINGS:
+Language: {language_name} (speak only {language_name} in the <conversation> section)
+Topic: {topic}
+Level: {level}
+Persona: {persona} ({persona.lower()} teaching style)
+"""
+
+
+def build_system_prompt(language: str, persona: str, topic: str, level: str, mode: str = "combined") -> str:
+    """
+    Static instructions first, session settings last
+    mode: "combined" (reply + correction), "conversation" or "correction"
+    """
+    return PROMPT_MODES[mode] + session_settings_block(language, persona, topic, level)
+
+
+# ==================== Token Report ====================
+
+def provider_cacheable_tokens(prefix_tokens: int) -> int:
+    """Tokens of a shared prefix the provider can actually serve from cache"""
+    if prefix_tokens < PROVIDER_MIN_CACHED_TOKENS:
+        return 0
+    steps = (prefix_tokens - PROVIDER_MIN_CACHED_TOKENS) // PROVIDER_CACHE_INCREMENT
+    return PROVIDER_MIN_CACHED_TOKENS + steps * PROVIDER_CACHE_INCREMENT
+
+
+def common_prefix_length(prompts: List[str]) -> int:
+    """Length in characters of the prefix shared by all prompts"""
+    first = min(prompts)
+    last = max(prompts)
+    length = 0
+    while length < len(first) and first[length] == last[length]:
+        length += 1
+    return length
+
+
+def report(model: str = "gpt-4o-mini"):
+    """Print per-combination prompt tokens and the cached-prefix ratio"""
+    combinations = list(itertools.product(LANGUAGES, LEVELS, PERSONAS, TOPICS))
+    prompts = [build_system_prompt(language, persona, topic, level)
+               for language, level, persona, topic in combinations]
+
+    shared_prefix = prompts[0][:common_prefix_length(prompts)]
+    prefix_tokens = count_tokens(shared_prefix, model)
+    static_tokens = count_tokens(STATIC_INSTRUCTIONS, model)
+
+    print(f"{'language':<9} {'level':<21} {'persona':<13} {'topic':<14} {'tokens':>6} {'prefix %':>8}")
+    totals = []
+    for (language, level, persona, topic), prompt in zip(combinations, prompts):
+        tokens = count_tokens(prompt, model)
+        totals.append(tokens)
+        print(f"{language:<9} {level:<21} {persona:<13} {topic:<14} {tokens:>6} {100 * prefix_tokens / tokens:>7.1f}%")
+
+    print()
+    print(f"Combinations:               {len(combinations)}")
+    print(f"Static instruction tokens:  {static_tokens}")
+    print(f"Shared prefix tokens:       {prefix_tokens} (byte-identical across all combinations: "
+          f"{'yes' if shared_prefix.startswith(STATIC_INSTRUCTIONS) else 'NO'})")
+    print(f"System prompt tokens:       min {min(totals)}, max {max(totals)}")
+    print(f"Cached-prefix ratio:        {100 * prefix_tokens / max(totals):.1f}% - {100 * prefix_tokens / min(totals):.1f}%")
+    print(f"Provider-cacheable prefix:  {provider_cacheable_tokens(prefix_tokens)} tokens "
+          f"(caching starts at {PROVIDER_MIN_CACHED_TOKENS} tokens; within a session the history "
+          f"extends the stable prefix past that threshold)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report tutor system prompt token counts per combination")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Model whose tokenizer to use")
+    args = parser.parse_args()
+    report(args.model)
@@ -1,12 +1,22 @@
 """
 User authentication utilities for the AI Language Tutor app.
 This module handles user login, password hashing, and user management with Supabase.
+Queries go through the shared Supabase circuit breaker: reads and idempotent writes
+are retried on transient errors, and calls fail fast while the circuit is open.
 """
 
 import hashlib
 from datetime import datetime
 from typing import Optional, Dict, List
 from supabase import Client
+from resilience import NO_RETRY, RetryPolicy, call, get_breaker
+
+SUPABASE_BREAKER = get_breaker("supabase")
+RETRY_POLICY = RetryPolicy.from_env()
+
+def _execute(query, retry: bool = True):
+    """Run a Supabase query through the circuit breaker (only retry idempotent queries)"""
+    return call(SUPABASE_BREAKER, query.execute, RETRY_POLICY if retry else NO_RETRY)
 
 def hash_password(password: str) -> str:
     """Hash password using SHA256"""
@@ -23,7 +33,7 @@ def authenticate_user(supabase: Client, username: str, password: str) -> Optiona
     """
     try:
         # Query user by username
-        result = supabase.table('users').select('*').eq('username', username).execute()
+        result = _execute(supabase.table('users').select('*').eq('username', username))
         
         if not result.data:
             return None
@@ -36,10 +46,13 @@ def authenticate_user(supabase: Client, username: str, password: str) -> Optiona
         
         # Verify password
         if verify_password(password, user['password_hash']):
-            # Update last login
-            supabase.table('users').update({
-                'last_login': datetime.now().isoformat()
-            }).eq('id', user['id']).execute()
+            # Update last login (best effort: a failed write must not block the login)
+            try:
+                _execute(supabase.table('users').update({
+                    'last_login': datetime.now().isoformat()
+                }).eq('id', user['id']))
+            except Exception as e:
+                print(f"Last login update error: {e}")
             
             return user
         
@@ -63,7 +76,7 @@ def create_user(
     """
     try:
         # Check if username already exists
-        existing = supabase.table('users').select('id').eq('username', username).execute()
+        existing = _execute(supabase.table('users').select('id').eq('username', username))
         if existing.data:
             raise ValueError(f"Username '{username}' already exists")
         
@@ -76,7 +89,7 @@ def create_user(
             'is_active': True
         }
         
-        result = supabase.table('users').insert(user_data).execute()
+        result = _execute(supabase.table('users').insert(user_data), retry=False)
         return result.data[0] if result.data else None
         
     except Exception as e:
@@ -86,7 +99,7 @@ def create_user(
 def get_all_users(supabase: Client) -> List[Dict]:
     """Get all users from the database (admin only)"""
     try:
-        result = supabase.table('users').select('id, username, email, full_name, is_admin, is_active, created_at, last_login').execute()
+        result = _execute(supabase.table('users').select('id, username, email, full_name, is_admin, is_active, created_at, last_login'))
         return result.data if result.data else []
     except Exception as e:
         print(f"Error fetching users: {e}")
@@ -113,7 +126,7 @@ def update_user(
             update_data['is_active'] = is_active
         
         if update_data:
-            supabase.table('users').update(update_data).eq('id', user_id).execute()
+            _execute(supabase.table('users').update(update_data).eq('id', user_id))
         return True
     except Exception as e:
         print(f"Error updating user: {e}")
@@ -122,9 +135,9 @@ def update_user(
 def change_password(supabase: Client, user_id: int, new_password: str) -> bool:
     """Change user password"""
     try:
-        supabase.table('users').update({
+        _execute(supabase.table('users').update({
             'password_hash': hash_password(new_password)
-        }).eq('id', user_id).execute()
+        }).eq('id', user_id))
         return True
     except Exception as e:
         print(f"Error changing password: {e}")
@@ -133,7 +146,7 @@ def change_password(supabase: Client, user_id: int, new_password: str) -> bool:
 def delete_user(supabase: Client, user_id: int) -> bool:
     """Delete a user (admin only)"""
     try:
-        supabase.table('users').delete().eq('id', user_id).execute()
+        _execute(supabase.table('users').delete().eq('id', user_id))
         return True
     except Exception as e:
         print(f"Error deleting user: {e}")